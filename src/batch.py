@@ -0,0 +1,146 @@
+import argparse
+import os
+import sys
+from nbtlib import parse_nbt
+from core.batch import BatchOperation, collect_files, run_batch
+from core.nbt_path import parse_path
+from core.query import compile_query
+from core.saver import DEFAULT_COMPRESSION_LEVEL
+from core.world_index import WorldIndex, INDEX_FILE_NAME, ENTITY, BLOCK_ENTITY, ITEM
+
+
+def add_common_arguments(parser):
+    parser.add_argument("sources", nargs="+", help="NBT/region files or folders (searched recursively)")
+    parser.add_argument("--glob", help="only files below a folder matching this pattern, e.g. 'playerdata/*.dat'")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing files")
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--level", type=int, default=DEFAULT_COMPRESSION_LEVEL, help="compression level of saved files")
+    parser.add_argument("--quiet", "-q", action="store_true", help="only print errors and the summary")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Apply one NBT edit or query to many files at once.",
+        epilog="Paths look like Data.Player.Inventory[3].id; values are SNBT, e.g. 20f, 1b or '\"text\"'.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    get = commands.add_parser("get", help="print the value at a path")
+    get.add_argument("path")
+    add_common_arguments(get)
+    set_ = commands.add_parser("set", help="set the value at a path")
+    set_.add_argument("path")
+    set_.add_argument("value", help="new value as SNBT")
+    add_common_arguments(set_)
+    delete = commands.add_parser("delete", help="delete the tag at a path")
+    delete.add_argument("path")
+    add_common_arguments(delete)
+    rename = commands.add_parser("rename", help="rename the compound entry at a path")
+    rename.add_argument("path")
+    rename.add_argument("new_name")
+    add_common_arguments(rename)
+    replace = commands.add_parser("replace", help="replace every scalar equal to OLD with NEW")
+    replace.add_argument("old", help="value to find, as SNBT (type and value must match)")
+    replace.add_argument("new", help="replacement value as SNBT")
+    replace.add_argument("--under", default="", help="only replace below this path")
+    add_common_arguments(replace)
+
+    query = commands.add_parser("query", help="list the tags matching a path query")
+    query.add_argument("expression", help="query, e.g. 'Inventory[?Count >= 64].id' or '..CustomName'")
+    add_common_arguments(query)
+    index = commands.add_parser("index", help="build or refresh the entity and item catalog of a world")
+    index.add_argument("world", help="world folder")
+    index.add_argument("--db", help=f"catalog file (default: {INDEX_FILE_NAME} in the world folder)")
+    index.add_argument("--rebuild", action="store_true", help="scan every file again")
+    index.add_argument("--jobs", "-j", type=int, help="worker processes (default: one per CPU)")
+    index.add_argument("--quiet", "-q", action="store_true", help="only print errors and the summary")
+    find = commands.add_parser("find", help="list where an entity, block entity or item is, from the catalog")
+    find.add_argument("world", help="world folder")
+    find.add_argument("id", help="id or glob pattern, e.g. diamond or '*shulker_box'")
+    find.add_argument("--kind", choices=(ENTITY, BLOCK_ENTITY, ITEM), help="only this kind of entry")
+    find.add_argument("--container", help="only items inside this entity or block entity, e.g. chest")
+    find.add_argument("--limit", type=int, default=100, help="rows to print (default: 100)")
+    find.add_argument("--db", help=f"catalog file (default: {INDEX_FILE_NAME} in the world folder)")
+    find.add_argument("--update", action="store_true", help="refresh the catalog first")
+    return parser
+
+
+def build_operation(args):
+    if args.command == "query":
+        # Compiled here only to report syntax errors before any file is read
+        compile_query(args.expression)
+        return BatchOperation("query", (), query=args.expression)
+    if args.command == "replace":
+        # Parsed here only to report syntax errors; workers get the text
+        parse_nbt(args.old)
+        parse_nbt(args.new)
+        return BatchOperation("replace", parse_path(args.under), value=args.new, old=args.old)
+    path = parse_path(args.path)
+    if not path:
+        raise ValueError("The path must name a tag below the root")
+    if args.command == "set":
+        parse_nbt(args.value)
+        return BatchOperation("set", path, value=args.value)
+    if args.command == "rename":
+        return BatchOperation("rename", path, new_name=args.new_name)
+    return BatchOperation(args.command, path)
+
+
+def run_index(args):
+    index = WorldIndex(args.world, args.db)
+    try:
+        if args.command == "index" or args.update:
+            if getattr(args, "rebuild", False):
+                index.rebuild()
+
+            def report(result):
+                if result.error is not None:
+                    print(f"{result.path}: ERROR {result.error}", file=sys.stderr)
+                elif args.command == "index" and not args.quiet:
+                    print(f"{result.path}: {len(result.chunks)} chunks, {len(result.entries)} entries")
+
+            summary = index.update(getattr(args, "jobs", None), report)
+            print(summary, file=sys.stderr)
+            if args.command == "index":
+                return 1 if summary.failed else 0
+        matches = index.find(args.id, args.kind, args.container, args.limit)
+        for match in matches:
+            print(match)
+        if not matches:
+            print("Not found; run 'index' first if the world changed", file=sys.stderr)
+        return 0 if matches else 1
+    finally:
+        index.close()
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.command in ("index", "find"):
+        if not os.path.isdir(args.world):
+            print(f"error: {args.world} is not a folder", file=sys.stderr)
+            return 2
+        return run_index(args)
+    try:
+        operation = build_operation(args)
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    files = collect_files(args.sources, args.glob)
+    if not files:
+        print("error: no NBT files found", file=sys.stderr)
+        return 2
+
+    def report(result):
+        if result.error is not None:
+            print(f"{result.file_path}: ERROR {result.error}", file=sys.stderr)
+        elif not args.quiet:
+            for line in result.lines:
+                print(f"{result.file_path}: {line}")
+
+    summary = run_batch(files, operation, args.dry_run, args.jobs, args.level, report)
+    prefix = "Dry run: " if args.dry_run and operation.kind not in ("get", "query") else ""
+    print(prefix + str(summary), file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
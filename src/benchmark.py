@@ -0,0 +1,482 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+from nbtlib import File, load, parse_nbt
+from nbtlib.tag import (Compound, List, String, Byte, Short, Int, Long, Float, Double,
+                        ByteArray, IntArray, LongArray, Numeric)
+from PyQt6.QtCore import QModelIndex
+from core.region import CHUNK_COUNT, SECTOR_SIZE, RegionFile
+from core.saver import encode_nbt
+from ui.nbt_handler import NBTHandler
+
+RESULTS_VERSION = 1
+LOOKUP_SAMPLE = 20000
+EDIT_COUNT = 1000
+SEARCH_TEXT = "minecraft:stone"
+BATCH_FILE_COUNT = 64
+# A list value: worker processes must receive it as text, as List[...] classes do not pickle
+BATCH_VALUE = "[1, 2, 3]"
+# Command line runs are killed after this long, so a hung worker pool fails the run
+PROCESS_TIMEOUT = 300
+# A line of main.py --profile-startup: "import PyQt6      41.0 ms"
+_STARTUP_LINE = re.compile(r"^(.*?)\s+([\d.]+) ms$")
+# Differences below this are noise, whatever the ratio
+MIN_SIGNIFICANT_SECONDS = 0.002
+
+_ITEM_IDS = ["minecraft:stone", "minecraft:dirt", "minecraft:oak_log", "minecraft:iron_ingot",
+             "minecraft:diamond", "minecraft:torch", "minecraft:bread", "minecraft:arrow"]
+
+
+# Synthetic documents; every generator is deterministic for a given scale
+
+def make_deep(scale, rng):
+    """Compounds nested six levels deep, six children each, with a few scalars per level."""
+    depth = max(2, round(6 + math.log(scale, 6)))
+
+    def node(level):
+        tag = Compound({"id": String(rng.choice(_ITEM_IDS)), "level": Int(level),
+                        "weight": Float(rng.random()), "seed": Long(rng.getrandbits(63))})
+        if level < depth:
+            for i in range(6):
+                tag[f"child{i}"] = node(level + 1)
+        return tag
+
+    return File({"Data": node(1)}, root_name="")
+
+
+def make_list(scale, rng):
+    """One list of 100k entity compounds."""
+    entities = List[Compound]()
+    for i in range(max(1, int(100000 * scale))):
+        list.append(entities, Compound({
+            "id": String("minecraft:item"),
+            "Pos": List[Double]([Double(rng.uniform(-1e4, 1e4)) for _ in range(3)]),
+            "Health": Short(5),
+            "UUID": IntArray([rng.getrandbits(31) for _ in range(4)]),
+            "Item": Compound({"id": String(rng.choice(_ITEM_IDS)), "Count": Byte(rng.randint(1, 64))}),
+        }))
+    return File({"Entities": entities}, root_name="")
+
+
+def make_arrays(scale, rng):
+    """A handful of multi-megabyte Byte/Int/LongArrays."""
+    count = max(1, int(1000000 * scale))
+    values = np.random.default_rng(rng.getrandbits(32))
+    return File({
+        "Bytes": ByteArray(values.integers(-128, 128, count * 4, dtype=np.int8)),
+        "Ints": IntArray(values.integers(-2 ** 31, 2 ** 31, count, dtype=np.int32)),
+        "Longs": LongArray(values.integers(-2 ** 63, 2 ** 63, count, dtype=np.int64)),
+        "Name": String("arrays"),
+    }, root_name="")
+
+
+def make_chunk(index, rng, values):
+    sections = List[Compound]()
+    for y in range(-4, 20):
+        palette = List[Compound]([Compound({"Name": String(name)}) for name in rng.sample(_ITEM_IDS, 4)])
+        # 4096 two-bit palette indices, 32 per long
+        data = values.integers(0, 4, 4096, dtype=np.int64).reshape(256, 16)
+        packed = (data << (np.arange(16, dtype=np.int64) * 2)).sum(axis=1)
+        list.append(sections, Compound({
+            "Y": Byte(y),
+            "block_states": Compound({"palette": palette, "data": LongArray(packed)}),
+            "biomes": Compound({"palette": List[String]([String("minecraft:plains")])}),
+        }))
+    block_entities = List[Compound]([Compound({
+        "id": String("minecraft:chest"), "x": Int(rng.randint(0, 15)), "y": Int(rng.randint(-64, 319)),
+        "z": Int(rng.randint(0, 15)),
+        "Items": List[Compound]([Compound({"Slot": Byte(slot), "id": String(rng.choice(_ITEM_IDS)),
+                                           "Count": Byte(rng.randint(1, 64))}) for slot in range(8)]),
+    }) for _ in range(4)])
+    return File({
+        "DataVersion": Int(3700), "xPos": Int(index % 32), "zPos": Int(index // 32),
+        "Status": String("minecraft:full"), "LastUpdate": Long(rng.getrandbits(40)),
+        "sections": sections, "block_entities": block_entities,
+        "Heightmaps": Compound({"WORLD_SURFACE": LongArray(values.integers(0, 2 ** 62, 37, dtype=np.int64))}),
+    }, root_name="")
+
+
+def write_region(file_path, scale, rng):
+    """Write an Anvil region file with up to 1024 zlib chunks."""
+    values = np.random.default_rng(rng.getrandbits(32))
+    locations = bytearray(SECTOR_SIZE)
+    timestamps = bytearray(SECTOR_SIZE)
+    body = bytearray()
+    for index in range(max(1, min(CHUNK_COUNT, int(CHUNK_COUNT * scale)))):
+        payload = encode_nbt(make_chunk(index, rng, values), "zlib", 6)
+        blob = struct.pack(">IB", len(payload) + 1, 2) + payload
+        blob += bytes(-len(blob) % SECTOR_SIZE)
+        offset = 2 + len(body) // SECTOR_SIZE
+        struct.pack_into(">I", locations, index * 4, offset << 8 | len(blob) // SECTOR_SIZE)
+        struct.pack_into(">I", timestamps, index * 4, 1700000000 + index)
+        body += blob
+    with open(file_path, "wb") as f:
+        f.write(locations + timestamps + body)
+
+
+CASES = {
+    "deep": (".dat", make_deep),
+    "list": (".dat", make_list),
+    "arrays": (".dat", make_arrays),
+    "region": (".mca", None),
+}
+
+
+def generate_batch(directory, scale):
+    """Create (or reuse) a folder of small player files for the batch case and return its path."""
+    folder = os.path.join(directory, f"batch-{scale:g}")
+    if os.path.isdir(folder):
+        return folder
+    os.makedirs(folder)
+    rng = random.Random("batch")
+    for i in range(max(2, int(BATCH_FILE_COUNT * scale))):
+        inventory = List[Compound]([Compound({"Slot": Byte(slot), "id": String(rng.choice(_ITEM_IDS)),
+                                              "Count": Byte(rng.randint(1, 64))}) for slot in range(36)])
+        player = File({"Data": Compound({"Inventory": inventory, "Health": Float(20)})}, root_name="")
+        with open(os.path.join(folder, f"player{i}.dat"), "wb") as f:
+            f.write(encode_nbt(player, "gzip", 6))
+    return folder
+
+
+def generate(name, directory, scale):
+    """Create (or reuse) the file of a case and return its path."""
+    extension, make = CASES[name]
+    file_path = os.path.join(directory, f"{name}-{scale:g}{extension}")
+    if os.path.exists(file_path):
+        return file_path
+    rng = random.Random(name)
+    if make is None:
+        write_region(file_path, scale, rng)
+    else:
+        with open(file_path, "wb") as f:
+            f.write(encode_nbt(make(scale, rng), "gzip", 6))
+    return file_path
+
+
+# Measurements
+
+class Recorder:
+    """Collects the duration (or, with memory, the peak allocation) of named steps."""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.results = {}
+
+    @contextmanager
+    def measure(self, name):
+        gc.collect()
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        self.results[name] = tracemalloc.get_traced_memory()[1] - base if self.memory else elapsed
+
+
+def sample_indexes(model, limit):
+    """Breadth-first (row, parent) pairs of up to limit items, fetching children as needed."""
+    pairs = []
+    queue = [QModelIndex()]
+    while queue and len(pairs) < limit:
+        parent = queue.pop(0)
+        if model.canFetchMore(parent):
+            model.fetchMore(parent)
+        for row in range(model.rowCount(parent)):
+            pairs.append((row, parent))
+            queue.append(model.index(row, 0, parent))
+            if len(pairs) >= limit:
+                break
+    return pairs
+
+
+def _children(path, tag):
+    if isinstance(tag, Compound):
+        for key, child in tag.items():
+            yield path + (key,), child
+    else:
+        for i in range(len(tag)):
+            yield path + (i,), tag[i]
+
+
+def scalar_paths(document, limit):
+    """Paths of the first scalar tags in document order, so edits stay within a few chunks."""
+    paths = []
+    # Children are iterated lazily so that only the region chunks walked get loaded
+    stack = [iter([((), document.nbt_data)])]
+    while stack and len(paths) < limit:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        path, tag = entry
+        if isinstance(tag, (Numeric, String)):
+            paths.append(path)
+        elif isinstance(tag, (Compound, List, RegionFile)):
+            stack.append(_children(path, tag))
+    return paths
+
+
+def edited(tag):
+    if isinstance(tag, String):
+        return String(str.__str__(tag) + "!")
+    return type(tag)(0 if tag else 1)
+
+
+def run_case(file_path, save_path, recorder):
+    """Run every benchmarked operation once against file_path."""
+    handler = NBTHandler()
+    with recorder.measure("load_file"):
+        handler.load_file(file_path)
+    model = handler.get_tree_model()
+    with recorder.measure("set_root"):
+        model.set_root(handler.nbt_data)
+    with recorder.measure("expand_top_level"):
+        # What opening a file shows: the root's children with theirs fetched
+        for row in range(model.rowCount()):
+            index = model.index(row, 0)
+            if model.canFetchMore(index):
+                model.fetchMore(index)
+    pairs = sample_indexes(model, LOOKUP_SAMPLE)
+    with recorder.measure("lookups"):
+        for row, parent in pairs:
+            model.parent(model.index(row, 0, parent))
+    with recorder.measure("search_first"):
+        handler.search(SEARCH_TEXT)
+    with recorder.measure("search"):
+        handler.search(SEARCH_TEXT)
+    paths = scalar_paths(handler, EDIT_COUNT)
+    values = [edited(handler.get(path)) for path in paths]
+    with recorder.measure("edit"):
+        for path, value in zip(paths, values):
+            handler.set(path, value)
+    with recorder.measure("undo"):
+        for _ in paths:
+            handler.undo()
+    with recorder.measure("save"):
+        handler.save_file_as(save_path)
+    handler.close()
+    counts = {"lookups": len(pairs), "edits": len(paths)}
+    return counts
+
+
+def benchmark(name, file_path, work_dir, repeat, memory):
+    """Best time of each step over repeat runs, plus its peak allocation from a traced run."""
+    save_path = os.path.join(work_dir, "saved-" + os.path.basename(file_path))
+    timings = {}
+    for _ in range(repeat):
+        recorder = Recorder()
+        counts = run_case(file_path, save_path, recorder)
+        for step, seconds in recorder.results.items():
+            timings[step] = min(seconds, timings.get(step, seconds))
+    result = {"file_size": os.path.getsize(file_path), "counts": counts, "seconds": timings}
+    if memory:
+        recorder = Recorder(memory=True)
+        tracemalloc.start()
+        try:
+            run_case(file_path, save_path, recorder)
+        finally:
+            tracemalloc.stop()
+        result["peak_bytes"] = recorder.results
+    os.remove(save_path)
+    return result
+
+
+def run_script(name, *args, env=None):
+    """Run one of the editor's scripts with this interpreter; a failure raises, with its output."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, script, *args], capture_output=True, text=True,
+                               timeout=PROCESS_TIMEOUT, env=env)
+    seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} {' '.join(args)} failed:\n{completed.stdout}{completed.stderr}")
+    return completed.stdout, seconds
+
+
+def benchmark_batch(data_dir, work_dir, scale, repeat):
+    """Best times of batch.py editing and querying a folder with two worker processes.
+
+    Also checks that the edit reached every file, so the case fails rather
+    than only slowing down when the batch tool breaks.
+    """
+    folder = generate_batch(data_dir, scale)
+    target = os.path.join(work_dir, "batch")
+    timings = {}
+    for _ in range(repeat):
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(folder, target)
+        for step, args in (("set_list", ("set", "Data.Tags", BATCH_VALUE)), ("query", ("query", "..id"))):
+            _, seconds = run_script("batch.py", *args, target, "--jobs", "2", "--quiet")
+            timings[step] = min(seconds, timings.get(step, seconds))
+        expected = parse_nbt(BATCH_VALUE)
+        for name in os.listdir(target):
+            if load(os.path.join(target, name))["Data"].get("Tags") != expected:
+                raise RuntimeError(f"batch.py set did not write {BATCH_VALUE} to {name}")
+    files = os.listdir(folder)
+    shutil.rmtree(target)
+    return {"file_size": sum(os.path.getsize(os.path.join(folder, name)) for name in files),
+            "counts": {"files": len(files)}, "seconds": timings}
+
+
+def benchmark_startup(data_dir, work_dir, scale, repeat):
+    """Best times of each startup step reported by main.py --profile-startup, each run a new process.
+
+    Qt runs offscreen unless QT_QPA_PLATFORM says otherwise, so runs do not
+    depend on (or flash up on) a display.
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    timings = {}
+    counts = {}
+    for _ in range(repeat):
+        output, seconds = run_script("main.py", "--profile-startup", env=env)
+        steps = {"process": seconds}
+        for line in output.splitlines():
+            match = _STARTUP_LINE.match(line.strip())
+            if match is not None:
+                # "import nbtlib (and numpy)" -> "import_nbtlib"
+                step = match.group(1).split(" (")[0].strip().lower().replace(" ", "_")
+                steps[step] = float(match.group(2)) / 1000
+            elif line.startswith("modules loaded"):
+                counts["modules"] = int(line.split()[-1])
+        if "total" not in steps:
+            raise RuntimeError(f"main.py --profile-startup printed no timings:\n{output}")
+        for step, value in steps.items():
+            timings[step] = min(value, timings.get(step, value))
+    return {"counts": counts, "seconds": timings}
+
+
+# Cases timed from the outside, by running the editor's scripts: name -> benchmark(data_dir, work_dir, scale, repeat)
+PROCESS_CASES = {
+    "batch": benchmark_batch,
+    "startup": benchmark_startup,
+}
+
+
+def max_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+# Reporting
+
+def format_report(results):
+    lines = []
+    for name, case in results["cases"].items():
+        lines.append(f"{name} ({case['file_size'] / 1e6:.1f} MB on disk)" if "file_size" in case else name)
+        peaks = case.get("peak_bytes", {})
+        for step, seconds in case["seconds"].items():
+            peak = f"{peaks[step] / 1e6:10.1f} MB" if step in peaks else ""
+            lines.append(f"  {step:<22}{seconds * 1000:10.1f} ms{peak}")
+    if results.get("max_rss"):
+        lines.append(f"max RSS {results['max_rss'] / 1e6:.1f} MB")
+    return "\n".join(lines)
+
+
+def compare(results, baseline, threshold):
+    """Per-step comparison against a baseline; returns (report lines, number of regressions)."""
+    lines = []
+    regressions = 0
+    for name, case in results["cases"].items():
+        old_case = baseline.get("cases", {}).get(name)
+        if old_case is None:
+            continue
+        lines.append(name)
+        for step, seconds in case["seconds"].items():
+            old = old_case["seconds"].get(step)
+            if old is None:
+                continue
+            ratio = seconds / old if old else float("inf")
+            mark = ""
+            if abs(seconds - old) >= MIN_SIGNIFICANT_SECONDS:
+                if ratio > 1 + threshold:
+                    mark = "  SLOWER"
+                    regressions += 1
+                elif ratio < 1 / (1 + threshold):
+                    mark = "  faster"
+            lines.append(f"  {step:<22}{old * 1000:10.1f} -> {seconds * 1000:8.1f} ms ({ratio - 1:+7.1%}){mark}")
+    if baseline.get("scale") != results["scale"]:
+        lines.append(f"warning: baseline used scale {baseline.get('scale')}, this run {results['scale']}")
+    return lines, regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Time the editor's load, tree, search, edit and save paths on synthetic files.")
+    parser.add_argument("cases", nargs="*", metavar="case",
+                        help=f"cases to run (default: all of {', '.join(list(CASES) + list(PROCESS_CASES))})")
+    parser.add_argument("--scale", type=float, default=1.0, help="size factor of the generated files")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best time is kept")
+    parser.add_argument("--data-dir", help="keep generated files here and reuse them on later runs")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run measuring peak memory")
+    parser.add_argument("--output", "-o", help="write the results as JSON to this file ('-' for stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown ratio counted as a regression (default: 0.10)")
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    known = list(CASES) + list(PROCESS_CASES)
+    unknown = [name for name in args.cases if name not in known]
+    if unknown:
+        parser.error(f"unknown case {unknown[0]!r} (choose from {', '.join(known)})")
+    names = args.cases or known
+    results = {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": platform.python_version(), "platform": platform.platform(),
+               "scale": args.scale, "repeat": args.repeat, "cases": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = args.data_dir or work_dir
+        os.makedirs(data_dir, exist_ok=True)
+        for name in names:
+            if name in PROCESS_CASES:
+                print(f"{name}: running...", file=sys.stderr)
+                results["cases"][name] = PROCESS_CASES[name](data_dir, work_dir, args.scale, args.repeat)
+                continue
+            print(f"{name}: generating...", file=sys.stderr)
+            file_path = generate(name, data_dir, args.scale)
+            print(f"{name}: running...", file=sys.stderr)
+            results["cases"][name] = benchmark(name, file_path, work_dir, args.repeat, not args.no_memory)
+    results["max_rss"] = max_rss()
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(results))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold)
+        print("\n".join(lines), file=sys.stderr if args.output == "-" else sys.stdout)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import fnmatch
+import io
+import os
+import time
+from nbtlib import parse_nbt
+from nbtlib.tag import Base, Compound, List, String, Numeric
+from core.lazy_nbt import parse_document
+from core.loader import load_nbt
+from core.nbt_path import format_path
+from core.nbt_stream import extract, extract_stream
+from core.query import compile_query
+from core.region import RegionFile, is_region_file
+from core.saver import DEFAULT_COMPRESSION_LEVEL, encode_nbt, write_atomic
+
+NBT_EXTENSIONS = (".dat", ".nbt", ".schematic", ".mca", ".mcr")
+
+
+def collect_files(sources, pattern=None):
+    """Expand files and folders (searched recursively) into a sorted list of NBT files.
+
+    Folders contribute files with an NBT extension; pattern, a glob such as
+    "playerdata/*.dat", further limits them by their path below the folder.
+    """
+    files = []
+    for source in sources:
+        if not os.path.isdir(source):
+            files.append(source)
+            continue
+        for directory, _, names in os.walk(source):
+            for name in names:
+                if not name.lower().endswith(NBT_EXTENSIONS):
+                    continue
+                file_path = os.path.join(directory, name)
+                relative = os.path.relpath(file_path, source).replace(os.sep, "/")
+                if pattern is None or fnmatch.fnmatch(relative, pattern):
+                    files.append(file_path)
+    return sorted(dict.fromkeys(files))
+
+
+class BatchOperation:
+    """One edit (or query) applied to every document of a batch.
+
+    kind is "get", "set", "delete", "rename", "replace" or "query"; path is
+    a key tuple. set takes value, rename takes new_name and replace takes old
+    and value, replacing equal scalars below path. query lists the matches
+    of a core.query expression. Values and queries are given as text, SNBT
+    for values, and parsed where they are applied: nbtlib's List[...]
+    classes cannot be pickled over to worker processes.
+    """
+
+    def __init__(self, kind, path, value=None, new_name=None, old=None, query=None):
+        self.kind = kind
+        self.path = path
+        self.value = value
+        self.new_name = new_name
+        self.old = old
+        self.query = query
+
+    def find(self, root):
+        """Run a query on a document root, returning a line per match."""
+        return [f"{format_path(path)} = {_format_value(tag)}"
+                for path, tag in compile_query(self.query).evaluate(root)]
+
+    def apply(self, root):
+        """Apply to a document root, returning a list of change descriptions."""
+        # Parsed per document so that no two documents share a tag
+        value = parse_nbt(self.value) if self.value is not None else None
+        if self.kind == "replace":
+            target = _resolve(root, self.path)
+            return self._replace(target, parse_nbt(self.old), value) if isinstance(target, (Compound, List)) else []
+        parent = _resolve(root, self.path[:-1])
+        key = self.path[-1]
+        if parent is None:
+            return []
+        if self.kind == "set":
+            if isinstance(parent, List):
+                if not isinstance(key, int) or not -len(parent) <= key < len(parent):
+                    return []
+                current = parent[key]
+            elif isinstance(parent, Compound) and isinstance(key, str):
+                # Compound entries are created when missing
+                current = parent.get(key)
+            else:
+                return []
+            if type(current) is type(value) and current == value:
+                return []
+            parent[key] = value
+            return [f"set {format_path(self.path)}"]
+        if self.kind == "delete":
+            if isinstance(parent, Compound) and key in parent or \
+                    isinstance(parent, List) and isinstance(key, int) and -len(parent) <= key < len(parent):
+                del parent[key]
+                return [f"deleted {format_path(self.path)}"]
+            return []
+        if self.kind == "rename":
+            if not isinstance(parent, Compound) or key not in parent:
+                return []
+            if self.new_name in parent:
+                raise KeyError(f"Tag '{self.new_name}' already exists in {format_path(self.path[:-1])}")
+            # Rebuild the compound so the renamed entry keeps its position
+            items = [(self.new_name if name == key else name, value) for name, value in parent.items()]
+            parent.clear()
+            dict.update(parent, items)
+            return [f"renamed {format_path(self.path)} to {self.new_name}"]
+        raise ValueError(f"Operation '{self.kind}' does not modify documents")
+
+    def _replace(self, top, old, value):
+        changes = []
+        stack = [(self.path, top)]
+        while stack:
+            path, container = stack.pop()
+            items = container.items() if isinstance(container, Compound) else enumerate(container)
+            for key, tag in list(items):
+                if isinstance(tag, (Compound, List)):
+                    stack.append((path + (key,), tag))
+                elif type(tag) is type(old) and tag == old:
+                    container[key] = value
+                    changes.append(f"replaced {format_path(path + (key,))}")
+        return changes
+
+
+def _resolve(root, path):
+    tag = root
+    for key in path:
+        try:
+            tag = tag[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return tag
+
+
+def _format_value(tag):
+    if not isinstance(tag, Base):
+        # Array entries
+        return str(tag)
+    if isinstance(tag, String):
+        return str.__str__(tag)
+    if isinstance(tag, Numeric):
+        return str(tag.unpack())
+    return tag.snbt()
+
+
+class FileResult:
+    """Outcome of a batch operation on one file, as sent back from a worker process."""
+
+    def __init__(self, file_path, size):
+        self.file_path = file_path
+        self.size = size
+        self.lines = []
+        self.changes = 0
+        self.error = None
+
+
+def process_file(file_path, operation, dry_run=False, level=DEFAULT_COMPRESSION_LEVEL):
+    """Run an operation on one NBT or region file; errors are reported, not raised."""
+    result = FileResult(file_path, 0)
+    try:
+        result.size = os.path.getsize(file_path)
+        if is_region_file(file_path):
+            _process_region(result, operation, dry_run, level)
+        elif operation.kind == "get":
+            found = extract(file_path, [operation.path])
+            if operation.path in found:
+                result.lines.append(_format_value(found[operation.path]))
+        elif operation.kind == "query":
+            result.lines.extend(operation.find(load_nbt(file_path)))
+        else:
+            nbt_data = load_nbt(file_path)
+            changes = operation.apply(nbt_data)
+            result.lines.extend(changes)
+            result.changes = len(changes)
+            if changes and not dry_run:
+                write_atomic(file_path, encode_nbt(nbt_data, nbt_data.compression, level))
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _process_region(result, operation, dry_run, level):
+    region = RegionFile(result.file_path)
+    try:
+        for chunk in region.chunks:
+            prefix = f"chunk [{chunk.x}, {chunk.z}] "
+            if operation.kind == "get":
+                raw = region.read_chunk_data(chunk)
+                found = extract_stream(io.BytesIO(raw), [operation.path])
+                if operation.path in found:
+                    result.lines.append(prefix + _format_value(found[operation.path]))
+                continue
+            if operation.kind == "query":
+                # Parsed without caching on the chunk, so memory stays flat across the region
+                root = parse_document(region.read_chunk_data(chunk))
+                result.lines.extend(prefix + line for line in operation.find(root))
+                continue
+            changes = operation.apply(chunk.load())
+            if changes:
+                region.mark_dirty(chunk)
+                result.lines.extend(prefix + change for change in changes)
+                result.changes += len(changes)
+            else:
+                # Only edited chunks are needed for the save; memory stays flat otherwise
+                chunk.nbt_data = None
+        if region.dirty_chunks and not dry_run:
+            region.save(level=level)
+    finally:
+        region.close()
+
+
+def _process_task(task):
+    return process_file(*task)
+
+
+class BatchSummary:
+    def __init__(self):
+        self.files = 0
+        self.changed = 0
+        self.failed = 0
+        self.changes = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def add(self, result):
+        self.files += 1
+        self.bytes += result.size
+        self.changes += result.changes
+        self.changed += bool(result.changes)
+        self.failed += result.error is not None
+
+    def __str__(self):
+        rate = self.files / self.seconds if self.seconds else 0.0
+        throughput = self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+        return (f"{self.files} files ({self.bytes / 1e6:.1f} MB) in {self.seconds:.2f} s, "
+                f"{rate:.1f} files/s, {throughput:.1f} MB/s; "
+                f"{self.changes} changes in {self.changed} files, {self.failed} failed")
+
+
+def run_batch(files, operation, dry_run=False, jobs=None, level=DEFAULT_COMPRESSION_LEVEL, on_result=None):
+    """Process files across a pool of jobs processes, calling on_result(result) in file order."""
+    summary = BatchSummary()
+    started = time.perf_counter()
+    tasks = [(file_path, operation, dry_run, level) for file_path in files]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        results = map(_process_task, tasks)
+        executor = None
+    else:
+        # Imported here: the process machinery costs startup time that
+        # single-file runs do not need
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(jobs)
+        # Hand out files in small batches to keep the inter-process overhead low
+        results = executor.map(_process_task, tasks, chunksize=max(1, min(64, len(tasks) // (jobs * 8))))
+    try:
+        for result in results:
+            summary.add(result)
+            if on_result:
+                on_result(result)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    summary.seconds = time.perf_counter() - started
+    return summary
@@ -0,0 +1,185 @@
+import numpy as np
+from nbtlib.tag import Compound, List, String
+
+SECTION_SIZE = 16
+BLOCK_COUNT = SECTION_SIZE ** 3
+# Block states use at least this many bits per entry, even for tiny palettes
+MIN_BITS = 4
+UNKNOWN_STATE = "(invalid index)"
+# Sections unpacked per batch; bounds the temporary arrays to a few megabytes
+DECODE_BATCH = 256
+
+
+def bits_for(palette_size, minimum=MIN_BITS):
+    return max(minimum, (palette_size - 1).bit_length())
+
+
+def _as_uint64(data):
+    # Value-preserving: nbtlib arrays are big-endian, stacked ones native
+    return np.asarray(data).astype(np.int64, copy=False).view(np.uint64)
+
+
+def unpack_padded(data, bits, count=BLOCK_COUNT):
+    """Unpack entries stored floor(64 / bits) to a long, the rest of each long unused (1.16+).
+
+    data may be one array of longs or a 2-D array with one row per section.
+    """
+    longs = _as_uint64(data)
+    per_long = 64 // bits
+    shifts = np.arange(per_long, dtype=np.uint64) * np.uint64(bits)
+    values = (longs[..., None] >> shifts).astype(np.uint32)
+    values &= np.uint32((1 << bits) - 1)
+    return values.reshape(longs.shape[:-1] + (-1,))[..., :count]
+
+
+def unpack_spanning(data, bits, count=BLOCK_COUNT):
+    """Unpack entries packed back to back, some spanning two longs (1.13 to 1.15).
+
+    data may be one array of longs or a 2-D array with one row per section.
+    """
+    longs = _as_uint64(data)
+    # Little-endian bytes put bit i of long j at position 64 * j + i of the stream
+    stream = np.unpackbits(longs.astype("<u8").view(np.uint8).reshape(longs.shape[:-1] + (-1,)),
+                           axis=-1, bitorder="little")
+    entries = stream[..., :count * bits].reshape(longs.shape[:-1] + (count, bits))
+    weights = (1 << np.arange(bits, dtype=np.uint32)).astype(np.uint32)
+    return entries.astype(np.uint32) @ weights
+
+
+def padded_length(bits, count=BLOCK_COUNT):
+    per_long = 64 // bits
+    return -(-count // per_long)
+
+
+def spanning_length(bits, count=BLOCK_COUNT):
+    return -(-count * bits // 64)
+
+
+def layout_for(length, palette_size, count=BLOCK_COUNT):
+    """(bits, spanning) of packed data of the given length, or None if it matches neither layout.
+
+    The layout follows from the length alone: both agree whenever bits
+    divides 64, and otherwise differ in how many longs they need. Bits are
+    normally set by the palette size but some tools write more.
+    """
+    needed = bits_for(palette_size)
+    for bits in range(needed, 33):
+        if length == padded_length(bits, count):
+            return bits, False
+        if length == spanning_length(bits, count):
+            return bits, True
+    return None
+
+
+def unpack(data, palette_size, count=BLOCK_COUNT):
+    """Palette indices of one packed array, in y, z, x order; None if its length fits no layout."""
+    layout = layout_for(len(data), palette_size, count)
+    if layout is None:
+        return None
+    bits, spanning = layout
+    return (unpack_spanning if spanning else unpack_padded)(data, bits, count)
+
+
+def state_name(entry):
+    """'minecraft:oak_log[axis=y]' for a palette entry."""
+    if not isinstance(entry, Compound):
+        return str(entry)
+    name = str.__str__(entry.get("Name", String("?")))
+    properties = entry.get("Properties")
+    if properties:
+        name += "[" + ",".join(f"{key}={str.__str__(value)}" for key, value in sorted(properties.items())) + "]"
+    return name
+
+
+class SectionBlocks:
+    """Decoded blocks of one 16x16x16 chunk section.
+
+    indices is a (16, 16, 16) array of palette indices addressed as
+    [y, z, x]; an index past the end of the palette (corrupt data) maps to
+    UNKNOWN_STATE, the last entry of names. Names are only formatted when
+    asked for, which would otherwise take longer than the decoding.
+    """
+
+    def __init__(self, y, palette, indices, bits=0, spanning=False):
+        self.y = y
+        self.palette = palette
+        self.indices = indices
+        self.bits = bits
+        self.spanning = spanning
+        self._names = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names = [state_name(entry) for entry in self.palette] + [UNKNOWN_STATE]
+        return self._names
+
+    def counts(self):
+        """Number of blocks of each palette entry, in palette order."""
+        return np.bincount(self.indices.ravel(), minlength=len(self.palette) + 1)
+
+    def layer(self, y):
+        return self.indices[y]
+
+
+def _section_parts(section):
+    """(palette, packed data) of a section, None if it has no block states."""
+    states = section.get("block_states")
+    if isinstance(states, Compound):
+        return states.get("palette"), states.get("data")
+    if "Palette" in section:
+        return section.get("Palette"), section.get("BlockStates")
+    return None
+
+
+def is_section(tag):
+    return isinstance(tag, Compound) and _section_parts(tag) is not None
+
+
+def chunk_sections(chunk):
+    """The sections list of a chunk root (1.18+ or older Level layout), or None."""
+    if not isinstance(chunk, Compound):
+        return None
+    sections = chunk.get("sections")
+    if sections is None and isinstance(chunk.get("Level"), Compound):
+        sections = chunk["Level"].get("Sections")
+    return sections if isinstance(sections, List) else None
+
+
+def decode_sections(sections):
+    """Decode the block states of many sections at once, skipping sections without any.
+
+    Sections are grouped by their packed layout and each group is unpacked
+    with one set of array operations, so a whole region decodes in a
+    fraction of a second.
+    """
+    decoded = []
+    groups = {}
+    for section in sections:
+        parts = _section_parts(section) if isinstance(section, Compound) else None
+        if parts is None or not parts[0]:
+            continue
+        palette, data = parts
+        blocks = SectionBlocks(int(section.get("Y", 0)), palette, None)
+        decoded.append(blocks)
+        if data is None or not len(data):
+            # A single-entry palette has no data: the whole section is that block
+            blocks.indices = np.zeros((SECTION_SIZE,) * 3, dtype=np.uint32)
+            continue
+        layout = layout_for(len(data), len(palette))
+        if layout is None:
+            blocks.indices = np.full((SECTION_SIZE,) * 3, len(palette), dtype=np.uint32)
+            continue
+        blocks.bits, blocks.spanning = layout
+        groups.setdefault(layout, []).append((blocks, data))
+
+    for (bits, spanning), members in groups.items():
+        unpack_group = unpack_spanning if spanning else unpack_padded
+        for start in range(0, len(members), DECODE_BATCH):
+            batch = members[start:start + DECODE_BATCH]
+            indices = unpack_group(np.stack([np.asarray(data) for _, data in batch]), bits)
+            unknown = np.array([len(blocks.palette) for blocks, _ in batch], dtype=np.uint32)
+            np.minimum(indices, unknown[:, None], out=indices)
+            for blocks, section_indices in zip((blocks for blocks, _ in batch), indices):
+                blocks.indices = section_indices.reshape((SECTION_SIZE,) * 3)
+    return decoded
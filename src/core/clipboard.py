@@ -0,0 +1,45 @@
+import io
+from nbtlib import File, parse_nbt
+from nbtlib.tag import Compound, List, String, ByteArray
+from core.lazy_nbt import parse_document
+
+# Binary clipboard flavor: uncompressed NBT, so a paste costs one copy and a decode
+MIME_TYPE = "application/x-minecraft-nbt"
+
+
+def encode_tags(entries):
+    """Serialize (name, tag) pairs as uncompressed binary NBT; name is None for list entries.
+
+    Tags are written as they are now, so later edits do not change what
+    was copied. Compounds that were never decoded are copied byte-for-byte.
+    """
+    names = List[String]([String(name or "") for name, _ in entries])
+    named = ByteArray([name is not None for name, _ in entries])
+    tags = Compound({str(position): tag for position, (_, tag) in enumerate(entries)})
+    buffer = io.BytesIO()
+    File({"names": names, "named": named, "tags": tags}, root_name="").write(buffer)
+    return buffer.getvalue()
+
+
+def decode_tags(data):
+    """Inverse of encode_tags(); the tags are new objects, owned by the caller."""
+    root = parse_document(bytes(data))
+    tags = root["tags"]
+    return [(str.__str__(name) if named else None, tags[str(position)])
+            for position, (name, named) in enumerate(zip(root["names"], root["named"]))]
+
+
+def entries_to_snbt(entries):
+    """Text flavor of copied tags: SNBT, one tag per line."""
+    return "\n".join(tag.snbt() for _, tag in entries)
+
+
+def parse_snbt(text):
+    """(name, tag) pairs from SNBT text, one tag per non-empty line, or the whole text as one tag."""
+    try:
+        return [(None, parse_nbt(text))]
+    except Exception:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if len(lines) < 2:
+            raise
+        return [(None, parse_nbt(line)) for line in lines]
@@ -0,0 +1,32 @@
+from nbtlib.tag import Byte, Short, Int, Long, Float, Double, String, List, Numeric
+
+# Types a tag can be converted to, by the name shown in menus
+CONVERSIONS = {"Byte": Byte, "Short": Short, "Int": Int, "Long": Long,
+               "Float": Float, "Double": Double, "String": String}
+
+
+def convert_tag(tag, tag_type):
+    """Return tag as tag_type; a list converts every entry.
+
+    Numbers convert between each other (floats are truncated) and to and
+    from String. Raises ValueError, OutOfRange or TypeError if a value does
+    not fit.
+    """
+    if isinstance(tag, List):
+        return List[tag_type]([convert_tag(entry, tag_type) for entry in tag])
+    if type(tag) is tag_type:
+        return tag
+    if isinstance(tag, String):
+        text = str.__str__(tag).strip()
+        if issubclass(tag_type, (Float, Double)):
+            return tag_type(float(text))
+        try:
+            return tag_type(int(text))
+        except ValueError:
+            return tag_type(int(float(text)))
+    if isinstance(tag, Numeric):
+        value = tag.unpack()
+        if tag_type is String:
+            return String(str(value))
+        return tag_type(value if issubclass(tag_type, (Float, Double)) else int(value))
+    raise TypeError(f"{type(tag).__name__} cannot be converted to {tag_type.__name__}")
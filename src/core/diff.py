@@ -0,0 +1,323 @@
+import hashlib
+import struct
+from difflib import SequenceMatcher
+from nbtlib.tag import Compound, List, Array, String
+from core.lazy_nbt import LazyCompound, compound_items, parse_document
+from core.region import RegionFile
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# Lists up to this length are aligned by their entries' hashes, so an
+# insertion is reported as one added entry rather than every later index
+# changing; longer ones are compared index by index
+ALIGN_LIMIT = 20000
+CANCEL_CHECK_INTERVAL = 1000
+
+_LENGTH = struct.Struct(">I")
+
+
+class DiffCancelled(Exception):
+    """Raised when a diff is cancelled."""
+
+
+class DiffEntry:
+    """A difference between two documents.
+
+    kind is ADDED (only right exists), REMOVED (only left exists) or CHANGED.
+    Paths are key tuples into each document; a list entry can sit at
+    different indices on both sides, and the missing side's path is None.
+    """
+
+    __slots__ = ("kind", "left_path", "right_path", "left", "right")
+
+    def __init__(self, kind, left_path, right_path, left, right):
+        self.kind = kind
+        self.left_path = left_path
+        self.right_path = right_path
+        self.left = left
+        self.right = right
+
+    @property
+    def path(self):
+        return self.left_path if self.left_path is not None else self.right_path
+
+    def __repr__(self):
+        return f"DiffEntry({self.kind}, {self.left_path!r}, {self.right_path!r})"
+
+
+def _scalar_bytes(tag):
+    text = str.__str__(tag) if isinstance(tag, String) else repr(tag.unpack() if hasattr(tag, "unpack") else tag)
+    data = text.encode("utf-8", "surrogatepass")
+    return bytes((getattr(tag, "tag_id", 0),)) + _LENGTH.pack(len(data)) + data
+
+
+def _kind(tag):
+    if isinstance(tag, Compound):
+        return Compound
+    if isinstance(tag, List):
+        return List, getattr(tag, "subtype", None)
+    return type(tag)
+
+
+class HashCache:
+    """Merkle hashes of the subtrees of one document, cached per container.
+
+    A container's hash covers its type and, in order, its entries' names and
+    hashes, so equal hashes mean equal subtrees and a diff can skip them
+    without looking inside. Compounds that were never decoded (see
+    core.lazy_nbt) are hashed from their raw bytes and region chunks that
+    were never loaded from their compressed bytes, without decoding them;
+    such a hash differs from the structural one, which only costs a diff a
+    look inside, never a wrong result. The cache listens
+    to the document's edit notifications and drops the hashes of the edited
+    container and everything above it, and of every subtree an edit
+    replaced or removed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # id(container) -> [container, hash or None once edited, ids of the child
+        # containers hashed with it]; the container is kept so its id stays unique
+        self.hashes = {}
+
+    def digest(self, tag):
+        """Hash of a tag and everything below it."""
+        if isinstance(tag, LazyCompound) and not tag.loaded:
+            return hashlib.blake2b(b"R" + tag.document.raw(tag.slot), digest_size=16).digest()
+        if not isinstance(tag, (Compound, List, Array, RegionFile)):
+            return hashlib.blake2b(_scalar_bytes(tag), digest_size=16).digest()
+        cached = self.hashes.get(id(tag))
+        if cached is not None and cached[0] is tag and cached[1] is not None:
+            return cached[1]
+        children = []
+        value = self._compute(tag, children)
+        self.hashes[id(tag)] = [tag, value, children]
+        return value
+
+    def _compute(self, tag, children):
+        h = hashlib.blake2b(digest_size=16)
+        if isinstance(tag, Array):
+            h.update(b"A" + bytes((tag.tag_id,)))
+            h.update(tag.astype(tag.dtype.newbyteorder(">"), copy=False).tobytes())
+        elif isinstance(tag, Compound):
+            h.update(b"C")
+            for name, value in compound_items(tag):
+                encoded = name.encode("utf-8", "surrogatepass")
+                h.update(_LENGTH.pack(len(encoded)) + encoded)
+                h.update(self._entry_bytes(value, children))
+        elif isinstance(tag, List):
+            h.update(b"L" + bytes((getattr(tag.subtype, "tag_id", 0),)))
+            for value in tag:
+                h.update(self._entry_bytes(value, children))
+        else:
+            h.update(b"F")
+            for chunk in tag.chunks:
+                h.update(_LENGTH.pack(chunk.index) + self.chunk_digest(chunk))
+        return h.digest()
+
+    def _entry_bytes(self, value, children):
+        if isinstance(value, (Compound, List, Array)):
+            value_hash = self.digest(value)
+            # Undecoded compounds are hashed from their bytes and never cached
+            if id(value) in self.hashes:
+                children.append(id(value))
+            return b"\x01" + value_hash
+        return b"\x00" + _scalar_bytes(value)
+
+    def chunk_digest(self, chunk):
+        """Hash of a region chunk; loaded chunks are hashed from their (possibly edited) data."""
+        cached = self.hashes.get(id(chunk))
+        if cached is not None and cached[0] is chunk and cached[1] is not None:
+            return cached[1]
+        if chunk.loaded:
+            value = self.digest(chunk.nbt_data)
+        else:
+            compression, payload = chunk.region.read_chunk_payload(chunk)
+            value = hashlib.blake2b(b"Z" + bytes((compression,)) + payload, digest_size=16).digest()
+        self.hashes[id(chunk)] = [chunk, value, ()]
+        return value
+
+    def clear(self):
+        self.hashes.clear()
+
+    # Document listener interface
+
+    def _invalidate(self, parent_path):
+        """Mark the hashes along parent_path stale and return the edited container, or None."""
+        tag = self.root
+        self._stale(tag)
+        for key in parent_path:
+            if isinstance(tag, RegionFile):
+                chunk = tag.chunks[key]
+                self._stale(chunk)
+                if not chunk.loaded:
+                    return None
+                tag = chunk.nbt_data
+            else:
+                try:
+                    tag = tag[key]
+                except (KeyError, IndexError, TypeError):
+                    return None
+            self._stale(tag)
+        return tag
+
+    def _stale(self, tag):
+        # The entry stays, with its children, until the subtree leaves the document
+        cached = self.hashes.get(id(tag))
+        if cached is not None:
+            cached[1] = None
+
+    def _evict_removed(self, parent_path):
+        """Invalidate, then forget the subtrees that are no longer children of the edited container."""
+        container = self._invalidate(parent_path)
+        cached = self.hashes.get(id(container)) if container is not None else None
+        if not cached or not cached[2]:
+            return
+        if isinstance(container, Compound):
+            current = {id(value) for _, value in compound_items(container)}
+        else:
+            current = {id(value) for value in container}
+        kept = []
+        for child in cached[2]:
+            if child in current:
+                kept.append(child)
+            else:
+                self._evict(child)
+        cached[2] = kept
+
+    def _evict(self, key):
+        entry = self.hashes.pop(key, None)
+        if entry is not None:
+            for child in entry[2]:
+                self._evict(child)
+
+    def tag_changed(self, parent_path, key):
+        self._evict_removed(parent_path)
+
+    def tag_inserted(self, parent_path, key, position):
+        self._invalidate(parent_path)
+
+    def tag_removed(self, parent_path, key, position):
+        self._evict_removed(parent_path)
+
+    def tag_renamed(self, parent_path, old_name, new_name):
+        self._invalidate(parent_path)
+
+    def tags_changed(self, parent_path, keys):
+        self._evict_removed(parent_path)
+
+    def tags_inserted(self, parent_path, keys, positions):
+        self._invalidate(parent_path)
+
+    def tags_removed(self, parent_path, keys, positions):
+        self._evict_removed(parent_path)
+
+
+class _Differ:
+    def __init__(self, left_cache, right_cache, cancelled, limit):
+        self.left_cache = left_cache
+        self.right_cache = right_cache
+        self.cancelled = cancelled
+        self.limit = limit
+        self.entries = []
+        self.steps = 0
+
+    def add(self, kind, left_path, right_path, left, right):
+        self.entries.append(DiffEntry(kind, left_path, right_path, left, right))
+        if self.limit is not None and len(self.entries) >= self.limit:
+            raise _LimitReached
+
+    def check(self):
+        self.steps += 1
+        if self.cancelled is not None and self.steps % CANCEL_CHECK_INTERVAL == 0 and self.cancelled():
+            raise DiffCancelled()
+
+    def compare(self, left, right, left_path, right_path):
+        self.check()
+        if _kind(left) != _kind(right):
+            self.add(CHANGED, left_path, right_path, left, right)
+            return
+        if isinstance(left, (Compound, List, Array, RegionFile)):
+            if self.left_cache.digest(left) == self.right_cache.digest(right):
+                return
+        elif _scalar_bytes(left) == _scalar_bytes(right):
+            return
+        if isinstance(left, Compound):
+            self.compare_compounds(left, right, left_path, right_path)
+        elif isinstance(left, List):
+            self.compare_lists(left, right, left_path, right_path)
+        elif isinstance(left, RegionFile):
+            self.compare_regions(left, right, left_path, right_path)
+        else:
+            self.add(CHANGED, left_path, right_path, left, right)
+
+    def compare_compounds(self, left, right, left_path, right_path):
+        left_items = compound_items(left)
+        right_items = dict(compound_items(right))
+        for name, value in left_items:
+            if name in right_items:
+                self.compare(value, right_items.pop(name), left_path + (name,), right_path + (name,))
+            else:
+                self.add(REMOVED, left_path + (name,), None, value, None)
+        for name, value in right_items.items():
+            self.add(ADDED, None, right_path + (name,), None, value)
+
+    def compare_lists(self, left, right, left_path, right_path):
+        if len(left) > ALIGN_LIMIT or len(right) > ALIGN_LIMIT:
+            opcodes = [("replace", 0, len(left), 0, len(right))]
+        else:
+            left_hashes = [self.left_cache.digest(value) for value in left]
+            right_hashes = [self.right_cache.digest(value) for value in right]
+            opcodes = SequenceMatcher(None, left_hashes, right_hashes, autojunk=False).get_opcodes()
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                continue
+            paired = min(i2 - i1, j2 - j1)
+            for offset in range(paired):
+                self.compare(left[i1 + offset], right[j1 + offset], left_path + (i1 + offset,), right_path + (j1 + offset,))
+            for i in range(i1 + paired, i2):
+                self.add(REMOVED, left_path + (i,), None, left[i], None)
+            for j in range(j1 + paired, j2):
+                self.add(ADDED, None, right_path + (j,), None, right[j])
+
+    def compare_regions(self, left, right, left_path, right_path):
+        # Chunks are matched by their slot (coordinates), paths use their row
+        right_rows = {chunk.index: row for row, chunk in enumerate(right.chunks)}
+        for row, chunk in enumerate(left.chunks):
+            other_row = right_rows.pop(chunk.index, None)
+            if other_row is None:
+                self.add(REMOVED, left_path + (row,), None, chunk, None)
+                continue
+            other = right.chunks[other_row]
+            self.check()
+            if self.left_cache.chunk_digest(chunk) == self.right_cache.chunk_digest(other):
+                continue
+            self.compare(_chunk_data(chunk), _chunk_data(other), left_path + (row,), right_path + (other_row,))
+        for index, row in sorted(right_rows.items(), key=lambda item: item[1]):
+            self.add(ADDED, None, right_path + (row,), None, right.chunks[row])
+
+
+class _LimitReached(Exception):
+    pass
+
+
+def _chunk_data(chunk):
+    # Unloaded chunks are parsed for the comparison only, leaving the region untouched
+    return chunk.nbt_data if chunk.loaded else parse_document(chunk.region.read_chunk_data(chunk))
+
+
+def diff(left, right, left_cache=None, right_cache=None, cancelled=None, limit=None):
+    """List the differences between two tags, documents or region files.
+
+    Pass the HashCache of a document that stays open to reuse its hashes
+    between diffs. Stops after limit entries; cancelled() is polled and
+    raises DiffCancelled when it returns True.
+    """
+    differ = _Differ(left_cache or HashCache(left), right_cache or HashCache(right), cancelled, limit)
+    try:
+        differ.compare(left, right, (), ())
+    except _LimitReached:
+        pass
+    return differ.entries
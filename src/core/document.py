@@ -0,0 +1,365 @@
+import os
+from nbtlib.tag import Compound, List
+from core import perf
+from core.region import RegionFile
+from core.loader import load_nbt
+from core.saver import NBTSaveJob, DEFAULT_COMPRESSION_LEVEL
+from core.nbt_path import format_path, parse_path
+from core.history import History, DEFAULT_HISTORY_LIMIT, SetValue, InsertTag, RemoveTag, RenameTag
+
+class NBTDocument:
+    """An open NBT or region file with undoable, path-addressed edits.
+
+    This is the library API and does not depend on Qt. Changes are reported
+    to the objects in listeners (tag_changed, tag_inserted, tag_removed and
+    tag_renamed), which is how the editor keeps its views in sync. Edits of
+    many children of one container are reported with a single tags_changed,
+    tags_inserted or tags_removed call.
+    """
+
+    def __init__(self, history_limit=DEFAULT_HISTORY_LIMIT):
+        self.current_file = None
+        self.nbt_data = None
+        self.history = History(history_limit)
+        # None keeps the format the file was loaded with
+        self.compression = None
+        self.compression_level = DEFAULT_COMPRESSION_LEVEL
+        self.listeners = []
+        self.search_index = None
+        self.hash_cache = None
+
+    @classmethod
+    def open(cls, file_path):
+        """Load a file into a new document."""
+        document = cls()
+        document.load_file(file_path)
+        return document
+
+    def load_file(self, file_path):
+        """Load an NBT file."""
+        with perf.span("load_file", os.path.basename(file_path)):
+            self.set_document(file_path, load_nbt(file_path))
+
+    def set_document(self, file_path, nbt_data, search_index=None):
+        """Replace the current document with already parsed data.
+
+        A search index built off-thread for nbt_data may be passed along;
+        otherwise it is built on the first search.
+        """
+        self.close()
+        self.current_file = file_path
+        self.nbt_data = nbt_data
+        self.history.clear()
+        self._set_search_index(search_index)
+
+    def _set_search_index(self, search_index):
+        if self.search_index in self.listeners:
+            self.listeners.remove(self.search_index)
+        self.search_index = search_index
+        if search_index is not None:
+            self.listeners.append(search_index)
+
+    def search(self, text, names=True, values=True, limit=10000):
+        """Return paths of tags whose name and/or value contains text."""
+        if self.nbt_data is None:
+            return []
+        with perf.span("search", repr(text)):
+            if self.search_index is None:
+                from core.search_index import SearchIndex
+                with perf.span("build index"):
+                    self._set_search_index(SearchIndex(self.nbt_data))
+            return self.search_index.search(text, names, values, limit)
+
+    def query(self, text, limit=None):
+        """Return paths of tags matching a path query such as 'Inventory[?Count >= 64].id'.
+
+        See core.query for the syntax; raises QueryError (a ValueError) for
+        an invalid query. The search index is used when there is one.
+        """
+        if self.nbt_data is None:
+            return []
+        from core.query import compile_query
+        with perf.span("query", repr(text)):
+            query = compile_query(text)
+            return [path for path, _ in query.evaluate(self.nbt_data, self.search_index, limit)]
+
+    def diff(self, other, cancelled=None, limit=None):
+        """Differences from this document to other, a tag, File or RegionFile (see core.diff).
+
+        Subtree hashes of this document are kept between calls and dropped
+        as it is edited, so diffing again after small edits is cheap.
+        """
+        from core.diff import HashCache, diff
+        if self.hash_cache is None:
+            self.hash_cache = HashCache(self.nbt_data)
+            self.listeners.append(self.hash_cache)
+        return diff(self.nbt_data, other, self.hash_cache, cancelled=cancelled, limit=limit)
+
+    def describe_path(self, path):
+        """Human readable form of a path, naming region chunks by coordinates."""
+        if isinstance(self.nbt_data, RegionFile) and path:
+            chunk = self.nbt_data.chunks[path[0]]
+            rest = format_path(path[1:])
+            return f"Chunk [{chunk.x}, {chunk.z}]" + (f" / {rest}" if rest else "")
+        return format_path(path)
+        
+    def save_file(self):
+        """Save the current NBT data to the current file."""
+        self._run_save(self.prepare_save())
+        
+    def save_file_as(self, file_path):
+        """Save the current NBT data to a new file."""
+        self._run_save(self.prepare_save(file_path))
+
+    def prepare_save(self, file_path=None):
+        """Snapshot the document into a save job whose run() may execute off-thread.
+
+        Call job.commit() on this thread once run() succeeded, or job.abort()
+        if it failed.
+        """
+        if file_path is None:
+            if not self.current_file or not self.nbt_data:
+                raise ValueError("No file is currently open")
+            file_path = self.current_file
+        if not self.nbt_data:
+            raise ValueError("No NBT data to save")
+        if isinstance(self.nbt_data, RegionFile):
+            return self.nbt_data.prepare_save(file_path, self.compression or "zlib", self.compression_level)
+        compression = self.compression or getattr(self.nbt_data, "compression", None)
+        if compression is None:
+            compression = "gzip" if self.nbt_data.gzipped else "none"
+        return NBTSaveJob(self.nbt_data, file_path, compression, self.compression_level)
+
+    def commit_save(self, job):
+        """Finish a save job on the owning thread."""
+        job.commit()
+        self.current_file = job.file_path
+
+    def _run_save(self, job):
+        try:
+            with perf.span("save_file", os.path.basename(job.file_path)):
+                job.run()
+        except BaseException:
+            job.abort()
+            raise
+        self.commit_save(job)
+        
+    def close(self):
+        """Release resources held by the current document."""
+        if isinstance(self.nbt_data, RegionFile):
+            self.nbt_data.close()
+        self.nbt_data = None
+        self._set_search_index(None)
+        if self.hash_cache is not None:
+            self.listeners.remove(self.hash_cache)
+            self.hash_cache = None
+
+    def set_history_limit(self, max_bytes):
+        """Set the approximate memory budget of the undo history."""
+        self.history.max_bytes = max_bytes
+        self.history.trim()
+
+    def execute(self, operation):
+        """Apply an operation and record it for undo."""
+        operation.apply(self)
+        self.history.push(operation)
+            
+    def undo(self):
+        """Undo last change."""
+        operation = self.history.pop_undo()
+        if operation:
+            operation.revert(self)
+            
+    def redo(self):
+        """Redo last undone change."""
+        operation = self.history.pop_redo()
+        if operation:
+            operation.apply(self)
+
+    def resolve(self, path):
+        """Return the tag at path, a sequence of compound keys and list indices."""
+        tag = self.nbt_data
+        for key in path:
+            tag = tag[key]
+        return tag
+
+    # Path API; paths are key tuples or dotted strings such as "Data.Player.Inventory[3]"
+
+    def get(self, path):
+        """Return the tag at path."""
+        return self.resolve(_as_path(path))
+
+    def set(self, path, value):
+        """Set (or create, in a compound) the tag at path, as one undoable step."""
+        path = _as_path(path)
+        parent_path, key = path[:-1], path[-1]
+        container = self.resolve(parent_path)
+        if isinstance(container, Compound) and key not in container:
+            self.execute(InsertTag(parent_path, key, value))
+        else:
+            self.execute(SetValue(parent_path, key, value))
+
+    def delete(self, path):
+        """Remove the tag at path, as one undoable step."""
+        path = _as_path(path)
+        self.execute(RemoveTag(path[:-1], path[-1]))
+
+    def rename(self, path, new_name):
+        """Rename the compound entry at path, as one undoable step."""
+        path = _as_path(path)
+        self.execute(RenameTag(path[:-1], path[-1], new_name))
+
+    def set_tag(self, parent_path, key, value):
+        """Replace a child tag and return the previous value."""
+        container = self.resolve(parent_path)
+        old_value = container[key]
+        container[key] = value
+        self._changed(parent_path, "tag_changed", parent_path, key)
+        return old_value
+
+    def insert_tag(self, parent_path, key, value, position=None):
+        """Insert a child tag; position orders compound keys (default: last)."""
+        container = self.resolve(parent_path)
+        if isinstance(container, List):
+            container.insert(key, value)
+            position = key
+        else:
+            if key in container:
+                raise KeyError(f"Tag '{key}' already exists")
+            container[key] = value
+            if position is None or position >= len(container) - 1:
+                position = len(container) - 1
+            else:
+                _move_key(container, key, position)
+        self._changed(parent_path, "tag_inserted", parent_path, key, position)
+
+    def remove_tag(self, parent_path, key):
+        """Remove a child tag and return (value, position)."""
+        container = self.resolve(parent_path)
+        if isinstance(container, List):
+            position = key
+        else:
+            position = list(container).index(key)
+        value = container.pop(key)
+        self._changed(parent_path, "tag_removed", parent_path, key, position)
+        return value, position
+
+    def set_tags(self, parent_path, values):
+        """Replace several children of one container, given as a key to tag mapping.
+
+        Returns the previous values. Nothing is changed if one of the values
+        does not fit.
+        """
+        container = self.resolve(parent_path)
+        old_values = {}
+        try:
+            for key, value in values.items():
+                old_value = container[key]
+                container[key] = value
+                old_values[key] = old_value
+        except Exception:
+            for key, old_value in old_values.items():
+                container[key] = old_value
+            raise
+        self._changed(parent_path, "tags_changed", parent_path, list(values))
+        return old_values
+
+    def insert_tags(self, parent_path, entries):
+        """Insert several children of one container in one pass.
+
+        entries are (key, value, position) tuples sorted by position, each
+        position counted once all of them are in place; a list entry's key
+        is its position.
+        """
+        container = self.resolve(parent_path)
+        positions = [position for _, _, position in entries]
+        if isinstance(container, List):
+            keys = positions
+            values = [container.cast_item(value) for _, value, _ in entries]
+            current = list.__getitem__(container, slice(None))
+        else:
+            keys = [key for key, _, _ in entries]
+            for key in keys:
+                if key in container:
+                    raise KeyError(f"Tag '{key}' already exists")
+            if len(set(keys)) != len(keys):
+                raise KeyError("Tag names must be unique")
+            values = list(zip(keys, (value for _, value, _ in entries)))
+            current = list(container.items())
+        merged = []
+        taken = 0
+        for inserted, (position, value) in enumerate(zip(positions, values)):
+            # Existing entries that end up before this one
+            end = position - inserted
+            if not taken <= end <= len(current):
+                raise IndexError(f"Position {position} is out of range")
+            merged.extend(current[taken:end])
+            merged.append(value)
+            taken = end
+        merged.extend(current[taken:])
+        if isinstance(container, List):
+            list.__setitem__(container, slice(None), merged)
+        else:
+            container.clear()
+            dict.update(container, merged)
+        self._changed(parent_path, "tags_inserted", parent_path, keys, positions)
+
+    def remove_tags(self, parent_path, keys):
+        """Remove several children of one container in one pass.
+
+        Returns their (key, value, position) entries sorted by position, the
+        form insert_tags() takes to put them back.
+        """
+        container = self.resolve(parent_path)
+        if isinstance(container, List):
+            positions = sorted(set(keys))
+            if positions and (positions[0] < 0 or positions[-1] >= len(container)):
+                raise IndexError("List index out of range")
+            current = list.__getitem__(container, slice(None))
+            entries = [(position, current[position], position) for position in positions]
+            removed = set(positions)
+            list.__setitem__(container, slice(None),
+                             [value for position, value in enumerate(current) if position not in removed])
+        else:
+            order = {key: position for position, key in enumerate(container)}
+            for key in keys:
+                if key not in order:
+                    raise KeyError(key)
+            entries = sorted(((key, container[key], order[key]) for key in set(keys)), key=lambda entry: entry[2])
+            for key, _, _ in entries:
+                container.pop(key)
+        self._changed(parent_path, "tags_removed", parent_path,
+                      [key for key, _, _ in entries], [position for _, _, position in entries])
+        return entries
+
+    def rename_tag(self, parent_path, old_name, new_name):
+        """Rename a compound key, keeping its position."""
+        container = self.resolve(parent_path)
+        if new_name in container:
+            raise KeyError(f"Tag '{new_name}' already exists")
+        position = list(container).index(old_name)
+        container[new_name] = container.pop(old_name)
+        _move_key(container, new_name, position)
+        self._changed(parent_path, "tag_renamed", parent_path, old_name, new_name)
+
+    def _changed(self, parent_path, event, *args):
+        if isinstance(self.nbt_data, RegionFile) and parent_path:
+            self.nbt_data.mark_dirty(self.nbt_data.chunks[parent_path[0]])
+        for listener in self.listeners:
+            getattr(listener, event)(*args)
+
+
+def _as_path(path):
+    path = parse_path(path) if isinstance(path, str) else tuple(path)
+    if not path:
+        raise ValueError("The path must name a tag below the root")
+    return path
+
+
+def _move_key(compound, key, position):
+    """Reorder a compound so that key sits at position."""
+    items = list(compound.items())
+    current = next(i for i, (name, _) in enumerate(items) if name == key)
+    items.insert(position, items.pop(current))
+    compound.clear()
+    dict.update(compound, items)
@@ -0,0 +1,285 @@
+from collections import deque
+from nbtlib.tag import Array
+from core.lazy_nbt import LazyCompound
+
+DEFAULT_HISTORY_LIMIT = 64 * 1024 * 1024
+
+
+def estimate_size(tag):
+    """Rough number of bytes retained by a tag, used for the history memory cap."""
+    total = 0
+    stack = [tag]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, Array):
+            total += value.nbytes + 96
+        elif isinstance(value, LazyCompound) and not value.loaded:
+            # Undecoded: only a view of the document buffer is retained
+            document, slot = value.document, value.slot
+            total += 64 + document.ends[slot] - document.starts[slot]
+        elif isinstance(value, str):
+            total += len(value) + 56
+        elif isinstance(value, dict):
+            total += 64 + 72 * len(value)
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            total += 56 + 8 * len(value)
+            stack.extend(value)
+        else:
+            total += 32
+    return total
+
+
+class Operation:
+    """A reversible edit addressed by a path of keys from the document root.
+
+    Operations never touch the tree model directly; they call the handler's
+    mutation primitives, which update the data and notify listeners.
+    """
+
+    size = 0
+
+    def apply(self, handler):
+        raise NotImplementedError
+
+    def revert(self, handler):
+        raise NotImplementedError
+
+
+class SetValue(Operation):
+    def __init__(self, parent_path, key, value):
+        self.parent_path = tuple(parent_path)
+        self.key = key
+        self.value = value
+        self.old_value = None
+
+    def apply(self, handler):
+        self.old_value = handler.set_tag(self.parent_path, self.key, self.value)
+        self.size = estimate_size(self.value) + estimate_size(self.old_value)
+
+    def revert(self, handler):
+        handler.set_tag(self.parent_path, self.key, self.old_value)
+
+
+class InsertTag(Operation):
+    def __init__(self, parent_path, key, value, position=None):
+        self.parent_path = tuple(parent_path)
+        self.key = key
+        self.value = value
+        self.position = position
+
+    def apply(self, handler):
+        handler.insert_tag(self.parent_path, self.key, self.value, self.position)
+        self.size = estimate_size(self.value)
+
+    def revert(self, handler):
+        handler.remove_tag(self.parent_path, self.key)
+
+
+class RemoveTag(Operation):
+    def __init__(self, parent_path, key):
+        self.parent_path = tuple(parent_path)
+        self.key = key
+        self.value = None
+        self.position = None
+
+    def apply(self, handler):
+        self.value, self.position = handler.remove_tag(self.parent_path, self.key)
+        self.size = estimate_size(self.value)
+
+    def revert(self, handler):
+        handler.insert_tag(self.parent_path, self.key, self.value, self.position)
+
+
+class RenameTag(Operation):
+    def __init__(self, parent_path, old_name, new_name):
+        self.parent_path = tuple(parent_path)
+        self.old_name = old_name
+        self.new_name = new_name
+        self.size = len(old_name) + len(new_name) + 128
+
+    def apply(self, handler):
+        handler.rename_tag(self.parent_path, self.old_name, self.new_name)
+
+    def revert(self, handler):
+        handler.rename_tag(self.parent_path, self.new_name, self.old_name)
+
+
+class MoveTag(Operation):
+    """Move a tag; dst_key is interpreted after the source has been removed."""
+
+    def __init__(self, src_parent_path, src_key, dst_parent_path, dst_key, position=None):
+        self.src_parent_path = tuple(src_parent_path)
+        self.src_key = src_key
+        self.dst_parent_path = tuple(dst_parent_path)
+        self.dst_key = dst_key
+        self.position = position
+        self.src_position = None
+        self.size = 128
+
+    def apply(self, handler):
+        value, self.src_position = handler.remove_tag(self.src_parent_path, self.src_key)
+        handler.insert_tag(self.dst_parent_path, self.dst_key, value, self.position)
+
+    def revert(self, handler):
+        value, _ = handler.remove_tag(self.dst_parent_path, self.dst_key)
+        handler.insert_tag(self.src_parent_path, self.src_key, value, self.src_position)
+
+
+class SetValues(Operation):
+    """Replace several children of one container."""
+
+    def __init__(self, parent_path, values):
+        self.parent_path = tuple(parent_path)
+        self.values = dict(values)
+        self.old_values = None
+
+    def apply(self, handler):
+        self.old_values = handler.set_tags(self.parent_path, self.values)
+        self.size = 64 + sum(estimate_size(value) for value in self.values.values()) + \
+            sum(estimate_size(value) for value in self.old_values.values())
+
+    def revert(self, handler):
+        handler.set_tags(self.parent_path, self.old_values)
+
+
+class InsertTags(Operation):
+    """Insert several children of one container; see NBTDocument.insert_tags()."""
+
+    def __init__(self, parent_path, entries):
+        self.parent_path = tuple(parent_path)
+        self.entries = list(entries)
+
+    def apply(self, handler):
+        handler.insert_tags(self.parent_path, self.entries)
+        self.size = 64 + sum(estimate_size(value) + 16 for _, value, _ in self.entries)
+
+    def revert(self, handler):
+        handler.remove_tags(self.parent_path, [key for key, _, _ in self.entries])
+
+
+class RemoveTags(Operation):
+    """Remove several children of one container."""
+
+    def __init__(self, parent_path, keys):
+        self.parent_path = tuple(parent_path)
+        self.keys = list(keys)
+        self.entries = None
+
+    def apply(self, handler):
+        self.entries = handler.remove_tags(self.parent_path, self.keys)
+        self.size = 64 + sum(estimate_size(value) + 16 for _, value, _ in self.entries)
+
+    def revert(self, handler):
+        handler.insert_tags(self.parent_path, self.entries)
+
+
+def _move_children(handler, parent_path, moves):
+    """Move children of one container to new positions; returns the moves that undo it."""
+    entries = handler.remove_tags(parent_path, list(moves))
+    placed = []
+    undo_moves = {}
+    for key, value, position in entries:
+        target = moves[key]
+        # List entries are keyed by their position
+        new_key = target if isinstance(key, int) else key
+        placed.append((new_key, value, target))
+        undo_moves[new_key] = position
+    placed.sort(key=lambda entry: entry[2])
+    handler.insert_tags(parent_path, placed)
+    return undo_moves
+
+
+class MoveTags(Operation):
+    """Reorder several children of one container.
+
+    moves maps each key to its new position, counted after the move.
+    """
+
+    def __init__(self, parent_path, moves):
+        self.parent_path = tuple(parent_path)
+        self.moves = dict(moves)
+        self.undo_moves = None
+        self.size = 64 + 32 * len(self.moves)
+
+    def apply(self, handler):
+        self.undo_moves = _move_children(handler, self.parent_path, self.moves)
+
+    def revert(self, handler):
+        _move_children(handler, self.parent_path, self.undo_moves)
+
+
+class Batch(Operation):
+    """Several operations applied, undone and redone as one step.
+
+    If one of them fails, those already applied are reverted before the
+    error propagates, so a batch is all or nothing.
+    """
+
+    def __init__(self, operations):
+        self.operations = list(operations)
+
+    def apply(self, handler):
+        applied = []
+        try:
+            for operation in self.operations:
+                operation.apply(handler)
+                applied.append(operation)
+        except Exception:
+            for operation in reversed(applied):
+                operation.revert(handler)
+            raise
+        self.size = sum(operation.size for operation in self.operations) + 64
+
+    def revert(self, handler):
+        for operation in reversed(self.operations):
+            operation.revert(handler)
+
+
+class History:
+    """Undo/redo log of operations, bounded by an approximate memory budget."""
+
+    def __init__(self, max_bytes=DEFAULT_HISTORY_LIMIT):
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.total_size = 0
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.total_size = 0
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def push(self, operation):
+        """Record an applied operation, dropping the redo branch."""
+        for undone in self.redo_stack:
+            self.total_size -= undone.size
+        self.redo_stack.clear()
+        self.undo_stack.append(operation)
+        self.total_size += operation.size
+        self.trim()
+
+    def trim(self):
+        """Forget the oldest operations until the log fits in max_bytes."""
+        while self.total_size > self.max_bytes and len(self.undo_stack) > 1:
+            self.total_size -= self.undo_stack.popleft().size
+
+    def pop_undo(self):
+        if not self.undo_stack:
+            return None
+        operation = self.undo_stack.pop()
+        self.redo_stack.append(operation)
+        return operation
+
+    def pop_redo(self):
+        if not self.redo_stack:
+            return None
+        operation = self.redo_stack.pop()
+        self.undo_stack.append(operation)
+        return operation
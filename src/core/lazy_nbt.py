@@ -0,0 +1,282 @@
+import struct
+from array import array
+from bisect import bisect_left
+import numpy as np
+from nbtlib import File
+from nbtlib.tag import (Base, Compound, List, String, Byte, Short, Int, Long, Float, Double,
+                        ByteArray, IntArray, LongArray)
+
+TAG_END = 0
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+
+_SCALARS = {1: (Byte, struct.Struct(">b")), 2: (Short, struct.Struct(">h")), 3: (Int, struct.Struct(">i")),
+            4: (Long, struct.Struct(">q")), 5: (Float, struct.Struct(">f")), 6: (Double, struct.Struct(">d"))}
+_FIXED_SIZES = {tag_id: fmt.size for tag_id, (_, fmt) in _SCALARS.items()}
+_ARRAYS = {7: (ByteArray, np.dtype(">i1")), 11: (IntArray, np.dtype(">i4")), 12: (LongArray, np.dtype(">i8"))}
+_USHORT = struct.Struct(">H")
+_INT = struct.Struct(">i")
+
+
+def encoded_string(text):
+    """How a tag name or String payload is stored: a big-endian length, then UTF-8."""
+    data = text.encode("utf-8")
+    return _USHORT.pack(len(data)) + data if len(data) <= 0xFFFF else None
+
+
+class DocumentBuffer:
+    """Uncompressed bytes of a document and the span of every compound in them.
+
+    A single scan records where each compound payload starts and ends and
+    how many entries it has; compounds are then decoded one level at a time,
+    straight from the buffer, when they are first used.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.starts = array("q")
+        self.ends = array("q")
+        self.counts = array("i")
+        # Slot following the compounds nested in each compound
+        self.after = array("q")
+
+    def scan(self, position):
+        """Record every compound from the compound payload at position."""
+        try:
+            end = self._scan_compound(position)
+        except (IndexError, struct.error):
+            raise ValueError("Truncated or corrupt NBT data") from None
+        if end > len(self.data):
+            raise ValueError("Truncated or corrupt NBT data")
+
+    def _scan_compound(self, position):
+        data, sizes = self.data, _FIXED_SIZES
+        slot = len(self.starts)
+        self.starts.append(position)
+        self.ends.append(0)
+        self.counts.append(0)
+        self.after.append(0)
+        count = 0
+        tag_id = data[position]
+        position += 1
+        while tag_id != TAG_END:
+            count += 1
+            position += 2 + _USHORT.unpack_from(data, position)[0]
+            size = sizes.get(tag_id)
+            position = position + size if size else self._scan_payload(tag_id, position)
+            tag_id = data[position]
+            position += 1
+        self.ends[slot] = position
+        self.counts[slot] = count
+        self.after[slot] = len(self.starts)
+        return position
+
+    def _scan_payload(self, tag_id, position):
+        size = _FIXED_SIZES.get(tag_id)
+        if size:
+            return position + size
+        if tag_id == TAG_STRING:
+            return position + 2 + _USHORT.unpack_from(self.data, position)[0]
+        if tag_id in _ARRAYS:
+            return position + 4 + _INT.unpack_from(self.data, position)[0] * _ARRAYS[tag_id][1].itemsize
+        if tag_id == TAG_COMPOUND:
+            return self._scan_compound(position)
+        if tag_id == TAG_LIST:
+            item_id = self.data[position]
+            length, = _INT.unpack_from(self.data, position + 1)
+            position += 5
+            size = _FIXED_SIZES.get(item_id)
+            if size:
+                return position + max(length, 0) * size
+            for _ in range(length):
+                position = self._scan_payload(item_id, position)
+            return position
+        raise ValueError(f"Unknown tag id {tag_id} at offset {position}")
+
+    def placeholder(self, slot):
+        compound = LazyCompound.__new__(LazyCompound)
+        compound.document = self
+        compound.slot = slot
+        return compound
+
+    def raw(self, slot):
+        """Encoded payload of a compound, including its end tag."""
+        return bytes(self.data[self.starts[slot]:self.ends[slot]])
+
+    def contains(self, slot, needle):
+        """Whether bytes occur in the encoded payload of a compound; decodes nothing."""
+        return self.data.find(needle, self.starts[slot], self.ends[slot]) != -1
+
+    def decode_compound(self, slot):
+        """Decode the entries of a compound; nested compounds come back undecoded."""
+        data = self.data
+        position = self.starts[slot]
+        entries = []
+        tag_id = data[position]
+        position += 1
+        while tag_id != TAG_END:
+            length, = _USHORT.unpack_from(data, position)
+            position += 2
+            name = bytes(data[position:position + length]).decode("utf-8", "replace")
+            value, position = self._decode(tag_id, position + length)
+            entries.append((name, value))
+            tag_id = data[position]
+            position += 1
+        return entries
+
+    def _decode(self, tag_id, position):
+        data = self.data
+        scalar = _SCALARS.get(tag_id)
+        if scalar is not None:
+            tag_type, fmt = scalar
+            return tag_type(fmt.unpack_from(data, position)[0]), position + fmt.size
+        if tag_id == TAG_STRING:
+            length, = _USHORT.unpack_from(data, position)
+            position += 2
+            return String(bytes(data[position:position + length]).decode("utf-8", "replace")), position + length
+        if tag_id == TAG_COMPOUND:
+            slot = bisect_left(self.starts, position)
+            return self.placeholder(slot), self.ends[slot]
+        if tag_id in _ARRAYS:
+            tag_type, dtype = _ARRAYS[tag_id]
+            length, = _INT.unpack_from(data, position)
+            position += 4
+            # Copied so that the array can be edited in place
+            values = np.frombuffer(data, dtype, length, position).copy()
+            return tag_type(values), position + length * dtype.itemsize
+        if tag_id == TAG_LIST:
+            item_id = data[position]
+            length, = _INT.unpack_from(data, position + 1)
+            position += 5
+            scalar = _SCALARS.get(item_id)
+            if scalar is not None:
+                tag_type, fmt = scalar
+                fmt = struct.Struct(f">{max(length, 0)}{fmt.format[-1]}")
+                items = [tag_type(value) for value in fmt.unpack_from(data, position)]
+                position += fmt.size
+            elif item_id == TAG_COMPOUND and length > 0:
+                # Sibling compounds follow each other in slot order
+                slot = bisect_left(self.starts, position)
+                items = []
+                for _ in range(length):
+                    items.append(self.placeholder(slot))
+                    last, slot = slot, self.after[slot]
+                position = self.ends[last]
+            else:
+                items = []
+                for _ in range(length):
+                    item, position = self._decode(item_id, position)
+                    items.append(item)
+            tag = List[Base.all_tags[item_id]]()
+            # The items already have the list's type, so skip nbtlib's per-item cast
+            list.extend(tag, items)
+            return tag, position
+        raise ValueError(f"Unknown tag id {tag_id} at offset {position}")
+
+
+class LazyCompound(Compound):
+    """Compound whose entries stay encoded in a DocumentBuffer until first used.
+
+    Any dict access decodes the direct entries (nested compounds stay lazy).
+    len() is known without decoding and an untouched compound is written
+    back by copying its original bytes.
+    """
+
+    __slots__ = ("document", "slot")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.document = None
+        self.slot = -1
+
+    @property
+    def loaded(self):
+        return self.document is None
+
+    def load(self):
+        document = self.document
+        if document is not None:
+            dict.update(self, document.decode_compound(self.slot))
+            self.document = None
+
+    def peek_items(self):
+        """Return the entries as a list without keeping them decoded; safe off the GUI thread."""
+        document = self.document
+        if document is None:
+            return list(dict.items(self))
+        return document.decode_compound(self.slot)
+
+    def copy_lazy(self):
+        """Independent placeholder for the same undecoded compound, sharing the buffer."""
+        return self.document.placeholder(self.slot)
+
+    def __len__(self):
+        document = self.document
+        return dict.__len__(self) if document is None else document.counts[self.slot]
+
+    def __eq__(self, other):
+        self.load()
+        if isinstance(other, LazyCompound):
+            other.load()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        self.load()
+        return f"Compound({dict.__repr__(self)})"
+
+    def __reduce__(self):
+        return Compound, (dict(self.items()),)
+
+    def write(self, fileobj, byteorder="big"):
+        document = self.document
+        if document is not None and byteorder == "big":
+            fileobj.write(document.raw(self.slot))
+        else:
+            super().write(fileobj, byteorder)
+
+
+def _loading(name):
+    method = getattr(Compound, name)
+
+    def load_then_call(self, *args, **kwargs):
+        if self.document is not None:
+            self.load()
+        return method(self, *args, **kwargs)
+
+    load_then_call.__name__ = name
+    return load_then_call
+
+
+for _name in ("__getitem__", "__setitem__", "__delitem__", "__contains__", "__iter__", "__reversed__",
+              "__or__", "__ior__", "keys", "values", "items", "get", "get_all", "pop",
+              "popitem", "setdefault", "update", "clear", "copy", "find", "merge", "with_defaults",
+              "match", "unpack"):
+    setattr(LazyCompound, _name, _loading(_name))
+
+
+def compound_items(compound):
+    """Entries of a compound as a list, without decoding a lazy one for good."""
+    if isinstance(compound, LazyCompound):
+        return compound.peek_items()
+    return list(compound.items())
+
+
+def parse_document(data):
+    """Build a File over uncompressed NBT bytes (or an mmap), decoding only its top level."""
+    if not len(data) or data[0] != TAG_COMPOUND:
+        raise ValueError("NBT data must start with a compound tag")
+    try:
+        length, = _USHORT.unpack_from(data, 1)
+    except struct.error:
+        raise ValueError("Truncated or corrupt NBT data") from None
+    root_name = bytes(data[3:3 + length]).decode("utf-8", "replace")
+    document = DocumentBuffer(data)
+    document.scan(3 + length)
+    return File(document.decode_compound(0), root_name=root_name)
@@ -0,0 +1,152 @@
+import gzip
+import io
+import mmap
+import os
+import tempfile
+import zlib
+from core import perf
+from core.lazy_nbt import LazyCompound, parse_document
+from core.region import RegionFile, is_region_file
+
+READ_BUFFER_SIZE = 64 * 1024
+# Documents larger than this once uncompressed are kept in a memory-mapped
+# temporary file instead of the heap
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+class LoadCancelled(Exception):
+    """Raised inside a load when the caller asked for it to stop."""
+
+
+class ProgressReader(io.RawIOBase):
+    """Raw stream wrapper that reports bytes consumed and honours cancellation.
+
+    It sits below an io.BufferedReader, so the many tiny reads made by the
+    nbtlib parser are served from the C buffer and only refills reach Python.
+    """
+
+    def __init__(self, raw, total, progress=None, cancelled=None):
+        self.raw = raw
+        self.total = total
+        self.progress = progress
+        self.cancelled = cancelled
+        self.consumed = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.cancelled and self.cancelled():
+            raise LoadCancelled()
+        count = self.raw.readinto(buffer)
+        if count:
+            self.consumed += count
+            if self.progress:
+                self.progress(self.consumed, self.total)
+        return count
+
+
+def load_nbt(file_path, progress=None, cancelled=None):
+    """Open an NBT or region file; safe to call off the GUI thread.
+
+    The file is decompressed once into a buffer and compounds are decoded
+    from it only when they are first used (see core.lazy_nbt).
+    progress(bytes_consumed, total_bytes) is called as the file is read and
+    cancelled() is polled between reads, raising LoadCancelled when true.
+    """
+    if is_region_file(file_path):
+        with perf.span("read header"):
+            return RegionFile(file_path)
+
+    total = os.path.getsize(file_path)
+    with open(file_path, "rb") as raw:
+        magic_number = raw.read(2)
+        raw.seek(0)
+        fileobj = io.BufferedReader(ProgressReader(raw, total, progress, cancelled), READ_BUFFER_SIZE)
+        compression = detect_compression(magic_number)
+        if compression != "none":
+            # Progress follows the compressed input; cancellation is also
+            # polled on the decompressed side, which is where parsing time goes.
+            inner = gzip.GzipFile(fileobj=fileobj) if compression == "gzip" else ZlibReader(fileobj)
+            stream = ProgressReader(inner, total, None, cancelled)
+            fileobj = io.BufferedReader(stream, READ_BUFFER_SIZE)
+        with perf.span("decompress"):
+            data = read_all(fileobj)
+        with perf.span("scan"):
+            nbt_data = parse_document(data)
+    # The tree opens expanded one level deep; decode that level here rather
+    # than on the GUI thread
+    with perf.span("decode top level"):
+        for value in nbt_data.values():
+            if isinstance(value, LazyCompound):
+                value.load()
+    nbt_data.filename = file_path
+    nbt_data.gzipped = compression == "gzip"
+    nbt_data.compression = compression
+    nbt_data.uncompressed_size = len(data)
+    return nbt_data
+
+
+def read_all(fileobj):
+    """Read a stream to its end into bytes, or an mmap once it outgrows MMAP_THRESHOLD."""
+    chunks = []
+    size = 0
+    spill = None
+    try:
+        while True:
+            chunk = fileobj.read(READ_BUFFER_SIZE)
+            if not chunk:
+                break
+            if spill is not None:
+                spill.write(chunk)
+                continue
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > MMAP_THRESHOLD:
+                spill = tempfile.TemporaryFile()
+                spill.writelines(chunks)
+                chunks = None
+        if spill is None:
+            return b"".join(chunks)
+        spill.flush()
+        # The mapping stays valid after the (already unlinked) file is closed
+        return mmap.mmap(spill.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        if spill is not None:
+            spill.close()
+
+
+def detect_compression(magic_number):
+    """Guess "gzip", "zlib" or "none" from the first two bytes of a file."""
+    if magic_number == b"\x1f\x8b":
+        return "gzip"
+    if len(magic_number) == 2 and magic_number[0] & 0x0F == 8 and int.from_bytes(magic_number, "big") % 31 == 0:
+        return "zlib"
+    return "none"
+
+
+class ZlibReader(io.RawIOBase):
+    """Streaming zlib decompressor exposed as a raw stream."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.decompressor = zlib.decompressobj()
+        self.pending = b""
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.position >= len(self.pending):
+            if self.decompressor.eof:
+                return 0
+            data = self.decompressor.unconsumed_tail or self.fileobj.read(READ_BUFFER_SIZE)
+            if not data:
+                return 0
+            self.pending = self.decompressor.decompress(data, READ_BUFFER_SIZE)
+            self.position = 0
+        count = min(len(buffer), len(self.pending) - self.position)
+        buffer[:count] = self.pending[self.position:self.position + count]
+        self.position += count
+        return count
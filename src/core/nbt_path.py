@@ -0,0 +1,54 @@
+import re
+
+_PLAIN_NAME = re.compile(r"^[A-Za-z0-9_+\-]+$")
+_PATH_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|\[(\d+)\]|([^."\[\]]+)|(\.)')
+
+
+def format_key(key):
+    """Format one path key: names are quoted when needed, indices use brackets."""
+    if isinstance(key, int):
+        return f"[{key}]"
+    if _PLAIN_NAME.match(key):
+        return key
+    escaped = key.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def format_path(path):
+    """Format a key tuple as a dotted path, e.g. Data.Player.Inventory[3].id."""
+    text = ""
+    for key in path:
+        part = format_key(key)
+        if text and not part.startswith("["):
+            text += "."
+        text += part
+    return text
+
+
+def parse_path(text):
+    """Parse a dotted path as written by format_path back into a key tuple."""
+    keys = []
+    after_dot = False
+    position = 0
+    while position < len(text):
+        match = _PATH_TOKEN.match(text, position)
+        if match is None:
+            raise ValueError(f"Invalid path {text!r} at position {position}")
+        quoted, index, name, dot = match.groups()
+        if dot:
+            if not keys or after_dot:
+                raise ValueError(f"Invalid path {text!r}: empty name at position {position}")
+            after_dot = True
+        elif index is not None:
+            if after_dot:
+                raise ValueError(f"Invalid path {text!r}: expected a name at position {position}")
+            keys.append(int(index))
+        else:
+            if keys and not after_dot:
+                raise ValueError(f"Invalid path {text!r}: expected '.' at position {position}")
+            keys.append(name if name is not None else re.sub(r"\\(.)", r"\1", quoted))
+            after_dot = False
+        position = match.end()
+    if after_dot:
+        raise ValueError(f"Invalid path {text!r}: trailing '.'")
+    return tuple(keys)
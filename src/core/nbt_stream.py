@@ -0,0 +1,247 @@
+import gzip
+import io
+import struct
+from nbtlib.tag import Base
+from core.loader import READ_BUFFER_SIZE, ZlibReader, detect_compression
+from core.nbt_path import parse_path
+
+TAG_END = 0
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+
+# What a select(path, tag_id) callback asks the reader to do with a tag
+SKIP = 0
+DESCEND = 1
+LOAD = 2
+
+_SCALARS = {1: struct.Struct(">b"), 2: struct.Struct(">h"), 3: struct.Struct(">i"),
+            4: struct.Struct(">q"), 5: struct.Struct(">f"), 6: struct.Struct(">d")}
+_ARRAY_ITEM_SIZES = {7: 1, 11: 4, 12: 8}
+_USHORT = struct.Struct(">H")
+_INT = struct.Struct(">i")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def open_stream(raw):
+    """Wrap a binary NBT file object as a stream of its uncompressed bytes."""
+    magic_number = raw.read(2)
+    raw.seek(0)
+    compression = detect_compression(magic_number)
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw)
+    if compression == "zlib":
+        return io.BufferedReader(ZlibReader(raw), READ_BUFFER_SIZE)
+    return raw
+
+
+class NBTStreamReader:
+    """Pull parser yielding (path, tag_type, value) events without building the tree.
+
+    Tags are reported depth first in file order. Scalars come with their
+    plain value; compounds, lists and arrays with the offset of their payload
+    in the uncompressed stream. A select(path, tag_id) callback may return
+    SKIP to step over a tag (its value is then the payload offset), DESCEND
+    for the default behaviour or LOAD to get the tag parsed as an nbtlib tag.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        # Decompressed bytes are pulled in chunks so the many tiny reads and
+        # skips of the walk are slices of a local buffer
+        self.buffer = b""
+        self.position = 0
+        self.buffer_offset = 0
+
+    @property
+    def offset(self):
+        """Position in the uncompressed stream."""
+        return self.buffer_offset + self.position
+
+    def _fill(self, size):
+        data = self.fileobj.read(max(size, STREAM_CHUNK_SIZE))
+        self.buffer_offset += self.position
+        self.buffer = self.buffer[self.position:] + data
+        self.position = 0
+        if len(self.buffer) < size:
+            raise EOFError("Unexpected end of NBT data")
+
+    def read(self, size):
+        start = self.position
+        if start + size > len(self.buffer):
+            self._fill(size)
+            start = 0
+        self.position = start + size
+        return self.buffer[start:start + size]
+
+    def skip(self, size):
+        available = len(self.buffer) - self.position
+        if size <= available:
+            self.position += size
+            return
+        # Step over large payloads without keeping them
+        self.buffer_offset += len(self.buffer)
+        self.buffer = b""
+        self.position = 0
+        size -= available
+        while size > 0:
+            data = self.fileobj.read(min(size, STREAM_CHUNK_SIZE))
+            if not data:
+                raise EOFError("Unexpected end of NBT data")
+            self.buffer_offset += len(data)
+            size -= len(data)
+
+    def read_string(self):
+        length, = _USHORT.unpack(self.read(2))
+        return self.read(length).decode("utf-8", "replace")
+
+    def events(self, select=None):
+        """Yield an event for the root compound and every tag walked below it."""
+        if self.read(1)[0] != TAG_COMPOUND:
+            raise ValueError("NBT data must start with a compound tag")
+        self.skip(_USHORT.unpack(self.read(2))[0])
+        yield from self._tag((), TAG_COMPOUND, select)
+
+    def payload_events(self, path, tag_id, select=None):
+        """Yield the events of a tag of type tag_id whose payload starts at the current position."""
+        return self._tag(path, tag_id, select)
+
+    def _tag(self, path, tag_id, select):
+        action = DESCEND if select is None else select(path, tag_id)
+        tag_type = Base.all_tags[tag_id]
+        if action == LOAD:
+            # nbtlib reads through self.read, so offsets stay in step
+            yield path, tag_type, tag_type.parse(self)
+            return
+        offset = self.offset
+        scalar = _SCALARS.get(tag_id)
+        if scalar is not None:
+            if action == SKIP:
+                self.skip(scalar.size)
+                yield path, tag_type, offset
+            else:
+                yield path, tag_type, scalar.unpack(self.read(scalar.size))[0]
+        elif tag_id == TAG_STRING:
+            if action == SKIP:
+                self.skip(_USHORT.unpack(self.read(2))[0])
+                yield path, tag_type, offset
+            else:
+                yield path, tag_type, self.read_string()
+        elif tag_id in _ARRAY_ITEM_SIZES:
+            yield path, tag_type, offset
+            length, = _INT.unpack(self.read(4))
+            self.skip(length * _ARRAY_ITEM_SIZES[tag_id])
+        elif tag_id == TAG_LIST:
+            yield path, tag_type, offset
+            item_id = self.read(1)[0]
+            length, = _INT.unpack(self.read(4))
+            for index in range(length):
+                if action == SKIP:
+                    self._skip_payload(item_id)
+                else:
+                    yield from self._tag(path + (index,), item_id, select)
+        elif tag_id == TAG_COMPOUND:
+            yield path, tag_type, offset
+            child_id = self.read(1)[0]
+            while child_id != TAG_END:
+                if action == SKIP:
+                    self.skip(_USHORT.unpack(self.read(2))[0])
+                    self._skip_payload(child_id)
+                else:
+                    name = self.read_string()
+                    yield from self._tag(path + (name,), child_id, select)
+                child_id = self.read(1)[0]
+        else:
+            raise ValueError(f"Unknown tag id {tag_id} at offset {offset}")
+
+    def _skip_payload(self, tag_id):
+        scalar = _SCALARS.get(tag_id)
+        if scalar is not None:
+            self.skip(scalar.size)
+        elif tag_id == TAG_STRING:
+            self.skip(_USHORT.unpack(self.read(2))[0])
+        elif tag_id in _ARRAY_ITEM_SIZES:
+            self.skip(_INT.unpack(self.read(4))[0] * _ARRAY_ITEM_SIZES[tag_id])
+        elif tag_id == TAG_LIST:
+            item_id = self.read(1)[0]
+            length, = _INT.unpack(self.read(4))
+            item_scalar = _SCALARS.get(item_id)
+            if item_scalar is not None:
+                self.skip(length * item_scalar.size)
+            else:
+                for _ in range(length):
+                    self._skip_payload(item_id)
+        elif tag_id == TAG_COMPOUND:
+            child_id = self.read(1)[0]
+            while child_id != TAG_END:
+                self.skip(_USHORT.unpack(self.read(2))[0])
+                self._skip_payload(child_id)
+                child_id = self.read(1)[0]
+        elif tag_id != TAG_END:
+            raise ValueError(f"Unknown tag id {tag_id} at offset {self.offset}")
+
+
+def iter_events(file_path, select=None):
+    """Stream the events of an NBT file (gzip, zlib or uncompressed)."""
+    with open(file_path, "rb") as raw:
+        yield from NBTStreamReader(open_stream(raw)).events(select)
+
+
+def _lookup(tag, path):
+    for key in path:
+        try:
+            tag = tag[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return tag
+
+
+def extract_stream(fileobj, paths):
+    """Read the tags at paths from an uncompressed NBT stream.
+
+    Only the containers leading to the requested paths are walked, everything
+    else is skipped unparsed, and reading stops once every path is found or
+    known to be missing. Returns a dict of the paths found to nbtlib tags.
+    """
+    wanted = {parse_path(path) if isinstance(path, str) else tuple(path): path for path in paths}
+    remaining = set(wanted)
+    # Deepest prefix of each wanted path entered so far; once the walk leaves
+    # it the path cannot appear any more
+    entered = dict.fromkeys(remaining, 0)
+    found = {}
+
+    def select(path, tag_id):
+        for key in list(remaining):
+            depth = entered[key]
+            if depth and path[:depth] != key[:depth]:
+                remaining.discard(key)
+        action = SKIP
+        for key in remaining:
+            if path == key:
+                return LOAD
+            if key[:len(path)] == path:
+                entered[key] = len(path)
+                action = DESCEND
+        return action
+
+    if not remaining:
+        return found
+    for path, tag_type, value in NBTStreamReader(fileobj).events(select):
+        if path in remaining:
+            found[wanted[path]] = value
+            remaining.discard(path)
+            # Paths inside a loaded tag are never walked; look them up in it
+            for key in [key for key in remaining if key[:len(path)] == path]:
+                remaining.discard(key)
+                tag = _lookup(value, key[len(path):])
+                if tag is not None:
+                    found[wanted[key]] = tag
+        if not remaining:
+            break
+    return found
+
+
+def extract(file_path, paths):
+    """Read the tags at paths (key tuples or dotted strings) from an NBT file."""
+    with open(file_path, "rb") as raw:
+        return extract_stream(open_stream(raw), paths)
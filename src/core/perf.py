@@ -0,0 +1,199 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Number of recent operations kept for rolling statistics
+RECENT_LIMIT = 200
+
+enabled = False
+# Called with every finished operation, from the thread that finished it
+listeners = []
+recent = deque(maxlen=RECENT_LIMIT)
+_local = threading.local()
+_profile_path = None
+_NULL = nullcontext()
+
+
+class Span:
+    """Timing of one step; spans started while it runs on the same thread become its children.
+
+    A span started with nothing running is an operation: once finished it is
+    kept in recent and passed to the listeners.
+    """
+
+    __slots__ = ("name", "detail", "start", "seconds", "children", "thread", "profiler", "profile_path")
+
+    def __init__(self, name, detail=None):
+        self.name = name
+        # Shown next to the name (a file name, a query) but not part of the statistics key
+        self.detail = detail
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.children = []
+        self.thread = threading.get_ident()
+        self.profiler = None
+        self.profile_path = None
+
+    def other_seconds(self):
+        """Time of this span not covered by its children."""
+        return max(0.0, self.seconds - sum(child.seconds or 0.0 for child in self.children))
+
+    def walk(self, depth=0):
+        """Yield (depth, span) for this span and everything below it."""
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def summary(self):
+        """One line such as 'load_file level.dat 812 ms: read 300 ms, parse 450 ms, other 62 ms'."""
+        text = f"{self.name} {self.detail} " if self.detail else f"{self.name} "
+        text += format_seconds(self.seconds)
+        finished = [child for child in self.children if child.seconds is not None]
+        if finished:
+            parts = [f"{child.name} {format_seconds(child.seconds)}" for child in finished]
+            other = self.other_seconds()
+            if other >= 0.001:
+                parts.append(f"other {format_seconds(other)}")
+            text += ": " + ", ".join(parts)
+        return text
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.0f} ms" if seconds >= 0.01 else f"{seconds * 1000:.1f} ms"
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def span(name, detail=None):
+    """Context manager timing a step; does next to nothing while instrumentation is off."""
+    if not enabled:
+        return _NULL
+    return _measure(name, detail)
+
+
+@contextmanager
+def _measure(name, detail):
+    stack = _stack()
+    if not stack:
+        operation = begin(name, detail)
+        with attach(operation):
+            yield operation
+        finish(operation)
+        return
+    current = Span(name, detail)
+    stack[-1].children.append(current)
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        stack.pop()
+        current.seconds = time.perf_counter() - current.start
+
+
+def begin(name, detail=None):
+    """Start an operation that may run on several threads; None while instrumentation is off.
+
+    Work is timed as part of it inside attach(), and finish() completes it.
+    """
+    global _profile_path
+    if not enabled:
+        return None
+    operation = Span(name, detail)
+    if _profile_path is not None:
+        operation.profile_path, _profile_path = _profile_path, None
+        if not _is_trace(operation.profile_path):
+            operation.profiler = cProfile.Profile()
+    return operation
+
+
+def attach(operation):
+    """Context manager making operation the parent of the spans started on this thread."""
+    if operation is None:
+        return _NULL
+    return _attached(operation)
+
+
+@contextmanager
+def _attached(operation):
+    stack = _stack()
+    saved, stack[:] = stack[:], [operation]
+    profiler = operation.profiler
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield operation
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        stack[:] = saved
+
+
+def finish(operation):
+    """Complete an operation started with begin() and report it."""
+    if operation is None or operation.seconds is not None:
+        return
+    operation.seconds = time.perf_counter() - operation.start
+    if operation.profile_path is not None:
+        try:
+            export(operation, operation.profile_path)
+        except OSError as e:
+            operation.detail = f"{operation.detail or ''} (profile not written: {e})".lstrip()
+    recent.append(operation)
+    for listener in list(listeners):
+        listener(operation)
+
+
+def profile_next(file_path):
+    """Profile the next operation and export it to file_path when it finishes.
+
+    A .json path gets a trace of its spans in the Chrome trace event format
+    (chrome://tracing, Perfetto); anything else gets cProfile statistics
+    that pstats or snakeviz can read.
+    """
+    global _profile_path
+    _profile_path = file_path
+
+
+def profile_pending():
+    return _profile_path is not None
+
+
+def _is_trace(file_path):
+    return os.path.splitext(file_path)[1].lower() == ".json"
+
+
+def export(operation, file_path):
+    """Write a finished operation as a Chrome trace (.json) or its cProfile statistics."""
+    if _is_trace(file_path):
+        events = [{"name": span.name, "ph": "X", "pid": os.getpid(), "tid": span.thread,
+                   "ts": span.start * 1e6, "dur": (span.seconds or 0.0) * 1e6}
+                  for _, span in operation.walk()]
+        with open(file_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    else:
+        operation.profiler.dump_stats(file_path)
+
+
+def statistics():
+    """Count, last, mean and max seconds of each span name over the recent operations."""
+    samples = {}
+    for operation in recent:
+        for _, span in operation.walk():
+            if span.seconds is not None:
+                samples.setdefault(span.name, []).append(span.seconds)
+    return {name: (len(values), values[-1], sum(values) / len(values), max(values))
+            for name, values in samples.items()}
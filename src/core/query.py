@@ -0,0 +1,470 @@
+import operator
+import re
+from functools import lru_cache
+from nbtlib import parse_nbt
+from nbtlib.tag import Compound, List, String, Numeric, Array
+from core.lazy_nbt import LazyCompound, compound_items, encoded_string
+from core.region import RegionFile
+from core.search_index import scalar_text
+
+_NAME = re.compile(r"""[^\s.\[\]{}"'=!<>~*@?]+""")
+_QUOTED = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'')
+_INDEX = re.compile(r"\s*(-?\d+)\s*$")
+_OPERATOR = re.compile(r"\s*(==|!=|<=|>=|<|>|~)\s*")
+_COMPARE = {"==": operator.eq, "!=": operator.ne, "<": operator.lt,
+            "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+_CLOSING = {"[": "]", "{": "}"}
+_CONTAINERS = (Compound, List)
+
+
+class QueryError(ValueError):
+    """Raised for a query that cannot be parsed."""
+
+
+# Steps are compiled back to front: each one is a closure taking
+# (path, tag, sink) that hands every tag it selects to the next step and
+# returns True once the sink asks to stop. Steps give up as soon as a tag
+# has the wrong type or lacks a key. Alongside, compiling collects the
+# encoded names and strings any match must contain ("needles"), so that
+# walks skip undecoded compounds lacking one without decoding them.
+
+def _emit(path, tag, sink):
+    return sink(path, tag)
+
+
+def _found(path, tag):
+    return True
+
+
+def _lacks(tag, needles):
+    """Whether tag is an undecoded compound whose bytes miss one of needles."""
+    if needles and isinstance(tag, LazyCompound):
+        document = tag.document
+        if document is not None:
+            return not all(document.contains(tag.slot, needle) for needle in needles)
+    return False
+
+
+def _items(tag):
+    """Children of a compound, list or region (decoded chunks only), as (key, tag) pairs."""
+    if isinstance(tag, Compound):
+        return compound_items(tag)
+    if isinstance(tag, List):
+        return enumerate(tag)
+    if isinstance(tag, RegionFile):
+        return [(row, chunk.nbt_data) for row, chunk in enumerate(tag.chunks) if chunk.loaded]
+    return ()
+
+
+def _child(name, following):
+    def step(path, tag, sink):
+        if isinstance(tag, Compound):
+            value = tag.get(name)
+            if value is not None:
+                return following(path + (name,), value, sink)
+        return False
+    return step
+
+
+def _index(position, following):
+    def step(path, tag, sink):
+        if isinstance(tag, (List, Array, RegionFile)):
+            length = len(tag)
+            key = position + length if position < 0 else position
+            if 0 <= key < length:
+                return following(path + (key,), tag[key], sink)
+        return False
+    return step
+
+
+def _children(following, lists_only=False):
+    def step(path, tag, sink):
+        if isinstance(tag, Array):
+            items = enumerate(tag.tolist())
+        elif lists_only and not isinstance(tag, List):
+            return False
+        else:
+            items = _items(tag)
+        for key, value in items:
+            if following(path + (key,), value, sink):
+                return True
+        return False
+    return step
+
+
+def _descendants(name, following, needles):
+    """Tags below the current one (at any depth) named name, or all of them for None."""
+    def walk(path, tag, sink):
+        for key, value in _items(tag):
+            if (name is None or key == name) and following(path + (key,), value, sink):
+                return True
+            if isinstance(value, _CONTAINERS) and not (needles and _lacks(value, needles)) \
+                    and walk(path + (key,), value, sink):
+                return True
+        return False
+    return walk
+
+
+def _containers(following, needles):
+    """The current tag and every compound and list below it."""
+    def walk(path, tag, sink):
+        if following(path, tag, sink):
+            return True
+        for key, value in _items(tag):
+            if isinstance(value, _CONTAINERS) and not (needles and _lacks(value, needles)) \
+                    and walk(path + (key,), value, sink):
+                return True
+        return False
+    return walk
+
+
+def _pattern(pattern, following, needles):
+    def step(path, tag, sink):
+        if not _lacks(tag, needles) and matches_pattern(tag, pattern):
+            return following(path, tag, sink)
+        return False
+    return step
+
+
+def _where(condition, following, needles):
+    """Children of the current tag for which the condition query finds anything."""
+    def step(path, tag, sink):
+        items = enumerate(tag.tolist()) if isinstance(tag, Array) else _items(tag)
+        for key, value in items:
+            if not _lacks(value, needles) and condition((), value, _found) and following(path + (key,), value, sink):
+                return True
+        return False
+    return step
+
+
+def _test(test, following):
+    def step(path, tag, sink):
+        if test(tag):
+            return following(path, tag, sink)
+        return False
+    return step
+
+
+def _number(tag):
+    if isinstance(tag, Numeric):
+        return tag.unpack()
+    if isinstance(tag, (int, float)):
+        # Array entries
+        return tag
+    return None
+
+
+def matches_pattern(tag, pattern):
+    """Whether tag matches an SNBT pattern the way Minecraft's {...} path filters do.
+
+    A compound matches if every entry of the pattern matches its entry of
+    the same name, a list if every entry of the pattern matches one of its
+    entries. Numbers are compared by value, so 1b matches 1.
+    """
+    if isinstance(pattern, Compound):
+        if not isinstance(tag, Compound):
+            return False
+        for key, expected in pattern.items():
+            value = tag.get(key)
+            if value is None or not matches_pattern(value, expected):
+                return False
+        return True
+    if isinstance(pattern, List):
+        return isinstance(tag, List) and all(any(matches_pattern(value, expected) for value in tag)
+                                             for expected in pattern)
+    if isinstance(pattern, Numeric):
+        value = _number(tag)
+        return value is not None and value == pattern.unpack()
+    return type(tag) is type(pattern) and tag == pattern
+
+
+def _pattern_needles(pattern):
+    """Encoded keys and strings a tag needs to match pattern."""
+    needles = set()
+    for key, expected in pattern.items():
+        needles.add(encoded_string(key))
+        for value in (expected if isinstance(expected, List) else [expected]):
+            if isinstance(value, String):
+                needles.add(encoded_string(str.__str__(value)))
+            elif isinstance(value, Compound):
+                needles |= _pattern_needles(value)
+    return needles - {None}
+
+
+def comparison(op, literal):
+    """Predicate on a tag for 'op literal'; tags of another kind never match.
+
+    Numbers compare by value, strings by text; ~ is a case-insensitive
+    substring test on the text of any scalar.
+    """
+    if op == "~":
+        needle = (scalar_text(literal) or literal.snbt()).lower()
+        def test(tag):
+            text = scalar_text(tag) if not isinstance(tag, (int, float)) else str(tag)
+            return text is not None and needle in text.lower()
+        return test
+    compare = _COMPARE[op]
+    if isinstance(literal, Numeric):
+        number = literal.unpack()
+        def test(tag):
+            value = _number(tag)
+            return value is not None and compare(value, number)
+        return test
+    if isinstance(literal, String):
+        text = str.__str__(literal)
+        return lambda tag: isinstance(tag, String) and compare(str.__str__(tag), text)
+    if op not in ("==", "!="):
+        raise QueryError(f"'{op}' needs a number or a string, not {literal.snbt()}")
+    return lambda tag: compare(tag, literal)
+
+
+def _literal(text):
+    text = text.strip()
+    if not text:
+        raise QueryError("Expected a value to compare with")
+    try:
+        return parse_nbt(text)
+    except Exception:
+        # Bare words such as minecraft:stone are strings
+        if _NAME.fullmatch(text):
+            return String(text)
+        raise QueryError(f"Invalid value {text!r}") from None
+
+
+def _closing(text, start):
+    """Position of the bracket closing the one at start, skipping quoted text and nested brackets."""
+    expected = [_CLOSING[text[start]]]
+    position = start + 1
+    while position < len(text):
+        char = text[position]
+        if char in "\"'":
+            match = _QUOTED.match(text, position)
+            if match is None:
+                raise QueryError(f"Unterminated string at position {position}")
+            position = match.end()
+            continue
+        if char in _CLOSING:
+            expected.append(_CLOSING[char])
+        elif char in "]}":
+            if char != expected.pop():
+                raise QueryError(f"Unexpected '{char}' at position {position}")
+            if not expected:
+                return position
+        position += 1
+    raise QueryError(f"Unclosed '{text[start]}' at position {start}")
+
+
+def _name(text, position):
+    """(name or None for *, end) of a tag name at position."""
+    if text.startswith("*", position):
+        return None, position + 1
+    match = _QUOTED.match(text, position)
+    if match is not None:
+        quoted = match.group(1) if match.group(1) is not None else match.group(2)
+        return re.sub(r"\\(.)", r"\1", quoted), match.end()
+    match = _NAME.match(text, position)
+    if match is None:
+        raise QueryError(f"Expected a name at position {position}")
+    return match.group(), match.end()
+
+
+def _parse_pattern(text):
+    try:
+        pattern = parse_nbt(text)
+    except Exception as e:
+        raise QueryError(f"Invalid filter {text}: {e}") from None
+    if not isinstance(pattern, Compound):
+        raise QueryError(f"Filters must be compounds, not {text}")
+    return pattern
+
+
+def parse(text):
+    """Parse a query into a list of steps and an optional (operator, literal) comparison.
+
+    Steps are tuples: ("child", name), ("children",) for a *, ("index", n),
+    ("entries",) for [] or [*], ("descendants", name or None),
+    ("containers",) for a '..' before a bracket, ("pattern", compound) and
+    ("where", steps, comparison) for [?...].
+    """
+    steps = []
+    position = 0
+    length = len(text)
+    while position < length and text[position].isspace():
+        position += 1
+    # @ stands for the tag the query starts from, as in [?@ > 5]
+    anchored = text.startswith("@", position)
+    if anchored:
+        position += 1
+    while position < length:
+        char = text[position]
+        if text.startswith("..", position):
+            position += 2
+            if position < length and text[position] in "[{":
+                steps.append(("containers",))
+                continue
+            name, position = _name(text, position)
+            steps.append(("descendants", name))
+        elif char == ".":
+            if not steps and not anchored:
+                raise QueryError("A query cannot start with '.'")
+            name, position = _name(text, position + 1)
+            steps.append(("child", name) if name is not None else ("children",))
+        elif char == "[":
+            end = _closing(text, position)
+            inner = text[position + 1:end].strip()
+            index = _INDEX.match(inner)
+            if inner in ("", "*"):
+                steps.append(("entries",))
+            elif index is not None:
+                steps.append(("index", int(index.group(1))))
+            elif inner.startswith("{"):
+                steps.append(("entries",))
+                steps.append(("pattern", _parse_pattern(inner)))
+            elif inner.startswith("?"):
+                condition, compare = parse(inner[1:])
+                steps.append(("where", condition, compare))
+            else:
+                raise QueryError(f"Invalid brackets [{inner}] at position {position}")
+            position = end + 1
+        elif char == "{":
+            end = _closing(text, position)
+            steps.append(("pattern", _parse_pattern(text[position:end + 1])))
+            position = end + 1
+        elif not steps and not anchored and not char.isspace() and _OPERATOR.match(text, position) is None:
+            name, position = _name(text, position)
+            steps.append(("child", name) if name is not None else ("children",))
+        else:
+            break
+    compare = None
+    if position < length:
+        match = _OPERATOR.match(text, position)
+        if match is None:
+            while text[position].isspace():
+                position += 1
+            raise QueryError(f"Unexpected {text[position]!r} at position {position}")
+        compare = (match.group(1), _literal(text[match.end():]))
+    return steps, compare
+
+
+def _compile(steps, compare, following=_emit):
+    """(evaluator, needles) of a parsed query; needles must all occur inside any tag it matches below."""
+    needles = set()
+    if compare is not None:
+        following = _test(comparison(*compare), following)
+        op, literal = compare
+        if op == "==" and isinstance(literal, String):
+            needles.add(encoded_string(str.__str__(literal)))
+    for step in reversed(steps):
+        kind = step[0]
+        if kind == "child":
+            following = _child(step[1], following)
+            needles.add(encoded_string(step[1]))
+        elif kind == "children":
+            following = _children(following)
+        elif kind == "index":
+            following = _index(step[1], following)
+        elif kind == "entries":
+            following = _children(following, lists_only=True)
+        elif kind == "descendants":
+            if step[1] is not None:
+                needles.add(encoded_string(step[1]))
+            following = _descendants(step[1], following, frozenset(needles - {None}))
+        elif kind == "containers":
+            following = _containers(following, frozenset(needles - {None}))
+        elif kind == "pattern":
+            needles |= _pattern_needles(step[1])
+            following = _pattern(step[1], following, frozenset(needles - {None}))
+        elif kind == "where":
+            condition, condition_needles = _compile(step[1], step[2])
+            following = _where(condition, following, condition_needles)
+            needles |= condition_needles
+    return following, frozenset(needles - {None})
+
+
+def _resolve(root, path):
+    tag = root
+    try:
+        for key in path:
+            tag = tag[key]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return tag
+
+
+class Query:
+    """A path query compiled into a chain of closures, reusable on any document.
+
+    Queries are NBT paths extended with wildcards and comparisons:
+
+        Data.Player.Inventory[0].id               one tag
+        Level.Entities[{id:"minecraft:item"}].Item.Count > 32
+        Inventory[?Count >= 64].id                list entries where a test holds
+        ..CustomName                              at any depth
+        ..[?CustomName]                           compounds (anywhere) having a key
+        Data.*  /  Items[]  /  Items[-1]          all children, all entries, last entry
+
+    Comparisons are ==, !=, <, <=, >, >= and ~ (contains, ignoring case),
+    against an SNBT value or a bare word.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        steps, compare = parse(text)
+        if not steps and compare is None:
+            raise QueryError("The query is empty")
+        self.evaluator, _ = _compile(steps, compare)
+        # A query starting with ..name can start from the search index's list of
+        # that name, one starting with ..[?name ...] from the parents of those tags
+        self.indexed_name = None
+        self.indexed_parents = False
+        if steps and steps[0][0] == "descendants" and steps[0][1] is not None:
+            self._use_index(steps[:1], compare if len(steps) == 1 else None)
+            self.rest, _ = _compile(steps[1:], compare)
+        elif len(steps) > 1 and steps[0] == ("containers",) and steps[1][0] == "where" \
+                and steps[1][1] and steps[1][1][0][0] == "child":
+            self._use_index(steps[1][1], steps[1][2])
+            self.indexed_parents = True
+            condition, _ = _compile(steps[1][1], steps[1][2])
+            self.rest = _test(lambda tag: condition((), tag, _found), _compile(steps[2:], compare)[0])
+
+    def _use_index(self, steps, compare):
+        self.indexed_name = steps[0][1]
+        self.indexed_value = None
+        if len(steps) == 1 and compare is not None and compare[0] == "==" and isinstance(compare[1], String):
+            self.indexed_value = str.__str__(compare[1])
+
+    def evaluate(self, root, search_index=None, limit=None):
+        """Return (path, tag) pairs of the matches below root, in document order.
+
+        Undecoded region chunks are skipped. search_index, if given, must
+        index root; a query starting with ..name then begins from the
+        indexed tags of that name instead of walking the document, and the
+        matches come in index order, which edits can shuffle.
+        """
+        matches = []
+
+        def sink(path, tag):
+            matches.append((path, tag))
+            return limit is not None and len(matches) >= limit
+
+        if self.indexed_name is not None and search_index is not None and search_index.nbt_data is root:
+            seen = set()
+            for path in search_index.named(self.indexed_name, self.indexed_value):
+                if self.indexed_parents:
+                    path = path[:-1]
+                    # The root is nobody's child, so [?...] never selects it
+                    if not path or path in seen:
+                        continue
+                    seen.add(path)
+                tag = _resolve(root, path)
+                if tag is not None and self.rest(path, tag, sink):
+                    break
+        else:
+            self.evaluator((), root, sink)
+        return matches
+
+
+@lru_cache(maxsize=64)
+def compile_query(text):
+    """Compile text into a Query, reusing recently compiled ones; raises QueryError."""
+    return Query(text)
@@ -0,0 +1,339 @@
+import gzip
+import io
+import mmap
+import os
+import re
+import shutil
+import struct
+import time
+import zlib
+from core import perf
+from core.lazy_nbt import parse_document
+from core.saver import (DEFAULT_COMPRESSION_LEVEL, compress, snapshot_tag,
+                        temp_path_for, replace_atomic)
+
+SECTOR_SIZE = 4096
+CHUNK_COUNT = 1024
+HEADER_SIZE = 2 * SECTOR_SIZE
+
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+EXTERNAL_FLAG = 0x80
+_COMPRESSION_IDS = {"gzip": COMPRESSION_GZIP, "zlib": COMPRESSION_ZLIB, "none": COMPRESSION_NONE}
+
+REGION_EXTENSIONS = (".mca", ".mcr")
+_REGION_NAME = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mc[ar]$")
+
+
+def is_region_file(file_path):
+    """Return True if the path looks like an Anvil/McRegion file."""
+    return os.path.splitext(file_path)[1].lower() in REGION_EXTENSIONS
+
+
+def decompress_chunk(compression, payload):
+    """Decompress a chunk payload according to its compression type byte."""
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(payload)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    if compression == COMPRESSION_NONE:
+        return bytes(payload)
+    raise ValueError(f"Unsupported chunk compression type: {compression}")
+
+
+class RegionChunk:
+    """A chunk slot in a region file, decoded only on first access."""
+
+    __slots__ = ("region", "index", "offset", "sectors", "timestamp", "nbt_data", "error", "dirty")
+
+    def __init__(self, region, index, offset, sectors, timestamp):
+        self.region = region
+        self.index = index
+        self.offset = offset
+        self.sectors = sectors
+        self.timestamp = timestamp
+        self.nbt_data = None
+        self.error = None
+        self.dirty = False
+
+    @property
+    def x(self):
+        return self.region.region_x * 32 + self.index % 32
+
+    @property
+    def z(self):
+        return self.region.region_z * 32 + self.index // 32
+
+    @property
+    def loaded(self):
+        return self.nbt_data is not None
+
+    @property
+    def size(self):
+        return self.sectors * SECTOR_SIZE
+
+    def external_path(self):
+        return os.path.join(os.path.dirname(self.region.file_path), f"c.{self.x}.{self.z}.mcc")
+
+    def load(self):
+        """Decompress and parse the chunk, caching the result."""
+        if self.nbt_data is None:
+            raw = self.region.read_chunk_data(self)
+            self.nbt_data = parse_document(raw)
+        return self.nbt_data
+
+
+class RegionFile:
+    """Memory-mapped region file; only the header is parsed up front."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        match = _REGION_NAME.match(os.path.basename(file_path))
+        self.region_x, self.region_z = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+        self._file = open(file_path, "rb")
+        self._map = None
+        self.chunks = []
+        self._read_header()
+
+    def _read_header(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER_SIZE:
+            return
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = self._map[:HEADER_SIZE]
+        for index in range(CHUNK_COUNT):
+            location = int.from_bytes(header[index * 4:index * 4 + 4], "big")
+            if not location:
+                continue
+            offset, sectors = location >> 8, location & 0xFF
+            pos = SECTOR_SIZE + index * 4
+            timestamp = int.from_bytes(header[pos:pos + 4], "big")
+            self.chunks.append(RegionChunk(self, index, offset, sectors, timestamp))
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def __getitem__(self, row):
+        return self.chunks[row].load()
+
+    def read_chunk_payload(self, chunk):
+        """Return (compression type, compressed bytes) of a chunk as stored."""
+        start = chunk.offset * SECTOR_SIZE
+        length = int.from_bytes(self._map[start:start + 4], "big")
+        compression = self._map[start + 4]
+        if compression & EXTERNAL_FLAG:
+            with open(chunk.external_path(), "rb") as f:
+                return compression & ~EXTERNAL_FLAG, f.read()
+        return compression, self._map[start + 5:start + 4 + length]
+
+    def read_chunk_data(self, chunk):
+        """Return the uncompressed NBT bytes of a chunk."""
+        return decompress_chunk(*self.read_chunk_payload(chunk))
+
+    @property
+    def dirty_chunks(self):
+        return [chunk for chunk in self.chunks if chunk.dirty]
+
+    def mark_dirty(self, chunk):
+        chunk.dirty = True
+
+    def prepare_save(self, file_path=None, compression="zlib", level=DEFAULT_COMPRESSION_LEVEL):
+        """Snapshot dirty chunks for a RegionSaveJob; clears their dirty flags."""
+        return RegionSaveJob(self, file_path or self.file_path, compression, level)
+
+    def save(self, file_path=None, compression="zlib", level=DEFAULT_COMPRESSION_LEVEL):
+        """Write modified chunks back, copying untouched sectors byte-for-byte."""
+        job = self.prepare_save(file_path, compression, level)
+        try:
+            job.run()
+        except BaseException:
+            job.abort()
+            raise
+        job.commit()
+
+    def is_external(self, chunk):
+        pos = chunk.offset * SECTOR_SIZE + 4
+        return pos < len(self._map) and bool(self._map[pos] & EXTERNAL_FLAG)
+
+    def switch_to(self, file_path, layout):
+        """Reopen the region at file_path and adopt the chunk layout a save produced."""
+        self.close()
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        for chunk in self.chunks:
+            if chunk.index in layout:
+                chunk.offset, chunk.sectors, chunk.timestamp = layout[chunk.index]
+        self._remap()
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if os.fstat(self._file.fileno()).st_size >= HEADER_SIZE:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class RegionSaveJob:
+    """Incremental, atomic region save.
+
+    run() is thread-safe: it copies the current file to a temporary file
+    next to the target, writes only the re-encoded dirty chunks into free
+    or reused sectors, rewrites the header and atomically renames the copy
+    over the target. commit() then adopts the new layout on the GUI thread.
+    """
+
+    def __init__(self, region, file_path, compression, level):
+        self.region = region
+        self.source_path = region.file_path
+        self.file_path = file_path
+        self.compression = compression
+        self.level = level
+        self.layout = {chunk.index: (chunk.offset, chunk.sectors, chunk.timestamp) for chunk in region.chunks}
+        self.region_x, self.region_z = region.region_x, region.region_z
+        self.dirty = region.dirty_chunks
+        self.snapshots = {chunk.index: snapshot_tag(chunk.nbt_data) for chunk in self.dirty}
+        for chunk in self.dirty:
+            chunk.dirty = False
+        self.copy_external = []
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.dirname(os.path.abspath(self.source_path)):
+            self.copy_external = [chunk.external_path() for chunk in region.chunks
+                                  if chunk.index not in self.snapshots and region.is_external(chunk)]
+
+    def run(self):
+        target_dir = os.path.dirname(os.path.abspath(self.file_path))
+        temp_path = temp_path_for(self.file_path)
+        # External chunk files are written as (temporary file, final path)
+        # pairs and only moved into place, or deleted, once the region that
+        # refers to them has been renamed over the old one
+        self.staged = []
+        self.stale = []
+        try:
+            with perf.span("copy"):
+                shutil.copyfile(self.source_path, temp_path)
+                for path in self.copy_external:
+                    if os.path.exists(path):
+                        external_temp = self._stage(os.path.join(target_dir, os.path.basename(path)))
+                        shutil.copyfile(path, external_temp)
+            if self.snapshots:
+                with perf.span("write chunks"):
+                    self._write_dirty(temp_path, target_dir)
+            with perf.span("sync"):
+                replace_atomic(temp_path, self.file_path)
+        except BaseException:
+            for path in [temp_path] + [external_temp for external_temp, _ in self.staged]:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        with perf.span("external chunks"):
+            for external_temp, path in self.staged:
+                replace_atomic(external_temp, path)
+            for path in self.stale:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _stage(self, path):
+        """Temporary file that replaces path once the region is in place."""
+        external_temp = temp_path_for(path)
+        self.staged.append((external_temp, path))
+        return external_temp
+
+    def _write_dirty(self, temp_path, target_dir):
+        with open(temp_path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            used = bytearray(max(HEADER_SIZE // SECTOR_SIZE, -(-f.tell() // SECTOR_SIZE)))
+            used[0:2] = b"\x01\x01"
+            for index, (offset, sectors, _) in self.layout.items():
+                if index not in self.snapshots:
+                    used[offset:offset + sectors] = b"\x01" * sectors
+
+            # Chunks that still fit keep their sectors; the rest are placed
+            # afterwards so they can never overlap a chunk rewritten in place.
+            placements = []
+            relocated = []
+            for index, nbt_data in self.snapshots.items():
+                blob = self._encode_chunk(index, nbt_data, target_dir)
+                needed = len(blob) // SECTOR_SIZE
+                offset, sectors, _ = self.layout[index]
+                if needed <= sectors and offset >= 2:
+                    used[offset:offset + needed] = b"\x01" * needed
+                    placements.append((index, blob, offset))
+                else:
+                    relocated.append((index, blob))
+            for index, blob in relocated:
+                needed = len(blob) // SECTOR_SIZE
+                offset = _find_free_run(used, needed)
+                if offset + needed > len(used):
+                    used.extend(bytes(offset + needed - len(used)))
+                used[offset:offset + needed] = b"\x01" * needed
+                placements.append((index, blob, offset))
+
+            now = int(time.time())
+            for index, blob, offset in placements:
+                f.seek(offset * SECTOR_SIZE)
+                f.write(blob)
+                self.layout[index] = (offset, len(blob) // SECTOR_SIZE, now)
+
+            f.seek(0)
+            f.write(_encode_header(self.layout))
+
+    def _encode_chunk(self, index, nbt_data, target_dir):
+        """Serialize and compress a chunk into whole, padded sectors."""
+        buffer = io.BytesIO()
+        nbt_data.write(buffer)
+        payload = compress(buffer.getvalue(), self.compression, self.level)
+        compression = _COMPRESSION_IDS[self.compression]
+        x = self.region_x * 32 + index % 32
+        z = self.region_z * 32 + index // 32
+        external = os.path.join(target_dir, f"c.{x}.{z}.mcc")
+        if len(payload) + 5 > 255 * SECTOR_SIZE:
+            # Oversized chunks live in a c.<x>.<z>.mcc file next to the region
+            with open(self._stage(external), "wb") as f:
+                f.write(payload)
+            payload = b""
+            compression |= EXTERNAL_FLAG
+        elif os.path.exists(external):
+            self.stale.append(external)
+        blob = struct.pack(">IB", len(payload) + 1, compression) + payload
+        return blob + bytes(-len(blob) % SECTOR_SIZE)
+
+    def commit(self):
+        self.region.switch_to(self.file_path, self.layout)
+
+    def abort(self):
+        for chunk in self.dirty:
+            chunk.dirty = True
+
+
+def _find_free_run(used, needed):
+    """First-fit search for a run of free sectors, appending if none exists."""
+    run_start, run_length = None, 0
+    for sector in range(2, len(used)):
+        if used[sector]:
+            run_start, run_length = None, 0
+            continue
+        if run_start is None:
+            run_start = sector
+        run_length += 1
+        if run_length == needed:
+            return run_start
+    return run_start if run_start is not None and run_start + run_length == len(used) else len(used)
+
+
+def _encode_header(layout):
+    locations = bytearray(SECTOR_SIZE)
+    timestamps = bytearray(SECTOR_SIZE)
+    for index, (offset, sectors, timestamp) in layout.items():
+        pos = index * 4
+        locations[pos:pos + 4] = ((offset << 8) | sectors).to_bytes(4, "big")
+        timestamps[pos:pos + 4] = timestamp.to_bytes(4, "big")
+    return bytes(locations + timestamps)
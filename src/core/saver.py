@@ -0,0 +1,116 @@
+import gzip
+import io
+import os
+import tempfile
+import zlib
+from nbtlib import File
+from nbtlib.tag import Compound, List, Array
+from core import perf
+from core.lazy_nbt import LazyCompound
+
+COMPRESSION_FORMATS = ("gzip", "zlib", "none")
+DEFAULT_COMPRESSION_LEVEL = 9
+
+
+def snapshot_tag(tag):
+    """Copy the container structure of a tag so it can be encoded off-thread.
+
+    Scalars are immutable and shared; compounds, lists and arrays are copied,
+    which is much cheaper than a deepcopy of the whole document. Compounds
+    that were never decoded are shared as new placeholders and written back
+    byte-for-byte.
+    """
+    if isinstance(tag, LazyCompound) and not tag.loaded:
+        return tag.copy_lazy()
+    if isinstance(tag, Compound):
+        copy = type(tag)({key: snapshot_tag(value) for key, value in tag.items()})
+        if isinstance(tag, File):
+            copy.root_name = tag.root_name
+            copy.filename = tag.filename
+            copy.gzipped = tag.gzipped
+            copy.byteorder = tag.byteorder
+        return copy
+    if isinstance(tag, List):
+        return type(tag)([snapshot_tag(value) for value in tag])
+    if isinstance(tag, Array):
+        return tag.copy()
+    return tag
+
+
+def compress(data, compression="gzip", level=DEFAULT_COMPRESSION_LEVEL):
+    """Compress serialized NBT with one of COMPRESSION_FORMATS."""
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=level)
+    if compression == "zlib":
+        return zlib.compress(data, level)
+    if compression == "none":
+        return data
+    raise ValueError(f"Unknown compression format: {compression}")
+
+
+def encode_nbt(nbt_data, compression="gzip", level=DEFAULT_COMPRESSION_LEVEL):
+    """Serialize a File (named root compound) and compress it."""
+    buffer = io.BytesIO()
+    with perf.span("serialize"):
+        nbt_data.write(buffer, getattr(nbt_data, "byteorder", "big"))
+    with perf.span("compress"):
+        return compress(buffer.getvalue(), compression, level)
+
+
+def temp_path_for(file_path):
+    """Create an empty temporary file next to file_path and return its path."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    os.close(fd)
+    return temp_path
+
+
+def replace_atomic(temp_path, file_path):
+    """fsync temp_path and atomically rename it over file_path."""
+    if os.path.exists(file_path):
+        os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+    with open(temp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def write_atomic(file_path, data):
+    """Write bytes to file_path so readers see either the old or the new file."""
+    temp_path = temp_path_for(file_path)
+    try:
+        with perf.span("write"):
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            replace_atomic(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class NBTSaveJob:
+    """Save of a regular NBT file, split into a thread-safe run() and a GUI-side commit()."""
+
+    def __init__(self, nbt_data, file_path, compression, level):
+        self.snapshot = snapshot_tag(nbt_data)
+        self.nbt_data = nbt_data
+        self.file_path = file_path
+        self.compression = compression
+        self.level = level
+
+    def run(self):
+        write_atomic(self.file_path, encode_nbt(self.snapshot, self.compression, self.level))
+
+    def commit(self):
+        self.nbt_data.filename = self.file_path
+        self.nbt_data.gzipped = self.compression == "gzip"
+        self.nbt_data.compression = self.compression
+
+    def abort(self):
+        pass
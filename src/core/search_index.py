@@ -0,0 +1,385 @@
+from array import array
+from bisect import bisect_right
+import numpy as np
+from nbtlib.tag import Compound, List, String, Numeric
+from core.lazy_nbt import LazyCompound, compound_items
+from core.region import RegionFile
+
+# Distinct keys added since the last merge are scanned linearly until there
+# are this many of them, then folded into the joined search text.
+PENDING_MERGE_THRESHOLD = 1024
+CANCEL_CHECK_INTERVAL = 10000
+# Edited-in containers larger than this are indexed on the next query, not during the edit
+DEFER_INDEX_SIZE = 256
+
+
+class IndexCancelled(Exception):
+    """Raised when building an index is cancelled."""
+
+
+def scalar_text(tag):
+    """Text a scalar tag is indexed and matched under, or None for non-scalars."""
+    if isinstance(tag, String):
+        return str.__str__(tag)
+    if isinstance(tag, Numeric):
+        return str(tag.unpack())
+    return None
+
+
+class _Postings:
+    """Mapping of text to node ids, with a joined lowercase copy for substring scans."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.merged = []
+        self.starts = array("q")
+        self.text = ""
+        self.pending = []
+
+    def add(self, key, node):
+        nodes = self.nodes.get(key)
+        if nodes is None:
+            self.nodes[key] = nodes = array("i")
+            self.pending.append(key)
+            if len(self.pending) > PENDING_MERGE_THRESHOLD:
+                self.merge()
+        nodes.append(node)
+
+    def merge(self):
+        if not self.pending:
+            return
+        parts = [self.text] if self.text else []
+        position = len(self.text)
+        for key in self.pending:
+            self.merged.append(key)
+            self.starts.append(position)
+            flat = key.lower().replace("\n", " ") + "\n"
+            parts.append(flat)
+            position += len(flat)
+        self.text = "".join(parts)
+        self.pending = []
+
+    def matching_keys(self, needle):
+        """Yield every distinct key containing needle (case-insensitive)."""
+        text, starts, merged = self.text, self.starts, self.merged
+        position = text.find(needle)
+        while position != -1:
+            slot = bisect_right(starts, position) - 1
+            yield merged[slot]
+            following = starts[slot + 1] if slot + 1 < len(starts) else len(text)
+            position = text.find(needle, following)
+        for key in self.pending:
+            if needle in key.lower():
+                yield key
+
+
+class SearchIndex:
+    """Inverted index of tag names and scalar values, mapped to tag paths.
+
+    Tags are stored as nodes in a compact table (parent id and key per node)
+    rather than as path tuples. The index follows document edits through the
+    same listener interface as the tree model. Region chunks are indexed the
+    first time a query runs after they have been decoded; large or undecoded
+    containers inserted by an edit (a paste) wait for the next query too.
+    """
+
+    def __init__(self, nbt_data, cancelled=None):
+        self.nbt_data = nbt_data
+        self.cancelled = cancelled
+        self.parent = array("i")
+        self.keys = []
+        self.dead = bytearray()
+        self.dead_count = 0
+        self.children = {}
+        self.names = _Postings()
+        self.values = _Postings()
+        self.pending_chunks = {}
+        self.pending_subtrees = set()
+        self.renamed = set()
+        self._build()
+        self.cancelled = None
+
+    def _build(self):
+        root = self._new_node(-1, None)
+        self.children[root] = []
+        if isinstance(self.nbt_data, RegionFile):
+            for row, chunk in enumerate(self.nbt_data):
+                node = self._new_node(root, row)
+                self.children[root].append(node)
+                self.pending_chunks[node] = chunk
+        else:
+            self._index_children(root, self.nbt_data)
+        self.names.merge()
+        self.values.merge()
+
+    def _new_node(self, parent, key):
+        self.parent.append(parent)
+        self.keys.append(key)
+        self.dead.append(0)
+        return len(self.keys) - 1
+
+    def _index_children(self, node, container):
+        items = compound_items(container) if isinstance(container, Compound) else enumerate(container)
+        for key, value in items:
+            self._index_subtree(node, key, value)
+
+    def _index_subtree(self, parent, key, tag, position=None):
+        """Index tag and its descendants under parent, returning the new node."""
+        top = self._new_node(parent, key)
+        siblings = self.children[parent]
+        siblings.insert(len(siblings) if position is None else position, top)
+        stack = [(top, key, tag)]
+        while stack:
+            node, key, tag = stack.pop()
+            if isinstance(key, str):
+                self.names.add(key, node)
+            if isinstance(tag, (Compound, List)):
+                children = self.children[node] = []
+                items = compound_items(tag) if isinstance(tag, Compound) else enumerate(tag)
+                pushed = []
+                for child_key, child in items:
+                    child_node = self._new_node(node, child_key)
+                    children.append(child_node)
+                    pushed.append((child_node, child_key, child))
+                # Pop in document order so node ids roughly follow it
+                pushed.reverse()
+                stack.extend(pushed)
+            else:
+                text = scalar_text(tag)
+                if text is not None:
+                    self.values.add(text, node)
+            if self.cancelled and node % CANCEL_CHECK_INTERVAL == 0 and self.cancelled():
+                raise IndexCancelled()
+        return top
+
+    def _index_edit(self, parent, key, tag, position):
+        if isinstance(tag, (Compound, List)) and (
+                len(tag) > DEFER_INDEX_SIZE or (isinstance(tag, LazyCompound) and not tag.loaded)):
+            # Like an undecoded chunk: the node has no children entry until
+            # refresh(), so edits below it are ignored until then
+            node = self._new_node(parent, key)
+            self.children[parent].insert(position, node)
+            if isinstance(key, str):
+                self.names.add(key, node)
+            self.pending_subtrees.add(node)
+        else:
+            self._index_subtree(parent, key, tag, position)
+
+    def _kill(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if not self.dead[node]:
+                self.dead[node] = 1
+                self.dead_count += 1
+            stack.extend(self.children.pop(node, ()))
+
+    def node_for_path(self, path):
+        """Return the node at path, or None if it is not indexed (yet)."""
+        node = 0
+        for key in path:
+            children = self.children.get(node)
+            if children is None:
+                return None
+            if isinstance(key, int):
+                node = children[key]
+            else:
+                node = next((child for child in children if self.keys[child] == key), None)
+                if node is None:
+                    return None
+        return node
+
+    def path_of(self, node):
+        keys = []
+        while node > 0:
+            keys.append(self.keys[node])
+            node = self.parent[node]
+        return tuple(reversed(keys))
+
+    def refresh(self):
+        """Index region chunks decoded and containers inserted since the last query."""
+        for node, chunk in list(self.pending_chunks.items()):
+            if chunk.loaded:
+                del self.pending_chunks[node]
+                self.children[node] = []
+                self._index_children(node, chunk.nbt_data)
+        pending, self.pending_subtrees = self.pending_subtrees, set()
+        for node in sorted(pending):
+            if not self.dead[node]:
+                self.children[node] = []
+                self._index_children(node, self._resolve(self.path_of(node)))
+        if self.dead_count > len(self.keys) // 2 and self.dead_count > CANCEL_CHECK_INTERVAL:
+            self.__init__(self.nbt_data)
+
+    def search(self, text, names=True, values=True, limit=10000):
+        """Return paths whose name and/or scalar value contains text."""
+        self.refresh()
+        needle = text.lower()
+        parts = []
+        if names:
+            for key in self.names.matching_keys(needle):
+                nodes = np.frombuffer(self.names.nodes[key], np.int32)
+                if key in self.renamed:
+                    nodes = np.array([node for node in nodes if self.keys[node] == key], np.int32)
+                parts.append(nodes)
+        if values:
+            for key in self.values.matching_keys(needle):
+                parts.append(np.frombuffer(self.values.nodes[key], np.int32))
+        if not parts:
+            return []
+        found = np.concatenate(parts)
+        found = found[np.frombuffer(self.dead, np.uint8)[found] == 0]
+        found.sort()
+        if len(found) > 1:
+            found = found[np.concatenate(([True], found[1:] != found[:-1]))]
+        return [self.path_of(int(node)) for node in found[:limit]]
+
+    def named(self, name, value=None):
+        """Return paths of tags named exactly name (and, if given, whose value text is exactly value)."""
+        self.refresh()
+        nodes = self.names.nodes.get(name)
+        if nodes is None:
+            return []
+        found = np.frombuffer(nodes, np.int32)
+        if value is not None:
+            values = self.values.nodes.get(value)
+            if values is None:
+                return []
+            found = np.intersect1d(found, np.frombuffer(values, np.int32))
+        else:
+            found = np.unique(found)
+        found = found[np.frombuffer(self.dead, np.uint8)[found] == 0]
+        if name in self.renamed:
+            found = [node for node in found if self.keys[node] == name]
+        return [self.path_of(int(node)) for node in found]
+
+    def _resolve(self, path):
+        tag = self.nbt_data
+        for key in path:
+            tag = tag[key]
+        return tag
+
+    def _shift_list_keys(self, children, start, delta):
+        for child in children[start:]:
+            self.keys[child] += delta
+
+    def _renumber(self, children, start):
+        for position in range(start, len(children)):
+            self.keys[children[position]] = position
+
+    def _children_for_edit(self, parent_path):
+        parent = self.node_for_path(parent_path)
+        if parent is None or parent not in self.children:
+            return None, None
+        return parent, self.children[parent]
+
+    # Document listener interface, called by NBTHandler after each mutation
+
+    def tag_changed(self, parent_path, key):
+        parent = self.node_for_path(parent_path)
+        if parent is None or parent not in self.children:
+            return
+        children = self.children[parent]
+        old = self.node_for_path(parent_path + (key,))
+        position = children.index(old)
+        children.pop(position)
+        self._kill(old)
+        self._index_edit(parent, key, self._resolve(parent_path)[key], position)
+
+    def tag_inserted(self, parent_path, key, position):
+        parent = self.node_for_path(parent_path)
+        if parent is None or parent not in self.children:
+            return
+        if isinstance(key, int):
+            self._shift_list_keys(self.children[parent], position, 1)
+        self._index_edit(parent, key, self._resolve(parent_path)[key], position)
+
+    def tag_removed(self, parent_path, key, position):
+        parent = self.node_for_path(parent_path)
+        if parent is None or parent not in self.children:
+            return
+        children = self.children[parent]
+        self._kill(children.pop(position))
+        if isinstance(key, int):
+            self._shift_list_keys(children, position, -1)
+
+    def tag_renamed(self, parent_path, old_name, new_name):
+        node = self.node_for_path(parent_path + (old_name,))
+        if node is not None:
+            self.keys[node] = new_name
+            self.names.add(new_name, node)
+            # The old posting is left in place and filtered at query time
+            self.renamed.add(old_name)
+
+    def tags_changed(self, parent_path, keys):
+        parent, children = self._children_for_edit(parent_path)
+        if parent is None:
+            return
+        container = self._resolve(parent_path)
+        if keys and isinstance(keys[0], str):
+            positions = {self.keys[child]: position for position, child in enumerate(children)}
+        else:
+            positions = {key: key for key in keys}
+        for key in keys:
+            position = positions[key]
+            self._kill(children.pop(position))
+            self._index_edit(parent, key, container[key], position)
+
+    def tags_inserted(self, parent_path, keys, positions):
+        parent, children = self._children_for_edit(parent_path)
+        if parent is None:
+            return
+        container = self._resolve(parent_path)
+        for key, position in zip(keys, positions):
+            self._index_edit(parent, key, container[key], position)
+        if positions and isinstance(keys[0], int):
+            self._renumber(children, positions[0])
+
+    def tags_removed(self, parent_path, keys, positions):
+        parent, children = self._children_for_edit(parent_path)
+        if parent is None:
+            return
+        removed = set(positions)
+        for position in positions:
+            self._kill(children[position])
+        children[:] = [child for position, child in enumerate(children) if position not in removed]
+        if positions and isinstance(keys[0], int):
+            self._renumber(children, positions[0])
+
+
+def iter_matches(nbt_data, text, cancelled=None):
+    """Walk the document and yield paths whose name or scalar value contains text.
+
+    Unlike SearchIndex this needs no prior indexing, only reads the data and
+    is safe to run off the GUI thread. Undecoded region chunks are skipped;
+    undecoded compounds are read from the document buffer and left undecoded.
+    """
+    needle = text.lower()
+    if isinstance(nbt_data, RegionFile):
+        stack = [((row,), chunk.nbt_data) for row, chunk in enumerate(nbt_data) if chunk.loaded]
+        stack.reverse()
+    else:
+        stack = [((), nbt_data)]
+    visited = 0
+    while stack:
+        path, container = stack.pop()
+        # Snapshot the children so edits on the GUI thread cannot break the walk
+        items = compound_items(container) if isinstance(container, Compound) else list(enumerate(container))
+        pushed = []
+        for key, value in items:
+            if isinstance(value, (Compound, List)):
+                pushed.append((path + (key,), value))
+                matched = isinstance(key, str) and needle in key.lower()
+            else:
+                value_text = scalar_text(value)
+                matched = (isinstance(key, str) and needle in key.lower()) or (
+                    value_text is not None and needle in value_text.lower())
+            if matched:
+                yield path + (key,)
+        pushed.reverse()
+        stack.extend(pushed)
+        visited += len(items)
+        if cancelled and visited >= CANCEL_CHECK_INTERVAL:
+            visited = 0
+            if cancelled():
+                return
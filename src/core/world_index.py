@@ -0,0 +1,417 @@
+import io
+import os
+import sqlite3
+import struct
+import time
+from nbtlib.tag import String
+from core.nbt_stream import NBTStreamReader, SKIP, DESCEND, TAG_LIST, open_stream
+from core.region import RegionFile, decompress_chunk, is_region_file
+
+INDEX_FILE_NAME = "nbt_editor_index.sqlite"
+# Bump when the schema or what gets extracted changes; older catalogs are rebuilt
+SCHEMA_VERSION = 1
+
+# Kinds of indexed files, named after the world folder they live in
+REGION = "region"
+ENTITIES = "entities"
+PLAYERDATA = "playerdata"
+
+# Kinds of catalog entries
+ENTITY = "entity"
+BLOCK_ENTITY = "block_entity"
+ITEM = "item"
+
+# Chunk number recorded for files that are not region files
+NO_CHUNK = -1
+COMMIT_INTERVAL = 64
+
+_ENTITY_LISTS = {"Entities", "entities", "Passengers"}
+_BLOCK_ENTITY_LISTS = {"block_entities", "TileEntities"}
+_COUNT_KEYS = {"Count", "count"}
+# Bulky chunk data that never holds entities or items; skipped unparsed
+_SKIPPED = {"sections", "Sections", "Heightmaps", "Biomes", "structures", "Structures", "block_ticks",
+            "fluid_ticks", "TileTicks", "LiquidTicks", "PostProcessing", "Lights", "ToBeTicked",
+            "LiquidsToBeTicked", "CarvingMasks", "blending_data", "below_zero_retrogen"}
+# Tag headers of the chunk lists holding everything cataloged: block
+# entities (1.18+ and older), entities (older chunks and entity files)
+_LIST_HEADERS = [(name, bytes((TAG_LIST,)) + struct.pack(">H", len(name)) + name.encode())
+                 for name in ("block_entities", "TileEntities", "Entities")]
+
+_SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE chunks (
+    file_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    z INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (file_id, chunk)
+) WITHOUT ROWID;
+CREATE TABLE entries (
+    file_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    container TEXT,
+    count INTEGER NOT NULL
+);
+CREATE INDEX entries_by_name ON entries (name, kind);
+CREATE INDEX entries_by_chunk ON entries (file_id, chunk);
+"""
+
+
+def world_files(world_path):
+    """Yield (relative path, kind) of the region, entity and player files of a world.
+
+    Dimensions are included: every folder named region, entities or
+    playerdata below the world is searched.
+    """
+    for directory, subdirs, names in os.walk(world_path):
+        subdirs.sort()
+        kind = os.path.basename(directory)
+        if kind not in (REGION, ENTITIES, PLAYERDATA):
+            continue
+        for name in sorted(names):
+            if is_region_file(name) if kind != PLAYERDATA else name.lower().endswith(".dat"):
+                relative = os.path.relpath(os.path.join(directory, name), world_path)
+                yield relative.replace(os.sep, "/"), kind
+
+
+def _select(path, tag_id):
+    return SKIP if len(path) <= 2 and path and path[-1] in _SKIPPED else DESCEND
+
+
+def catalog_stream(fileobj, default_container=None):
+    """Count the entities, block entities and items of an uncompressed NBT stream.
+
+    Returns {(kind, id, container): count}. An entry of an entity or block
+    entity list is an entity or block entity; any other compound with an id
+    and a count is an item stack, its container being the nearest entity or
+    block entity around it (default_container when there is none).
+    """
+    return _catalog(NBTStreamReader(fileobj).events(_select), default_container)
+
+
+def catalog_chunk(data):
+    """catalog_stream() for the uncompressed bytes of a region chunk.
+
+    Walking a chunk mostly means stepping over its sections tag by tag, so
+    the entity lists are found by searching the bytes for their tag headers
+    and only they are parsed. Matches inside a list already parsed are
+    ignored; if a match does not parse, the whole chunk is walked instead.
+    """
+    starts = sorted((position, name, len(header)) for name, header in _LIST_HEADERS
+                    for position in _find_all(data, header))
+    if not starts:
+        return {}
+    stream = io.BytesIO(data)
+    events = []
+    end = 0
+    try:
+        for position, name, length in starts:
+            if position < end:
+                continue
+            stream.seek(position + length)
+            reader = NBTStreamReader(stream)
+            events.extend(reader.payload_events((name,), TAG_LIST))
+            end = position + length + reader.offset
+    except (ValueError, EOFError, KeyError, IndexError, struct.error):
+        return catalog_stream(io.BytesIO(data))
+    return _catalog(events, None)
+
+
+def _find_all(data, pattern):
+    position = data.find(pattern)
+    while position >= 0:
+        yield position
+        position = data.find(pattern, position + 1)
+
+
+def _catalog(events, default_container):
+    ids = {}
+    counts = {}
+    for path, tag_type, value in events:
+        if not path:
+            continue
+        key = path[-1]
+        if key == "id" and tag_type is String:
+            ids[path[:-1]] = value
+        elif key in _COUNT_KEYS and isinstance(value, int):
+            counts[path[:-1]] = value
+
+    # Containers have shorter paths than their contents; an id may follow
+    # the items in the file, so file order is not enough
+    containers = {}
+    catalog = {}
+    for compound, name in sorted(ids.items(), key=lambda item: len(item[0])):
+        if len(compound) >= 2 and isinstance(compound[-1], int) and compound[-2] in _ENTITY_LISTS:
+            kind, count = ENTITY, 1
+        elif len(compound) >= 2 and isinstance(compound[-1], int) and compound[-2] in _BLOCK_ENTITY_LISTS:
+            kind, count = BLOCK_ENTITY, 1
+        elif compound in counts:
+            kind, count = ITEM, counts[compound]
+        else:
+            continue
+        container = default_container
+        for depth in range(len(compound) - 1, 0, -1):
+            outer = containers.get(compound[:depth])
+            if outer is not None:
+                container = outer
+                break
+        if kind != ITEM:
+            containers[compound] = name
+        entry = (kind, name, container)
+        catalog[entry] = catalog.get(entry, 0) + count
+    return catalog
+
+
+class ScanResult:
+    """What a worker process extracted from one file, for WorldIndex to store.
+
+    chunks lists (chunk, x, z, timestamp, size) of the new or modified
+    chunks, whose entries are in entries as (chunk, kind, id, container,
+    count); present holds every chunk the file still has.
+    """
+
+    def __init__(self, path, kind, mtime_ns, size):
+        self.path = path
+        self.kind = kind
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.chunks = []
+        self.entries = []
+        self.present = set()
+        self.error = None
+
+
+def scan_file(world_path, path, kind, mtime_ns, size, known=None):
+    """Catalog one world file; known maps chunks to the timestamps already cataloged.
+
+    Region chunks whose timestamp matches known are neither read nor
+    returned. Errors are reported in the result, not raised.
+    """
+    result = ScanResult(path, kind, mtime_ns, size)
+    file_path = os.path.join(world_path, path)
+    try:
+        if kind == PLAYERDATA:
+            with open(file_path, "rb") as raw:
+                catalog = catalog_stream(open_stream(raw), "minecraft:player")
+            result.present.add(NO_CHUNK)
+            result.chunks.append((NO_CHUNK, 0, 0, 0, size))
+            result.entries.extend((NO_CHUNK,) + entry + (count,) for entry, count in catalog.items())
+            return result
+        region = RegionFile(file_path)
+        try:
+            for chunk in region.chunks:
+                result.present.add(chunk.index)
+                if known is not None and known.get(chunk.index) == chunk.timestamp:
+                    continue
+                compression, payload = region.read_chunk_payload(chunk)
+                result.chunks.append((chunk.index, chunk.x, chunk.z, chunk.timestamp, len(payload)))
+                try:
+                    catalog = catalog_chunk(decompress_chunk(compression, payload))
+                except Exception:
+                    # A damaged chunk is still listed; it just contributes no entries
+                    continue
+                result.entries.extend((chunk.index,) + entry + (count,) for entry, count in catalog.items())
+        finally:
+            region.close()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _scan_task(task):
+    return scan_file(*task)
+
+
+class ScanSummary:
+    def __init__(self):
+        self.files = 0
+        self.scanned = 0
+        self.removed = 0
+        self.chunks = 0
+        self.failed = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f"{self.files} files ({self.bytes / 1e6:.1f} MB), {self.scanned} scanned "
+                f"({self.chunks} chunks read), {self.removed} removed, {self.failed} failed "
+                f"in {self.seconds:.2f} s")
+
+
+class Match:
+    """One catalog row answering a query."""
+
+    __slots__ = ("path", "chunk_x", "chunk_z", "kind", "name", "container", "count")
+
+    def __init__(self, path, chunk, chunk_x, chunk_z, kind, name, container, count):
+        self.path = path
+        # None outside region files
+        self.chunk_x = chunk_x if chunk != NO_CHUNK else None
+        self.chunk_z = chunk_z if chunk != NO_CHUNK else None
+        self.kind = kind
+        self.name = name
+        self.container = container
+        self.count = count
+
+    def __str__(self):
+        where = self.path if self.chunk_x is None else f"{self.path} chunk [{self.chunk_x}, {self.chunk_z}]"
+        inside = f" in {self.container}" if self.container else ""
+        return f"{where}: {self.count} {self.name} ({self.kind}){inside}"
+
+
+class WorldIndex:
+    """Persistent SQLite catalog of the entities, block entities and items of a world.
+
+    update() scans the region, entities and playerdata folders in worker
+    processes. Files whose modification time and size are unchanged are
+    skipped, and in changed region files only the chunks whose header
+    timestamp moved are read again, so refreshing the catalog of a large
+    world after playing for a while takes seconds. Queries use an index on
+    the ids and return in milliseconds.
+    """
+
+    def __init__(self, world_path, db_path=None):
+        self.world_path = world_path
+        self.db_path = db_path or os.path.join(world_path, INDEX_FILE_NAME)
+        self.connection = sqlite3.connect(self.db_path)
+        # A lost update only costs a rescan, durability is not worth the fsyncs
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.rebuild()
+
+    def rebuild(self):
+        """Drop the catalog; the next update() scans every file."""
+        with self.connection:
+            for table in ("entries", "chunks", "files"):
+                self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, jobs=None, on_result=None):
+        """Bring the catalog up to date with the world, calling on_result(result) per scanned file."""
+        summary = ScanSummary()
+        started = time.perf_counter()
+        stored = {path: (file_id, mtime_ns, size) for file_id, path, mtime_ns, size
+                  in self.connection.execute("SELECT id, path, mtime_ns, size FROM files")}
+        tasks = []
+        for path, kind in world_files(self.world_path):
+            try:
+                stat = os.stat(os.path.join(self.world_path, path))
+            except OSError:
+                continue
+            summary.files += 1
+            summary.bytes += stat.st_size
+            previous = stored.pop(path, None)
+            if previous is not None and previous[1:] == (stat.st_mtime_ns, stat.st_size):
+                continue
+            known = None
+            if previous is not None and kind != PLAYERDATA:
+                known = dict(self.connection.execute(
+                    "SELECT chunk, timestamp FROM chunks WHERE file_id = ?", (previous[0],)))
+            tasks.append((self.world_path, path, kind, stat.st_mtime_ns, stat.st_size, known))
+
+        with self.connection:
+            for file_id, _, _ in stored.values():
+                self._delete_file(file_id)
+        summary.removed = len(stored)
+
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(tasks) <= 1:
+            results = map(_scan_task, tasks)
+            executor = None
+        else:
+            # Imported here, like in core.batch, to keep single-file runs light
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(jobs)
+            results = executor.map(_scan_task, tasks, chunksize=max(1, min(16, len(tasks) // (jobs * 8))))
+        try:
+            for count, result in enumerate(results, 1):
+                summary.scanned += 1
+                summary.chunks += len(result.chunks)
+                if result.error is not None:
+                    summary.failed += 1
+                else:
+                    self._store(result)
+                if on_result:
+                    on_result(result)
+                if count % COMMIT_INTERVAL == 0:
+                    self.connection.commit()
+            self.connection.commit()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        summary.seconds = time.perf_counter() - started
+        return summary
+
+    def _delete_file(self, file_id):
+        for table, column in (("entries", "file_id"), ("chunks", "file_id"), ("files", "id")):
+            self.connection.execute(f"DELETE FROM {table} WHERE {column} = ?", (file_id,))
+
+    def _store(self, result):
+        execute = self.connection.execute
+        execute("INSERT INTO files (path, kind, mtime_ns, size) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET kind = excluded.kind, mtime_ns = excluded.mtime_ns, "
+                "size = excluded.size", (result.path, result.kind, result.mtime_ns, result.size))
+        file_id = execute("SELECT id FROM files WHERE path = ?", (result.path,)).fetchone()[0]
+        stale = [(file_id, chunk) for chunk, in execute("SELECT chunk FROM chunks WHERE file_id = ?", (file_id,))
+                 if chunk not in result.present]
+        stale.extend((file_id, chunk[0]) for chunk in result.chunks)
+        self.connection.executemany("DELETE FROM entries WHERE file_id = ? AND chunk = ?", stale)
+        self.connection.executemany("DELETE FROM chunks WHERE file_id = ? AND chunk = ?", stale)
+        self.connection.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                                    [(file_id,) + chunk for chunk in result.chunks])
+        self.connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                    [(file_id,) + entry for entry in result.entries])
+
+    def find(self, name, kind=None, container=None, limit=None):
+        """Catalog rows for an id, most plentiful first.
+
+        name and container may be glob patterns such as "*shulker_box";
+        ids without a namespace get "minecraft:".
+        """
+        clauses = [_match_clause("e.name", name)]
+        parameters = [_qualify(name)]
+        if kind is not None:
+            clauses.append("e.kind = ?")
+            parameters.append(kind)
+        if container is not None:
+            clauses.append(_match_clause("e.container", container))
+            parameters.append(_qualify(container))
+        query = ("SELECT f.path, e.chunk, c.x, c.z, e.kind, e.name, e.container, e.count FROM entries e "
+                 "JOIN files f ON f.id = e.file_id "
+                 "LEFT JOIN chunks c ON c.file_id = e.file_id AND c.chunk = e.chunk "
+                 f"WHERE {' AND '.join(clauses)} ORDER BY e.count DESC, f.path, e.chunk")
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [Match(*row) for row in self.connection.execute(query, parameters)]
+
+    def totals(self, kind=None):
+        """{id: total count} over the whole world, optionally for one kind of entry."""
+        query = "SELECT name, SUM(count) FROM entries"
+        parameters = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            parameters = (kind,)
+        return dict(self.connection.execute(query + " GROUP BY name", parameters))
+
+
+def _qualify(name):
+    return name if ":" in name or name.startswith("*") else "minecraft:" + name
+
+
+def _match_clause(column, pattern):
+    return f"{column} GLOB ?" if any(char in pattern for char in "*?[") else f"{column} = ?"
@@ -0,0 +1,106 @@
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor
+from nbtlib.tag import Compound, List, Array
+from core.diff import ADDED, REMOVED, CHANGED
+from core.nbt_path import format_key
+from core.region import RegionFile, RegionChunk
+from ui.tree_model import type_name
+
+_COLORS = {ADDED: QColor("#2e4d2e"), REMOVED: QColor("#5a2d2d"), CHANGED: QColor("#5a4d24")}
+_MISSING = "—"
+
+def describe_value(tag):
+    """Short text for one side of a difference."""
+    if tag is None:
+        return _MISSING
+    if isinstance(tag, RegionChunk):
+        return f"Chunk ({tag.size // 1024} KiB)"
+    if isinstance(tag, (Compound, List, Array)):
+        return f"{type_name(tag)} ({len(tag)} items)"
+    return f"{type_name(tag)}: {tag}"
+
+class DiffView(QWidget):
+    """Side-by-side list of the differences between two documents, as a tree of their paths.
+
+    Only the paths leading to a difference are shown, fully expanded.
+    """
+
+    # Path in the left (open) document of an activated difference
+    path_activated = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("padding: 5px; color: #aaaaaa;")
+        layout.addWidget(self.summary_label)
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(3)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setColumnWidth(0, 220)
+        self.tree.setColumnWidth(1, 220)
+        self.tree.itemActivated.connect(self.on_item_activated)
+        layout.addWidget(self.tree)
+
+    def set_entries(self, entries, left_name, right_name, left_root, right_root, limit):
+        self.tree.clear()
+        self.tree.setHeaderLabels(["Path", left_name, right_name])
+        nodes = {}
+        for entry in entries:
+            root = left_root if entry.left_path is not None else right_root
+            parent = self._node_for(nodes, entry, root)
+            key = entry.path[-1] if entry.path else None
+            label = self._label(entry.path, key, root)
+            if entry.left_path is not None and entry.right_path is not None and entry.left_path != entry.right_path:
+                label += f" → {format_key(entry.right_path[-1])}"
+            item = QTreeWidgetItem([label, describe_value(entry.left), describe_value(entry.right)])
+            item.setData(0, Qt.ItemDataRole.UserRole, entry.left_path)
+            brush = QBrush(_COLORS[entry.kind])
+            for column in range(3):
+                item.setBackground(column, brush)
+            item.setToolTip(0, entry.kind)
+            if parent is None:
+                self.tree.addTopLevelItem(item)
+            else:
+                parent.addChild(item)
+        self.tree.expandAll()
+        more = " (showing the first ones only)" if len(entries) >= limit else ""
+        if not entries:
+            self.summary_label.setText("The documents are identical")
+        else:
+            counts = {kind: sum(entry.kind == kind for entry in entries) for kind in (CHANGED, ADDED, REMOVED)}
+            self.summary_label.setText(f"{len(entries)} differences{more}: {counts[CHANGED]} changed, "
+                                       f"{counts[ADDED]} added, {counts[REMOVED]} removed")
+
+    def _node_for(self, nodes, entry, root):
+        """Tree item for the parent of entry, creating the items along its path."""
+        path = entry.path
+        parent = None
+        for depth in range(len(path) - 1):
+            prefix = path[:depth + 1]
+            node = nodes.get(prefix)
+            if node is None:
+                node = QTreeWidgetItem([self._label(prefix, path[depth], root), "", ""])
+                node.setData(0, Qt.ItemDataRole.UserRole, prefix if entry.left_path is not None else None)
+                if parent is None:
+                    self.tree.addTopLevelItem(node)
+                else:
+                    parent.addChild(node)
+                nodes[prefix] = node
+            parent = node
+        return parent
+
+    def _label(self, path, key, root):
+        if len(path) == 1 and isinstance(root, RegionFile) and 0 <= key < len(root.chunks):
+            chunk = root.chunks[key]
+            return f"Chunk [{chunk.x}, {chunk.z}]"
+        return format_key(key) if key is not None else "(root)"
+
+    def on_item_activated(self, item):
+        path = item.data(0, Qt.ItemDataRole.UserRole)
+        if path is not None:
+            self.path_activated.emit(path)
@@ -1,106 +1,208 @@
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                            QTextEdit, QLabel, QScrollArea)
+import numpy as np
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QAbstractScrollArea,
+                            QLabel, QLineEdit)
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont, QSyntaxHighlighter, QTextCharFormat, QColor
+from PyQt6.QtGui import QFont, QFontDatabase, QFontInfo, QFontMetrics, QColor, QPainter
+from core import perf
+
+BYTES_PER_ROW = 16
+
+# Lookup tables turning a byte into its "xx " hex cell and its ASCII column char
+_HEX_CELLS = np.frombuffer("".join(f"{i:02x} " for i in range(256)).encode("ascii"), np.uint8).reshape(256, 3)
+_ASCII_CHARS = np.array([i if 32 <= i <= 126 else ord(".") for i in range(256)], np.uint8)
+
+
+def as_bytes(data):
+    """Return a flat uint8 view of an array tag's raw (big-endian) bytes without copying."""
+    if data is None:
+        return np.zeros(0, np.uint8)
+    if isinstance(data, np.ndarray):
+        return np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+    return np.frombuffer(data, np.uint8)
+
+
+def format_rows(buffer, first_row, row_count):
+    """Format rows of a byte buffer as (offset, hex, ascii) strings, vectorized."""
+    start = first_row * BYTES_PER_ROW
+    chunk = buffer[start:start + row_count * BYTES_PER_ROW]
+    rows = -(-len(chunk) // BYTES_PER_ROW)
+    if rows == 0:
+        return []
+    padded = np.zeros(rows * BYTES_PER_ROW, np.uint8)
+    padded[:len(chunk)] = chunk
+    hex_cells = _HEX_CELLS[padded]
+    ascii_chars = _ASCII_CHARS[padded]
+    tail = len(chunk) - (rows - 1) * BYTES_PER_ROW
+    if tail < BYTES_PER_ROW:
+        # Blank the padding of a short last row
+        hex_cells[len(chunk):] = ord(" ")
+        ascii_chars[len(chunk):] = ord(" ")
+    hex_text = hex_cells.reshape(rows, BYTES_PER_ROW * 3).tobytes().decode("ascii")
+    ascii_text = ascii_chars.reshape(rows, BYTES_PER_ROW).tobytes().decode("ascii")
+    hex_width = BYTES_PER_ROW * 3
+    return [(f"{start + i * BYTES_PER_ROW:08x}",
+             hex_text[i * hex_width:(i + 1) * hex_width - 1],
+             ascii_text[i * BYTES_PER_ROW:(i + 1) * BYTES_PER_ROW]) for i in range(rows)]
+
+
+class HexView(QAbstractScrollArea):
+    """Custom painted hex dump that only formats the rows currently visible."""
 
-class HexHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.byte_format = QTextCharFormat()
-        self.byte_format.setBackground(QColor("#3d3d3d"))
-        self.ascii_format = QTextCharFormat()
-        self.ascii_format.setBackground(QColor("#353535"))
-
-    def highlightBlock(self, text):
-        # Highlight hex values
-        for i in range(0, len(text), 3):
-            if i + 2 < len(text):
-                self.setFormat(i, 2, self.byte_format)
-        # Highlight ASCII representation
-        ascii_start = text.find("|") + 1
-        if ascii_start > 0:
-            self.setFormat(ascii_start, len(text) - ascii_start, self.ascii_format)
+        self.buffer = as_bytes(None)
+        self.marked = None
+        font = QFont("Consolas", 10)
+        if not QFontInfo(font).fixedPitch():
+            # Columns are laid out by character width, so a monospace font is required
+            font = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
+            font.setPointSize(10)
+        self.mono_font = font
+        metrics = QFontMetrics(font)
+        self.char_width = metrics.horizontalAdvance("0")
+        self.row_height = metrics.height()
+        self.ascent = metrics.ascent()
+        # Offset, hex and ASCII columns, plus the scrollbar
+        self.setMinimumWidth((10 + BYTES_PER_ROW * 4 + 2) * self.char_width
+                             + self.verticalScrollBar().sizeHint().width())
+        self.setStyleSheet("""
+            QAbstractScrollArea {
+                background-color: #2d2d2d;
+                border: 1px solid #3d3d3d;
+            }
+        """)
+
+    def set_buffer(self, buffer):
+        self.buffer = buffer
+        self.marked = None
+        self.verticalScrollBar().setValue(0)
+        self._update_scrollbar()
+        self.viewport().update()
+
+    def row_count(self):
+        return -(-len(self.buffer) // BYTES_PER_ROW)
+
+    def visible_rows(self):
+        return max(1, self.viewport().height() // self.row_height)
+
+    def _update_scrollbar(self):
+        bar = self.verticalScrollBar()
+        bar.setRange(0, max(0, self.row_count() - self.visible_rows()))
+        bar.setPageStep(self.visible_rows())
+        bar.setSingleStep(1)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbar()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def jump_to(self, offset):
+        """Scroll so the byte at offset is visible and mark it."""
+        if not 0 <= offset < len(self.buffer):
+            return False
+        self.marked = offset
+        row = offset // BYTES_PER_ROW
+        bar = self.verticalScrollBar()
+        if not bar.value() <= row < bar.value() + self.visible_rows():
+            bar.setValue(row - self.visible_rows() // 2)
+        self.viewport().update()
+        return True
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setFont(self.mono_font)
+        painter.fillRect(self.viewport().rect(), QColor("#2d2d2d"))
+        first_row = self.verticalScrollBar().value()
+        rows = format_rows(self.buffer, first_row, self.visible_rows() + 1)
+        if not rows:
+            return
+        cw, rh = self.char_width, self.row_height
+        hex_x = 10 * cw
+        ascii_x = hex_x + (BYTES_PER_ROW * 3 + 1) * cw
+        height = len(rows) * rh
+        painter.fillRect(hex_x - cw // 2, 0, (BYTES_PER_ROW * 3) * cw, height, QColor("#333333"))
+        painter.fillRect(ascii_x - cw // 2, 0, (BYTES_PER_ROW + 1) * cw, height, QColor("#353535"))
+        if self.marked is not None:
+            row, column = divmod(self.marked, BYTES_PER_ROW)
+            y = (row - first_row) * rh
+            painter.fillRect(hex_x + column * 3 * cw, y, 2 * cw, rh, QColor("#264f78"))
+            painter.fillRect(ascii_x + column * cw, y, cw, rh, QColor("#264f78"))
+        for i, (offset, hex_text, ascii_text) in enumerate(rows):
+            y = i * rh + self.ascent
+            painter.setPen(QColor("#888888"))
+            painter.drawText(0, y, offset)
+            painter.setPen(QColor("#ffffff"))
+            painter.drawText(hex_x, y, hex_text)
+            painter.setPen(QColor("#cccccc"))
+            painter.drawText(ascii_x, y, ascii_text)
+
 
 class HexViewer(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.data = None
         self.setup_ui()
-        
+
     def setup_ui(self):
         layout = QVBoxLayout(self)
-        
+
         # Header
+        header_layout = QHBoxLayout()
         header = QLabel("Hex Viewer")
         header.setStyleSheet("""
-            font-weight: bold; 
-            font-size: 14px; 
+            font-weight: bold;
+            font-size: 14px;
             padding: 5px;
             color: #ffffff;
         """)
-        layout.addWidget(header)
-        
-        # Create scroll area
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setStyleSheet("""
-            QScrollArea {
-                background-color: #2d2d2d;
-                border: 1px solid #3d3d3d;
-            }
-        """)
-        layout.addWidget(scroll)
-        
-        # Create container widget
-        container = QWidget()
-        scroll.setWidget(container)
-        container_layout = QVBoxLayout(container)
-        
+        header_layout.addWidget(header)
+
+        self.offset_input = QLineEdit()
+        self.offset_input.setPlaceholderText("Go to offset (hex 0x.. or decimal)")
+        self.offset_input.returnPressed.connect(self.go_to_offset)
+        header_layout.addWidget(self.offset_input)
+        layout.addLayout(header_layout)
+
         # Create hex display
-        self.hex_display = QTextEdit()
-        self.hex_display.setReadOnly(True)
-        self.hex_display.setFont(QFont("Consolas", 10))
-        self.hex_display.setStyleSheet("""
-            QTextEdit {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                padding: 5px;
-            }
-        """)
-        
-        # Add syntax highlighter
-        self.highlighter = HexHighlighter(self.hex_display.document())
-        
-        container_layout.addWidget(self.hex_display)
-        
+        self.hex_display = HexView()
+        layout.addWidget(self.hex_display)
+
         # Add status bar
         self.status_label = QLabel()
         self.status_label.setStyleSheet("""
-            padding: 5px; 
+            padding: 5px;
             color: #aaaaaa;
             background-color: #2d2d2d;
         """)
         layout.addWidget(self.status_label)
-        
+
     def display_data(self, data):
-        if not data:
-            self.hex_display.clear()
+        """Show the raw bytes of an array tag (or any buffer); None clears the view."""
+        with perf.span("display_data"):
+            self._display_data(data)
+
+    def _display_data(self, data):
+        self.data = data
+        buffer = as_bytes(data)
+        self.hex_display.set_buffer(buffer)
+        if not len(buffer):
             self.status_label.setText("No binary data to display")
             return
-            
-        hex_lines = []
-        total_bytes = len(data)
-        
-        for i in range(0, len(data), 16):
-            chunk = data[i:i+16]
-            # Format hex values
-            hex_values = ' '.join(f'{b:02x}' for b in chunk)
-            # Format ASCII representation
-            ascii_values = ''.join(chr(b) if 32 <= b <= 126 else '.' for b in chunk)
-            # Add padding for alignment
-            hex_values = hex_values.ljust(47)
-            # Combine into a line
-            hex_lines.append(f'{i:08x}: {hex_values} | {ascii_values}')
-            
-        self.hex_display.setText('\n'.join(hex_lines))
-        self.status_label.setText(f"Total bytes: {total_bytes}") 
\ No newline at end of file
+
+        item_size = getattr(data, "itemsize", 1)
+        if item_size > 1:
+            self.status_label.setText(f"Total bytes: {len(buffer)} ({len(data)} x {item_size}-byte values)")
+        else:
+            self.status_label.setText(f"Total bytes: {len(buffer)}")
+
+    def go_to_offset(self):
+        text = self.offset_input.text().strip().lower()
+        try:
+            offset = int(text, 16) if text.startswith("0x") else int(text)
+        except ValueError:
+            self.status_label.setText(f"Invalid offset: {text}")
+            return
+        if not self.hex_display.jump_to(offset):
+            self.status_label.setText(f"Offset {offset} is outside the data ({len(self.hex_display.buffer)} bytes)")
@@ -1,15 +1,128 @@
+import gc
+import os
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QTreeView, QMenuBar, QMenu, QFileDialog, QMessageBox,
-    QDockWidget, QToolBar, QStatusBar, QLineEdit, QPushButton, QSplitter
+    QDockWidget, QToolBar, QStatusBar, QLineEdit, QPushButton, QSplitter,
+    QProgressDialog, QApplication, QLabel
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QAction, QIcon
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QAction, QActionGroup, QIcon
 from ui.tree_view import NBTTreeView
-from ui.hex_viewer import HexViewer
-from ui.search_dialog import SearchDialog
-from core.nbt_handler import NBTHandler
-from nbtlib.tag import ByteArray, IntArray, LongArray
+from ui.tree_model import type_name
+from ui.tree_filter import TreeFilter
+from ui.workers import LoadWorker, SaveWorker, DiffWorker, close_region, start_worker
+from ui.nbt_handler import NBTHandler
+from core import perf
+from core.region import RegionChunk, is_region_file
+from core.block_states import is_section, chunk_sections
+from nbtlib.tag import ByteArray, IntArray, LongArray, List
+
+SEARCH_RESULT_LIMIT = 10000
+DIFF_LIMIT = 10000
+
+STYLESHEET = """
+QMainWindow { background-color: #1e1e1e; }
+QWidget { background-color: #1e1e1e; color: #ffffff; }
+QTreeView {
+    background-color: #2d2d2d;
+    border: 1px solid #3d3d3d;
+    border-radius: 4px;
+    color: #ffffff;
+}
+QTreeView::item {
+    padding: 4px;
+    border-bottom: 1px solid #3d3d3d;
+}
+QTreeView::item:selected { background-color: #3d3d3d; }
+QTreeView::item:hover { background-color: #353535; }
+QTreeView::branch { background-color: #2d2d2d; }
+QLineEdit {
+    padding: 5px;
+    background-color: #2d2d2d;
+    border: 1px solid #3d3d3d;
+    border-radius: 4px;
+    color: #ffffff;
+}
+QPushButton {
+    padding: 5px 10px;
+    background-color: #2d2d2d;
+    border: 1px solid #3d3d3d;
+    border-radius: 4px;
+    color: #ffffff;
+}
+QPushButton:hover { background-color: #3d3d3d; }
+QPushButton:pressed { background-color: #4d4d4d; }
+QMenuBar {
+    background-color: #2d2d2d;
+    color: #ffffff;
+}
+QMenuBar::item {
+    background-color: #2d2d2d;
+    color: #ffffff;
+}
+QMenuBar::item:selected { background-color: #3d3d3d; }
+QMenu {
+    background-color: #2d2d2d;
+    color: #ffffff;
+    border: 1px solid #3d3d3d;
+}
+QMenu::item {
+    padding: 5px 20px;
+}
+QMenu::item:selected { background-color: #3d3d3d; }
+QToolBar {
+    background-color: #2d2d2d;
+    border: none;
+}
+QToolBar::separator {
+    background-color: #3d3d3d;
+    width: 1px;
+    margin: 0 5px;
+}
+QStatusBar {
+    background-color: #2d2d2d;
+    color: #ffffff;
+}
+QDockWidget {
+    color: #ffffff;
+}
+QDockWidget::title {
+    background-color: #2d2d2d;
+    padding: 5px;
+}
+QScrollBar:vertical {
+    background-color: #2d2d2d;
+    width: 12px;
+    margin: 0;
+}
+QScrollBar::handle:vertical {
+    background-color: #3d3d3d;
+    min-height: 20px;
+    border-radius: 6px;
+}
+QScrollBar::handle:vertical:hover { background-color: #4d4d4d; }
+QScrollBar:horizontal {
+    background-color: #2d2d2d;
+    height: 12px;
+    margin: 0;
+}
+QScrollBar::handle:horizontal {
+    background-color: #3d3d3d;
+    min-width: 20px;
+    border-radius: 6px;
+}
+QScrollBar::handle:horizontal:hover { background-color: #4d4d4d; }
+QHeaderView::section {
+    background-color: #2d2d2d;
+    color: #ffffff;
+    padding: 5px;
+    border: 1px solid #3d3d3d;
+}
+"""
+
+# The hex viewer, search dialog, search results, performance and diff views
+# are imported when first used so they stay off the startup path
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -18,6 +131,30 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(1000, 700)
         
         self.nbt_handler = NBTHandler()
+        self.load_worker = None
+        self.load_thread = None
+        self.load_progress = None
+        self.save_thread = None
+        self.search_results = None
+        self.search_dock = None
+        self.section_view = None
+        self.section_dock = None
+        self.diff_view = None
+        self.diff_dock = None
+        self.diff_worker = None
+        self.diff_progress = None
+        self.hex_viewer = None
+        self.hex_dock = None
+        self.save_operation = None
+        self.save_data = None
+        self.performance_view = None
+        self.performance_dock = None
+        
+        app = QApplication.instance()
+        if app.styleSheet() != STYLESHEET:
+            # Set once on the application rather than per widget, so Qt parses
+            # it a single time and no child needs its own sheet
+            app.setStyleSheet(STYLESHEET)
         
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -32,7 +169,7 @@ class MainWindow(QMainWindow):
         
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Search tags...")
+        self.search_input.setPlaceholderText("Filter tags...")
         self.search_input.textChanged.connect(self.filter_tree)
         search_layout.addWidget(self.search_input)
         
@@ -42,18 +179,12 @@ class MainWindow(QMainWindow):
         
         tree_layout.addLayout(search_layout)
         
-        self.tree_view = NBTTreeView()
+        self.tree_view = NBTTreeView(self.nbt_handler)
         tree_layout.addWidget(self.tree_view)
+        self.tree_filter = TreeFilter(self.tree_view, self.nbt_handler, self)
         
         splitter.addWidget(tree_container)
         
-        self.hex_viewer = HexViewer()
-        hex_dock = QDockWidget("Hex Viewer", self)
-        hex_dock.setWidget(self.hex_viewer)
-        hex_dock.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable | 
-                           QDockWidget.DockWidgetFeature.DockWidgetFloatable)
-        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, hex_dock)
-        
         splitter.setSizes([700, 300])
         
         self.create_menu_bar()
@@ -61,111 +192,47 @@ class MainWindow(QMainWindow):
         
         self.statusBar = QStatusBar()
         self.setStatusBar(self.statusBar)
+        # Breakdown of the last timed operation, while instrumentation is on
+        self.perf_label = QLabel()
+        self.perf_label.setStyleSheet("color: #aaaaaa;")
+        self.perf_label.hide()
+        self.statusBar.addPermanentWidget(self.perf_label)
         
         self.setAcceptDrops(True)
+        self.tree_filter.status_changed.connect(self.on_filter_status)
         
         self.tree_view.clicked.connect(self.on_tree_item_clicked)
         self.tree_view.expanded.connect(self.on_tree_item_expanded)
         self.tree_view.collapsed.connect(self.on_tree_item_collapsed)
-        
-        self.setStyleSheet("""
-            QMainWindow { background-color: #1e1e1e; }
-            QWidget { background-color: #1e1e1e; color: #ffffff; }
-            QTreeView {
-                background-color: #2d2d2d;
-                border: 1px solid #3d3d3d;
-                border-radius: 4px;
-                color: #ffffff;
-            }
-            QTreeView::item {
-                padding: 4px;
-                border-bottom: 1px solid #3d3d3d;
-            }
-            QTreeView::item:selected { background-color: #3d3d3d; }
-            QTreeView::item:hover { background-color: #353535; }
-            QLineEdit {
-                padding: 5px;
-                background-color: #2d2d2d;
-                border: 1px solid #3d3d3d;
-                border-radius: 4px;
-                color: #ffffff;
-            }
-            QPushButton {
-                padding: 5px 10px;
-                background-color: #2d2d2d;
-                border: 1px solid #3d3d3d;
-                border-radius: 4px;
-                color: #ffffff;
-            }
-            QPushButton:hover { background-color: #3d3d3d; }
-            QPushButton:pressed { background-color: #4d4d4d; }
-            QMenuBar {
-                background-color: #2d2d2d;
-                color: #ffffff;
-            }
-            QMenuBar::item {
-                background-color: #2d2d2d;
-                color: #ffffff;
-            }
-            QMenuBar::item:selected { background-color: #3d3d3d; }
-            QMenu {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-            }
-            QMenu::item {
-                padding: 5px 20px;
-            }
-            QMenu::item:selected { background-color: #3d3d3d; }
-            QToolBar {
-                background-color: #2d2d2d;
-                border: none;
-            }
-            QToolBar::separator {
-                background-color: #3d3d3d;
-                width: 1px;
-                margin: 0 5px;
-            }
-            QStatusBar {
-                background-color: #2d2d2d;
-                color: #ffffff;
-            }
-            QDockWidget {
-                color: #ffffff;
-            }
-            QDockWidget::title {
-                background-color: #2d2d2d;
-                padding: 5px;
-            }
-            QScrollBar:vertical {
-                background-color: #2d2d2d;
-                width: 12px;
-                margin: 0;
-            }
-            QScrollBar::handle:vertical {
-                background-color: #3d3d3d;
-                min-height: 20px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:vertical:hover { background-color: #4d4d4d; }
-            QScrollBar:horizontal {
-                background-color: #2d2d2d;
-                height: 12px;
-                margin: 0;
-            }
-            QScrollBar::handle:horizontal {
-                background-color: #3d3d3d;
-                min-width: 20px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:horizontal:hover { background-color: #4d4d4d; }
-            QHeaderView::section {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                padding: 5px;
-                border: 1px solid #3d3d3d;
-            }
-        """)
+
+    def ensure_hex_viewer(self):
+        """Create the hex viewer dock on first use and return it."""
+        if self.hex_dock is None:
+            from ui.hex_viewer import HexViewer
+            self.hex_viewer = HexViewer()
+            self.hex_dock = QDockWidget("Hex Viewer", self)
+            self.hex_dock.setObjectName("Hex Viewer")
+            self.hex_dock.setWidget(self.hex_viewer)
+            self.hex_dock.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable | 
+                                      QDockWidget.DockWidgetFeature.DockWidgetFloatable)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.hex_dock)
+            self.hex_dock.visibilityChanged.connect(self.toggle_hex_action.setChecked)
+            self.hex_dock.show()
+        return self.hex_dock
+
+    def ensure_section_viewer(self):
+        """Create the section viewer dock on first use and return it."""
+        if self.section_dock is None:
+            from ui.section_view import SectionView
+            self.section_view = SectionView()
+            self.section_dock = QDockWidget("Section Viewer", self)
+            self.section_dock.setObjectName("Section Viewer")
+            self.section_dock.setWidget(self.section_view)
+            self.section_dock.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable | 
+                                          QDockWidget.DockWidgetFeature.DockWidgetFloatable)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.section_dock)
+            self.section_dock.show()
+        return self.section_dock
 
     def create_menu_bar(self):
         menubar = self.menuBar()
@@ -180,6 +247,31 @@ class MainWindow(QMainWindow):
         save_as_action = file_menu.addAction("Save As")
         save_as_action.triggered.connect(self.save_file_as)
         
+        compare_action = file_menu.addAction("Compare With File...")
+        compare_action.triggered.connect(self.compare_with_file)
+        
+        compare_saved_action = file_menu.addAction("Compare With Saved")
+        compare_saved_action.triggered.connect(self.compare_with_saved)
+        
+        compression_menu = file_menu.addMenu("Compression")
+        compression_group = QActionGroup(self)
+        for label, compression in (("Keep Original", None), ("Gzip", "gzip"),
+                                   ("Zlib", "zlib"), ("None", "none")):
+            action = compression_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(compression is None)
+            action.triggered.connect(lambda checked, c=compression: self.set_compression(c))
+            compression_group.addAction(action)
+        
+        level_menu = file_menu.addMenu("Compression Level")
+        level_group = QActionGroup(self)
+        for label, level in (("Fastest (1)", 1), ("Balanced (6)", 6), ("Smallest (9)", 9)):
+            action = level_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(level == self.nbt_handler.compression_level)
+            action.triggered.connect(lambda checked, l=level: self.set_compression_level(l))
+            level_group.addAction(action)
+        
         file_menu.addSeparator()
         
         self.recent_menu = file_menu.addMenu("Recent Files")
@@ -190,12 +282,27 @@ class MainWindow(QMainWindow):
         exit_action.triggered.connect(self.close)
         
         edit_menu = menubar.addMenu("Edit")
+        self.undo_action = edit_menu.addAction("Undo")
+        self.undo_action.setShortcut("Ctrl+Z")
+        self.undo_action.triggered.connect(self.undo)
+        
+        self.redo_action = edit_menu.addAction("Redo")
+        self.redo_action.setShortcut("Ctrl+Y")
+        self.redo_action.triggered.connect(self.redo)
+        
+        edit_menu.addSeparator()
         search_action = edit_menu.addAction("Search")
         search_action.triggered.connect(self.show_search_dialog)
         
         view_menu = menubar.addMenu("View")
         toggle_hex_action = view_menu.addAction("Toggle Hex Viewer")
         toggle_hex_action.triggered.connect(self.toggle_hex_viewer)
+        toggle_section_action = view_menu.addAction("Toggle Section Viewer")
+        toggle_section_action.triggered.connect(self.toggle_section_viewer)
+        
+        performance_action = view_menu.addAction("Performance")
+        performance_action.setCheckable(True)
+        performance_action.toggled.connect(self.set_performance_enabled)
 
     def create_toolbar(self):
         toolbar = QToolBar()
@@ -221,40 +328,76 @@ class MainWindow(QMainWindow):
         
         toolbar.addSeparator()
         
-        toggle_hex_action = QAction("Toggle Hex Viewer", self)
-        toggle_hex_action.setCheckable(True)
-        toggle_hex_action.setChecked(True)
-        toggle_hex_action.triggered.connect(self.toggle_hex_viewer)
-        toolbar.addAction(toggle_hex_action)
+        # Checked while the hex viewer dock is shown; the dock is created on first use
+        self.toggle_hex_action = QAction("Toggle Hex Viewer", self)
+        self.toggle_hex_action.setCheckable(True)
+        self.toggle_hex_action.triggered.connect(self.toggle_hex_viewer)
+        toolbar.addAction(self.toggle_hex_action)
 
     def filter_tree(self, text):
-        pass
+        self.tree_filter.set_text(text)
+
+    def on_filter_status(self, message):
+        if message:
+            self.statusBar.showMessage(message)
+        else:
+            self.statusBar.clearMessage()
+
+    def undo(self):
+        if self.diff_worker is None and self.nbt_handler.history.can_undo():
+            self.nbt_handler.undo()
+            self.statusBar.showMessage("Undone", 2000)
+
+    def redo(self):
+        if self.diff_worker is None and self.nbt_handler.history.can_redo():
+            self.nbt_handler.redo()
+            self.statusBar.showMessage("Redone", 2000)
 
     def refresh_view(self):
         if self.nbt_handler.current_file:
             self.open_file(self.nbt_handler.current_file)
 
     def on_tree_item_expanded(self, index):
-        item = index.internalPointer()
+        item = self.tree_view.item_for_index(index)
         if item:
-            self.statusBar.showMessage(f"Expanded: {item.name}")
+            self.statusBar.showMessage(f"Expanded: {item.label()}")
 
     def on_tree_item_collapsed(self, index):
-        item = index.internalPointer()
+        item = self.tree_view.item_for_index(index)
         if item:
-            self.statusBar.showMessage(f"Collapsed: {item.name}")
+            self.statusBar.showMessage(f"Collapsed: {item.label()}")
 
     def on_tree_item_clicked(self, index):
-        item = index.internalPointer()
+        item = self.tree_view.item_for_index(index)
         if not item:
             return
             
         if isinstance(item.data, (ByteArray, IntArray, LongArray)):
-            self.hex_viewer.display_data(bytes(item.data))
-        else:
+            self.ensure_hex_viewer()
+            self.hex_viewer.display_data(item.data)
+        elif self.hex_viewer is not None:
             self.hex_viewer.display_data(None)
+        self.show_sections(item)
             
-        self.statusBar.showMessage(f"Type: {type(item.data).__name__}")
+        self.statusBar.showMessage(f"Type: {type_name(item.data)}")
+
+    def show_sections(self, item):
+        """Show a clicked section or sections list in the section viewer, and chunks while it is open."""
+        data = item.data
+        title = f"{item.label()}:"
+        if isinstance(data, RegionChunk):
+            if self.section_dock is None or not self.section_dock.isVisible():
+                return
+            sections = chunk_sections(data.load())
+        elif is_section(data):
+            sections, title = [data], ""
+        elif isinstance(data, List) and len(data) and is_section(data[0]):
+            sections = data
+        else:
+            return
+        if sections is not None:
+            self.ensure_section_viewer()
+            self.section_view.display_sections(sections, title)
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -275,13 +418,91 @@ class MainWindow(QMainWindow):
             )
         
         if file_name:
-            try:
-                self.nbt_handler.load_file(file_name)
-                self.tree_view.setModel(self.nbt_handler.get_tree_model())
-                self.tree_view.expandToDepth(0)
-                self.add_recent_file(file_name)
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to open file: {str(e)}")
+            if self.save_thread is not None:
+                # The save would finish against the new document
+                self.statusBar.showMessage("Wait for the save to finish before opening a file", 3000)
+                return
+            if self.diff_worker is not None:
+                self.statusBar.showMessage("Wait for the comparison to finish before opening a file", 3000)
+                return
+            self.cancel_load()
+            worker = LoadWorker(file_name, perf.begin("load_file", os.path.basename(file_name)))
+            progress = QProgressDialog(f"Loading {os.path.basename(file_name)}...", "Cancel", 0, 100, self)
+            progress.setWindowModality(Qt.WindowModality.WindowModal)
+            progress.setMinimumDuration(300)
+            progress.canceled.connect(worker.cancel)
+            worker.progress.connect(self.on_load_progress)
+            worker.finished.connect(self.on_file_loaded)
+            worker.failed.connect(self.on_load_failed)
+            worker.cancelled.connect(self.on_load_cancelled)
+            self.load_worker = worker
+            self.load_progress = progress
+            self.load_thread = start_worker(worker)
+            self.statusBar.showMessage(f"Loading {file_name}...")
+
+    def cancel_load(self, wait=False):
+        if self.load_worker is not None:
+            self.load_worker.cancel()
+            if wait:
+                self.load_thread.quit()
+                self.load_thread.wait()
+            self._finish_load()
+
+    def _finish_load(self):
+        self.load_worker = None
+        self.load_thread = None
+        if self.load_progress is not None:
+            self.load_progress.close()
+            self.load_progress = None
+
+    def on_load_progress(self, done, total):
+        if self.sender() is self.load_worker and self.load_progress is not None:
+            self.load_progress.setValue(done * 100 // total if total else 100)
+
+    def on_file_loaded(self, file_name, nbt_data, search_index):
+        if self.sender() is not self.load_worker:
+            return
+        operation = self.load_worker.operation
+        self._finish_load()
+        with perf.attach(operation):
+            gc.unfreeze()
+            self.nbt_handler.set_document(file_name, nbt_data, search_index)
+            # A parsed document is millions of long-lived objects; freezing them keeps
+            # every full garbage collection from rescanning it (a visible GUI stall)
+            with perf.span("gc"):
+                gc.collect()
+                gc.freeze()
+            self.tree_view.setModel(self.nbt_handler.get_tree_model())
+            if not is_region_file(file_name):
+                # Region chunks stay collapsed so they are decoded on demand
+                with perf.span("expand"):
+                    self.tree_view.expandToDepth(0)
+        # Finished after the next event loop pass, so the first paint is included
+        QTimer.singleShot(0, lambda: perf.finish(operation))
+        if self.tree_filter.is_active():
+            self.tree_filter.restart()
+        self.add_recent_file(file_name)
+        self.statusBar.showMessage(f"Loaded {file_name}", 3000)
+
+    def on_load_failed(self, file_name, message):
+        if self.sender() is not self.load_worker:
+            return
+        self._finish_load()
+        self.statusBar.clearMessage()
+        QMessageBox.critical(self, "Error", f"Failed to open file: {message}")
+
+    def on_load_cancelled(self, file_name):
+        if self.sender() is self.load_worker:
+            self._finish_load()
+        self.statusBar.showMessage("Loading cancelled", 3000)
+
+    def closeEvent(self, event):
+        self.cancel_load(wait=True)
+        self.tree_filter.clear()
+        if self.save_thread is not None:
+            # Let an in-flight save finish so the file is never left half-replaced
+            self.save_thread.wait()
+        super().closeEvent(event)
 
     def add_recent_file(self, file_name):
         action = QAction(file_name, self)
@@ -296,11 +517,7 @@ class MainWindow(QMainWindow):
             self.save_file_as()
             return
             
-        try:
-            self.nbt_handler.save_file()
-            self.statusBar.showMessage("File saved successfully", 3000)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save file: {str(e)}")
+        self.start_save()
 
     def save_file_as(self):
         file_name, _ = QFileDialog.getSaveFileName(
@@ -311,13 +528,60 @@ class MainWindow(QMainWindow):
         )
         
         if file_name:
-            try:
-                self.nbt_handler.save_file_as(file_name)
-                self.statusBar.showMessage("File saved successfully", 3000)
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to save file: {str(e)}")
+            self.start_save(file_name)
+
+    def start_save(self, file_name=None):
+        if self.save_thread is not None:
+            self.statusBar.showMessage("A save is already in progress", 3000)
+            return
+        if self.load_worker is not None:
+            self.statusBar.showMessage("Wait for the file to finish loading before saving", 3000)
+            return
+        if self.diff_worker is not None:
+            # Committing a region save remaps the file the comparison reads
+            self.statusBar.showMessage("Wait for the comparison to finish before saving", 3000)
+            return
+        operation = perf.begin("save_file", os.path.basename(file_name or self.nbt_handler.current_file or ""))
+        try:
+            with perf.attach(operation), perf.span("snapshot"):
+                job = self.nbt_handler.prepare_save(file_name)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save file: {str(e)}")
+            return
+        self.save_operation = operation
+        self.save_data = self.nbt_handler.nbt_data
+        worker = SaveWorker(job, operation)
+        worker.finished.connect(self.on_file_saved)
+        worker.failed.connect(self.on_save_failed)
+        self.save_thread = start_worker(worker)
+        self.statusBar.showMessage(f"Saving {job.file_path}...")
+
+    def on_file_saved(self, job):
+        self.save_thread = None
+        # A job only updates the document it was taken from
+        if self.nbt_handler.nbt_data is self.save_data:
+            self.nbt_handler.commit_save(job)
+        self.save_data = None
+        perf.finish(self.save_operation)
+        self.save_operation = None
+        self.statusBar.showMessage("File saved successfully", 3000)
+
+    def on_save_failed(self, job, message):
+        self.save_thread = None
+        self.save_operation = None
+        self.save_data = None
+        job.abort()
+        self.statusBar.clearMessage()
+        QMessageBox.critical(self, "Error", f"Failed to save file: {message}")
+
+    def set_compression(self, compression):
+        self.nbt_handler.compression = compression
+
+    def set_compression_level(self, level):
+        self.nbt_handler.compression_level = level
 
     def show_search_dialog(self):
+        from ui.search_dialog import SearchDialog
         dialog = SearchDialog(self)
         if dialog.exec():
             search_text = dialog.search_text.text()
@@ -325,9 +589,154 @@ class MainWindow(QMainWindow):
             self.search_nbt(search_text, search_type)
 
     def search_nbt(self, text, search_type):
-        pass
+        if not text or self.nbt_handler.nbt_data is None:
+            return
+        if search_type == "Path Query":
+            try:
+                paths = self.nbt_handler.query(text, SEARCH_RESULT_LIMIT)
+            except ValueError as e:
+                QMessageBox.warning(self, "Invalid Query", str(e))
+                return
+        else:
+            names = search_type in ("Tag Names", "Both")
+            values = search_type in ("Tag Values", "Both")
+            paths = self.nbt_handler.search(text, names, values, SEARCH_RESULT_LIMIT)
+        
+        if self.search_results is None:
+            from ui.search_results import SearchResults
+            self.search_results = SearchResults()
+            self.search_results.path_activated.connect(self.reveal_path)
+            self.search_dock = QDockWidget("Search Results", self)
+            self.search_dock.setObjectName("Search Results")
+            self.search_dock.setWidget(self.search_results)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.search_dock)
+        search_index = self.nbt_handler.search_index
+        self.search_results.set_results(text, paths, self.nbt_handler.describe_path, SEARCH_RESULT_LIMIT,
+                                        len(search_index.pending_chunks) if search_index else 0)
+        self.search_dock.show()
+        self.statusBar.showMessage(f"{len(paths)} matches", 3000)
+
+    def compare_with_file(self, file_name=None):
+        if self.nbt_handler.nbt_data is None:
+            self.statusBar.showMessage("Open a file to compare first", 3000)
+            return
+        if self.load_worker is not None or self.save_thread is not None:
+            # Either would replace or remap the document the comparison reads
+            self.statusBar.showMessage("Wait for the file to finish loading or saving before comparing", 3000)
+            return
+        if not file_name:
+            file_name, _ = QFileDialog.getOpenFileName(
+                self,
+                "Compare With",
+                os.path.dirname(self.nbt_handler.current_file or ""),
+                "NBT Files (*.nbt *.dat *.mca *.mcr *.schematic);;All Files (*.*)"
+            )
+        if not file_name or self.diff_worker is not None:
+            return
+        worker = DiffWorker(self.nbt_handler, file_name, DIFF_LIMIT)
+        # The worker reads the document and fills its hash cache: nothing may
+        # edit it, from the first moment until _finish_diff()
+        self.set_editing_enabled(False)
+        progress = QProgressDialog(f"Comparing with {os.path.basename(file_name)}...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(worker.cancel)
+        worker.finished.connect(self.on_diff_finished)
+        worker.failed.connect(self.on_diff_failed)
+        worker.cancelled.connect(self.on_diff_cancelled)
+        self.diff_worker = worker
+        self.diff_progress = progress
+        start_worker(worker)
+
+    def compare_with_saved(self):
+        """Show the unsaved changes: the open document against its file on disk."""
+        if self.nbt_handler.current_file:
+            self.compare_with_file(self.nbt_handler.current_file)
+
+    def _finish_diff(self):
+        self.diff_worker = None
+        if self.diff_progress is not None:
+            self.diff_progress.reset()
+            self.diff_progress = None
+        self.set_editing_enabled(True)
+
+    def set_editing_enabled(self, enabled):
+        """Allow or block every way of changing the open document, including undo and redo."""
+        self.tree_view.setEnabled(enabled)
+        self.undo_action.setEnabled(enabled)
+        self.redo_action.setEnabled(enabled)
+
+    def on_diff_finished(self, file_name, other, entries):
+        self._finish_diff()
+        if self.diff_view is None:
+            from ui.diff_view import DiffView
+            self.diff_view = DiffView()
+            self.diff_view.path_activated.connect(self.reveal_path)
+            self.diff_dock = QDockWidget("Differences", self)
+            self.diff_dock.setObjectName("Differences")
+            self.diff_dock.setWidget(self.diff_view)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.diff_dock)
+        left_name = os.path.basename(self.nbt_handler.current_file or "Open document")
+        right_name = os.path.basename(file_name)
+        if file_name == self.nbt_handler.current_file:
+            left_name, right_name = f"{left_name} (open)", f"{right_name} (saved)"
+        self.diff_view.set_entries(entries, left_name, right_name, self.nbt_handler.nbt_data, other, DIFF_LIMIT)
+        # Everything shown has been described, so the region can be released
+        close_region(other)
+        self.diff_dock.show()
+        self.statusBar.showMessage(f"{len(entries)} differences", 3000)
+
+    def on_diff_failed(self, file_name, message):
+        self._finish_diff()
+        QMessageBox.critical(self, "Error", f"Failed to compare with {file_name}: {message}")
+
+    def on_diff_cancelled(self, file_name):
+        self._finish_diff()
+        self.statusBar.showMessage("Comparison cancelled", 3000)
+
+    def reveal_path(self, path):
+        """Expand the tree down to path and select it."""
+        if self.diff_worker is not None:
+            # Expanding could load region chunks the comparison is reading
+            return
+        item = self.nbt_handler.get_tree_model().index_for_path(path).internalPointer()
+        if item is None:
+            return
+        if not self.tree_view.reveal_item(item):
+            # Hidden by the filter; drop it so the tag can be shown
+            self.search_input.clear()
+            self.tree_view.reveal_item(item)
+
+    def set_performance_enabled(self, enabled):
+        """Turn the timing instrumentation, its status bar readout and the Performance dock on or off."""
+        perf.enable(enabled)
+        if enabled and self.performance_dock is None:
+            from ui.performance_view import PerformanceView
+            self.performance_view = PerformanceView()
+            self.performance_view.operation_finished.connect(self.on_operation_timed)
+            self.performance_dock = QDockWidget("Performance", self)
+            self.performance_dock.setObjectName("Performance")
+            self.performance_dock.setWidget(self.performance_view)
+            self.performance_dock.setFeatures(QDockWidget.DockWidgetFeature.DockWidgetMovable | 
+                                              QDockWidget.DockWidgetFeature.DockWidgetFloatable)
+            self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.performance_dock)
+        if self.performance_dock is not None:
+            self.performance_dock.setVisible(enabled)
+        self.perf_label.setVisible(enabled)
+
+    def on_operation_timed(self, operation):
+        self.perf_label.setText(operation.summary())
+
+    def toggle_section_viewer(self):
+        if self.section_dock is None:
+            # Created visible
+            self.ensure_section_viewer()
+        else:
+            self.section_dock.setVisible(not self.section_dock.isVisible())
 
     def toggle_hex_viewer(self):
-        hex_dock = self.findChild(QDockWidget, "Hex Viewer")
-        if hex_dock:
-            hex_dock.setVisible(not hex_dock.isVisible()) 
\ No newline at end of file
+        if self.hex_dock is None:
+            # Created visible
+            self.ensure_hex_viewer()
+        else:
+            self.hex_dock.setVisible(not self.hex_dock.isVisible())
\ No newline at end of file
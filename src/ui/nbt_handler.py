@@ -0,0 +1,19 @@
+from core.document import NBTDocument
+from core.history import DEFAULT_HISTORY_LIMIT
+from ui.tree_model import NBTTreeModel
+
+class NBTHandler(NBTDocument):
+    """NBTDocument that also keeps the editor's Qt tree model in sync."""
+
+    def __init__(self, history_limit=DEFAULT_HISTORY_LIMIT):
+        super().__init__(history_limit)
+        self.tree_model = NBTTreeModel()
+        self.listeners.append(self.tree_model)
+
+    def set_document(self, file_path, nbt_data, search_index=None):
+        super().set_document(file_path, nbt_data, search_index)
+        self.tree_model.set_root(nbt_data)
+
+    def get_tree_model(self):
+        """Return the tree model."""
+        return self.tree_model
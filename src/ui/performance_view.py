@@ -0,0 +1,73 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                            QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog)
+from PyQt6.QtCore import Qt, pyqtSignal
+from core import perf
+
+class PerformanceView(QWidget):
+    """Breakdown of the last timed operation and rolling statistics of every step."""
+
+    # Emitted for each finished operation; perf listeners may run on worker threads
+    operation_finished = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.last_label = QLabel("No operation timed yet")
+        self.last_label.setWordWrap(True)
+        self.last_label.setStyleSheet("padding: 5px; color: #aaaaaa;")
+        layout.addWidget(self.last_label)
+
+        self.stats_table = QTableWidget(0, 5)
+        self.stats_table.setHorizontalHeaderLabels(["Step", "Runs", "Last", "Mean", "Max"])
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.stats_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.stats_table)
+
+        button_layout = QHBoxLayout()
+        self.profile_button = QPushButton("Profile Next Operation...")
+        self.profile_button.clicked.connect(self.profile_next)
+        button_layout.addWidget(self.profile_button)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+        button_layout.addWidget(clear_button)
+        layout.addLayout(button_layout)
+
+        self.operation_finished.connect(self.on_operation_finished)
+        perf.listeners.append(self.operation_finished.emit)
+
+    def on_operation_finished(self, operation):
+        text = operation.summary()
+        if operation.profile_path:
+            text += f"\nProfile written to {operation.profile_path}"
+            self.profile_button.setEnabled(True)
+        self.last_label.setText(text)
+        self.refresh()
+
+    def refresh(self):
+        stats = perf.statistics()
+        self.stats_table.setRowCount(len(stats))
+        for row, (name, values) in enumerate(sorted(stats.items())):
+            count, last, mean, worst = values
+            cells = [name, str(count)] + [perf.format_seconds(seconds) for seconds in (last, mean, worst)]
+            for column, text in enumerate(cells):
+                cell = QTableWidgetItem(text)
+                if column:
+                    cell.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.stats_table.setItem(row, column, cell)
+
+    def profile_next(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Profile Next Operation", "profile.prof",
+            "cProfile statistics (*.prof);;Chrome trace (*.json)")
+        if file_path:
+            perf.profile_next(file_path)
+            self.profile_button.setEnabled(False)
+            self.last_label.setText(f"The next operation will be profiled to {file_path}")
+
+    def clear(self):
+        perf.recent.clear()
+        self.last_label.setText("No operation timed yet")
+        self.refresh()
@@ -15,7 +15,7 @@ class SearchDialog(QDialog):
         type_layout = QHBoxLayout()
         type_layout.addWidget(QLabel("Search in:"))
         self.search_type = QComboBox()
-        self.search_type.addItems(["Tag Names", "Tag Values", "Both"])
+        self.search_type.addItems(["Tag Names", "Tag Values", "Both", "Path Query"])
         type_layout.addWidget(self.search_type)
         layout.addLayout(type_layout)
         
@@ -23,6 +23,13 @@ class SearchDialog(QDialog):
         text_layout = QHBoxLayout()
         text_layout.addWidget(QLabel("Search for:"))
         self.search_text = QLineEdit()
+        self.search_text.setToolTip(
+            "Path Query examples:\n"
+            "  Level.Entities[{id:\"minecraft:item\"}].Item.Count > 32\n"
+            "  Inventory[?Count >= 64].id\n"
+            "  ..CustomName\n"
+            "  ..[?CustomName]"
+        )
         text_layout.addWidget(self.search_text)
         layout.addLayout(text_layout)
         
@@ -0,0 +1,36 @@
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QListWidget, QListWidgetItem
+from PyQt6.QtCore import Qt, pyqtSignal
+
+class SearchResults(QWidget):
+    """List of search hits; activating one reveals it in the tree."""
+
+    path_activated = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("padding: 5px; color: #aaaaaa;")
+        layout.addWidget(self.summary_label)
+        
+        self.results_list = QListWidget()
+        self.results_list.setUniformItemSizes(True)
+        self.results_list.itemActivated.connect(self.on_item_activated)
+        self.results_list.itemClicked.connect(self.on_item_activated)
+        layout.addWidget(self.results_list)
+        
+    def set_results(self, text, paths, describe, limit, skipped_chunks=0):
+        self.results_list.clear()
+        for path in paths:
+            item = QListWidgetItem(describe(path))
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            self.results_list.addItem(item)
+        more = " (showing first results only)" if len(paths) >= limit else ""
+        if skipped_chunks:
+            more += f"; {skipped_chunks} chunks not decoded yet were skipped"
+        self.summary_label.setText(f"{len(paths)} matches for '{text}'{more}")
+        
+    def on_item_activated(self, item):
+        self.path_activated.emit(item.data(Qt.ItemDataRole.UserRole))
@@ -0,0 +1,147 @@
+import zlib
+import numpy as np
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider,
+                            QTableWidget, QTableWidgetItem, QHeaderView, QToolTip)
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QColor, QCursor
+from core import perf
+from core.block_states import SECTION_SIZE, UNKNOWN_STATE, decode_sections
+
+PIXELS_PER_BLOCK = 16
+_AIR = {"minecraft:air", "minecraft:cave_air", "minecraft:void_air"}
+_EMPTY_COLOR = QColor("#1e1e1e")
+
+
+def block_color(name):
+    """A stable color per block, ignoring its properties; air is drawn dark."""
+    base = name.split("[", 1)[0]
+    if base in _AIR:
+        return QColor("#262626")
+    if name == UNKNOWN_STATE:
+        return QColor("#ff00ff")
+    value = zlib.crc32(base.encode())
+    return QColor.fromHsv(value % 360, 90 + (value >> 9) % 120, 150 + (value >> 17) % 90)
+
+
+class LayerImage(QLabel):
+    """Top-down picture of one layer; hovering a block shows its name."""
+
+    hovered = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.setFixedSize(SECTION_SIZE * PIXELS_PER_BLOCK, SECTION_SIZE * PIXELS_PER_BLOCK)
+
+    def mouseMoveEvent(self, event):
+        position = event.position()
+        x, z = int(position.x()) // PIXELS_PER_BLOCK, int(position.y()) // PIXELS_PER_BLOCK
+        if 0 <= x < SECTION_SIZE and 0 <= z < SECTION_SIZE:
+            self.hovered.emit(x, z)
+
+
+class SectionView(QWidget):
+    """Block counts and a layer-by-layer picture of chunk sections.
+
+    Shows one section or every section of a chunk; the layer slider then
+    runs over the chunk's whole height.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sections = {}
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel("Select a chunk section")
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setStyleSheet("padding: 5px; color: #aaaaaa;")
+        layout.addWidget(self.summary_label)
+
+        layer_layout = QHBoxLayout()
+        self.layer_slider = QSlider(Qt.Orientation.Horizontal)
+        self.layer_slider.valueChanged.connect(self.show_layer)
+        layer_layout.addWidget(self.layer_slider)
+        self.layer_label = QLabel()
+        self.layer_label.setMinimumWidth(50)
+        layer_layout.addWidget(self.layer_label)
+        layout.addLayout(layer_layout)
+
+        self.image = LayerImage()
+        self.image.hovered.connect(self.on_block_hovered)
+        layout.addWidget(self.image, alignment=Qt.AlignmentFlag.AlignHCenter)
+
+        self.counts_table = QTableWidget(0, 2)
+        self.counts_table.setHorizontalHeaderLabels(["Block", "Count"])
+        self.counts_table.verticalHeader().setVisible(False)
+        self.counts_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.counts_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.counts_table)
+
+    def display_sections(self, sections, title=""):
+        """Decode and show a list of section compounds; an empty list clears the view."""
+        with perf.span("decode sections"):
+            decoded = decode_sections(sections)
+        self.sections = {blocks.y: blocks for blocks in decoded}
+        if not decoded:
+            self.summary_label.setText("No block states to display")
+            self.counts_table.setRowCount(0)
+            self.image.clear()
+            self.layer_label.clear()
+            return
+
+        totals = {}
+        for blocks in decoded:
+            for name, count in zip(blocks.names, blocks.counts().tolist()):
+                if count:
+                    totals[name] = totals.get(name, 0) + count
+        rows = sorted(totals.items(), key=lambda item: -item[1])
+        self.counts_table.setRowCount(len(rows))
+        for row, (name, count) in enumerate(rows):
+            name_item = QTableWidgetItem(name)
+            name_item.setData(Qt.ItemDataRole.DecorationRole, block_color(name))
+            self.counts_table.setItem(row, 0, name_item)
+            count_item = QTableWidgetItem(f"{count:,}")
+            count_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            self.counts_table.setItem(row, 1, count_item)
+
+        layout_names = {blocks.bits and f"{blocks.bits} bits{', spanning' if blocks.spanning else ''}"
+                        for blocks in decoded} - {0}
+        text = f"{title} " if title else ""
+        text += f"Section Y {decoded[0].y}" if len(decoded) == 1 else f"{len(decoded)} sections"
+        text += f", {len(rows)} block states"
+        if layout_names:
+            text += f" ({'; '.join(sorted(layout_names))})"
+        self.summary_label.setText(text)
+
+        bottom = min(self.sections) * SECTION_SIZE
+        top = max(self.sections) * SECTION_SIZE + SECTION_SIZE - 1
+        self.layer_slider.blockSignals(True)
+        self.layer_slider.setRange(bottom, top)
+        self.layer_slider.blockSignals(False)
+        self.show_layer(self.layer_slider.value())
+
+    def show_layer(self, y):
+        self.layer_label.setText(f"Y {y}")
+        blocks = self.sections.get(y // SECTION_SIZE)
+        if blocks is None:
+            image = QImage(SECTION_SIZE, SECTION_SIZE, QImage.Format.Format_RGB32)
+            image.fill(_EMPTY_COLOR)
+        else:
+            colors = np.array([block_color(name).rgb() for name in blocks.names], dtype=np.uint32)
+            # Rows are z, columns x: north is up
+            pixels = np.ascontiguousarray(colors[blocks.layer(y % SECTION_SIZE)])
+            image = QImage(pixels.data, SECTION_SIZE, SECTION_SIZE, SECTION_SIZE * 4,
+                           QImage.Format.Format_RGB32).copy()
+        # Scaled without smoothing so blocks stay sharp squares
+        self.image.setPixmap(QPixmap.fromImage(image).scaled(self.image.size()))
+
+    def on_block_hovered(self, x, z):
+        y = self.layer_slider.value()
+        blocks = self.sections.get(y // SECTION_SIZE)
+        if blocks is None:
+            return
+        name = blocks.names[blocks.layer(y % SECTION_SIZE)[z, x]]
+        QToolTip.showText(QCursor.pos(), f"{x}, {y}, {z}: {name}", self.image)
@@ -0,0 +1,222 @@
+import time
+from collections import deque
+from PyQt6.QtCore import QModelIndex, QObject, QSortFilterProxyModel, QTimer, pyqtSignal
+from ui.workers import FilterWorker, start_worker
+
+FILTER_DEBOUNCE_MS = 250
+FILTER_REFRESH_MS = 100
+FILTER_MATCH_LIMIT = 5000
+# Matches beyond this many expanded parents stay collapsed until opened
+FILTER_EXPAND_LIMIT = 100
+# GUI time spent per event creating tree items for incoming matches
+FILTER_SLICE_SECONDS = 0.03
+
+
+class NBTFilterProxyModel(QSortFilterProxyModel):
+    """Shows matched items, their ancestors and everything below a match.
+
+    Rows are accepted by looking up the source item in sets filled by
+    TreeFilter, so filtering never walks or materializes the source tree.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.matched = set()
+        self.ancestors = set()
+
+    def clear(self):
+        self.matched = set()
+        self.ancestors = set()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        parent_item = self.sourceModel().item_from_index(source_parent)
+        item = parent_item.child(source_row)
+        if item in self.ancestors or item in self.matched:
+            return True
+        while parent_item is not None:
+            if parent_item in self.matched:
+                return True
+            parent_item = parent_item.parent_item
+        return False
+
+    def hasChildren(self, parent=QModelIndex()):
+        # The default builds (filters) the whole row mapping of parent. Every
+        # shown row is either an ancestor of a match, which has shown children,
+        # or lies under a match, where all children are shown.
+        if not parent.isValid():
+            return super().hasChildren(parent)
+        item = self.mapToSource(parent).internalPointer()
+        return item in self.ancestors or item.has_children()
+
+
+class TreeFilter(QObject):
+    """Live filter of an NBTTreeView, matched on a worker thread.
+
+    Keystrokes are debounced, matching paths stream in from a FilterWorker
+    and only the items along those paths are created in the tree model, a
+    time slice at a time.
+    """
+
+    status_changed = pyqtSignal(str)
+
+    def __init__(self, tree_view, nbt_handler, parent=None):
+        super().__init__(parent)
+        self.tree_view = tree_view
+        self.nbt_handler = nbt_handler
+        self.proxy = NBTFilterProxyModel(self)
+        self.text = ""
+        self.worker = None
+        self.worker_done = False
+        self.truncated = False
+        self.queue = deque()
+        self.found = 0
+        self.expanded = 0
+        self.pending_expand = []
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(FILTER_DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.restart)
+        self.drain_timer = QTimer(self)
+        self.drain_timer.setSingleShot(True)
+        self.drain_timer.setInterval(0)
+        self.drain_timer.timeout.connect(self._drain)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(FILTER_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self._refresh_view)
+
+    def is_active(self):
+        return bool(self.text)
+
+    def set_text(self, text):
+        """Filter on text after the user stops typing; an empty text clears the filter."""
+        self.text = text.strip()
+        if self.text:
+            self.debounce.start()
+        else:
+            self.debounce.stop()
+            self.clear()
+
+    def clear(self):
+        self._stop()
+        self.proxy.clear()
+        if self in self.nbt_handler.listeners:
+            self.nbt_handler.listeners.remove(self)
+        if self.tree_view.model() is self.proxy:
+            current = self.tree_view.current_item()
+            self.tree_view.setModel(self.nbt_handler.get_tree_model())
+            if current is not None and current.parent_item is not None:
+                self.tree_view.reveal_item(current)
+        self.status_changed.emit("")
+
+    def restart(self):
+        """Run the current filter text again from scratch."""
+        self.debounce.stop()
+        self._stop()
+        if not self.text or self.nbt_handler.nbt_data is None:
+            return
+        source = self.nbt_handler.get_tree_model()
+        if self.proxy.sourceModel() is not source:
+            self.proxy.setSourceModel(source)
+        self.proxy.clear()
+        # Drop the row mappings; they are rebuilt lazily for expanded rows only
+        self.proxy.invalidate()
+        if self.tree_view.model() is not self.proxy:
+            self.tree_view.setModel(self.proxy)
+        if self not in self.nbt_handler.listeners:
+            self.nbt_handler.listeners.append(self)
+        self.found = 0
+        self.expanded = 0
+        self.worker_done = False
+        self.worker = FilterWorker(self.nbt_handler.nbt_data, self.text, FILTER_MATCH_LIMIT)
+        self.worker.matches.connect(self.on_matches)
+        self.worker.finished.connect(self.on_finished)
+        start_worker(self.worker)
+        self.status_changed.emit(f"Filtering for \"{self.text}\"...")
+
+    def _stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        self.queue.clear()
+        self.pending_expand = []
+        self.drain_timer.stop()
+        self.refresh_timer.stop()
+
+    def on_matches(self, paths):
+        if self.sender() is self.worker:
+            self.queue.extend(paths)
+            self.drain_timer.start()
+
+    def on_finished(self, truncated):
+        if self.sender() is self.worker:
+            self.worker_done = True
+            self.truncated = truncated
+            self.drain_timer.start()
+
+    def _drain(self):
+        """Create tree items for queued matches until the time slice is used up."""
+        model = self.nbt_handler.get_tree_model()
+        matched, ancestors = self.proxy.matched, self.proxy.ancestors
+        deadline = time.monotonic() + FILTER_SLICE_SECONDS
+        while self.queue and time.monotonic() < deadline:
+            item = model.index_for_path(self.queue.popleft()).internalPointer()
+            if item is None:
+                continue
+            matched.add(item)
+            self.found += 1
+            parent = item.parent_item
+            while parent is not None and parent not in ancestors:
+                ancestors.add(parent)
+                if self.expanded < FILTER_EXPAND_LIMIT:
+                    self.expanded += 1
+                    self.pending_expand.append(parent)
+                parent = parent.parent_item
+        if self.queue:
+            self.drain_timer.start()
+        elif self.worker_done:
+            self.worker = None
+            self._refresh_view()
+            if self.truncated:
+                self.status_changed.emit(f"Showing the first {self.found} matches")
+            else:
+                self.status_changed.emit(f"{self.found} matches")
+            return
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+
+    def _refresh_view(self):
+        """Apply the matches collected so far and expand down to them."""
+        self.refresh_timer.stop()
+        model = self.nbt_handler.get_tree_model()
+        # Drops the row mappings; only rows under expanded items are filtered again
+        self.proxy.invalidate()
+        for item in self.pending_expand:
+            if item.parent_item is not None:
+                index = self.proxy.mapFromSource(model.index_for_item(item))
+                if index.isValid():
+                    self.tree_view.expand(index)
+        self.pending_expand = []
+
+    # Document listener interface: any edit reruns the filter
+
+    def tag_changed(self, parent_path, key):
+        self.debounce.start()
+
+    def tag_inserted(self, parent_path, key, position):
+        self.debounce.start()
+
+    def tag_removed(self, parent_path, key, position):
+        self.debounce.start()
+
+    def tag_renamed(self, parent_path, old_name, new_name):
+        self.debounce.start()
+
+    def tags_changed(self, parent_path, keys):
+        self.debounce.start()
+
+    def tags_inserted(self, parent_path, keys, positions):
+        self.debounce.start()
+
+    def tags_removed(self, parent_path, keys, positions):
+        self.debounce.start()
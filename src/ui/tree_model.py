@@ -1,21 +1,189 @@
 from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt, QObject
-from nbtlib.tag import Base, Compound, List, String, Int, Byte, Short, Long, Float, Double, ByteArray, IntArray, LongArray
+from nbtlib.tag import Base, Compound, List, String, Int, Byte, Short, Long, Float, Double, Array, ByteArray, IntArray, LongArray
+from core import perf
+from core.lazy_nbt import LazyCompound
+from core.region import RegionFile, RegionChunk
+import time
+
+# Lists and arrays longer than this are shown as pages of PAGE_SIZE entries
+PAGE_SIZE = 1000
+
+def type_name(tag):
+    """Name of a tag's type as shown to the user."""
+    return "Compound" if isinstance(tag, LazyCompound) else type(tag).__name__
+
+class ListPage:
+    """Data of a virtual node grouping PAGE_SIZE entries of a large List or array."""
+    __slots__ = ("start",)
+
+    def __init__(self, start):
+        self.start = start
 
 class NBTTreeItem:
-    def __init__(self, data, name="", parent=None):
+    __slots__ = ("parent_item", "name", "data", "child_items", "children_loaded", "row_index", "renumber_from")
+
+    def __init__(self, data, name="", parent=None, row=0):
         self.parent_item = parent
         self.name = name
         self.data = data
         self.child_items = []
-        self._setup_children()
+        self.children_loaded = False
+        self.row_index = row
+        # Children before this row are known to have a correct row_index
+        self.renumber_from = None
+
+    def has_children(self):
+        if isinstance(self.data, (RegionChunk, ListPage)):
+            return True
+        return isinstance(self.data, (Compound, List, Array, RegionFile)) and len(self.data) > 0
+
+    def can_fetch_more(self):
+        return not self.children_loaded and self.has_children()
+
+    def create_children(self):
+        """Build items for the direct children of this tag without attaching them."""
+        data = self.data
+        if isinstance(data, RegionChunk):
+            try:
+                data = data.load()
+            except Exception as e:
+                data.error = str(e)
+                return []
+        if isinstance(data, Compound):
+            return [NBTTreeItem(value, key, self, i) for i, (key, value) in enumerate(data.items())]
+        if isinstance(data, ListPage):
+            container = self.parent_item.container()
+            stop = min(data.start + PAGE_SIZE, len(container))
+            # Slice lists directly; nbtlib's per-index __getitem__ is slow for whole pages
+            values = list.__getitem__(container, slice(data.start, stop)) if isinstance(container, List) \
+                else [container[i] for i in range(data.start, stop)]
+            return [NBTTreeItem(value, None, self, i) for i, value in enumerate(values)]
+        if isinstance(data, (List, Array)):
+            if len(data) > PAGE_SIZE:
+                return [NBTTreeItem(ListPage(start), None, self, row)
+                        for row, start in enumerate(range(0, len(data), PAGE_SIZE))]
+            return [NBTTreeItem(value, None, self, i) for i, value in enumerate(data)]
+        if isinstance(data, RegionFile):
+            return [NBTTreeItem(chunk, f"Chunk [{chunk.x}, {chunk.z}]", self, i) for i, chunk in enumerate(data)]
+        return []
+
+    def load_children(self):
+        """Create items for the direct children of this tag, once."""
+        if not self.children_loaded:
+            self.child_items = self.create_children()
+            self.children_loaded = True
+
+    def container(self):
+        """Return the Compound/List/array/RegionFile holding this item's children, if any.
+
+        A page returns the list it belongs to.
+        """
+        if isinstance(self.data, RegionChunk):
+            return self.data.load()
+        if isinstance(self.data, ListPage):
+            return self.parent_item.container()
+        if isinstance(self.data, (Compound, List, Array, RegionFile)):
+            return self.data
+        return None
+
+    def paged(self):
+        """Whether the children of this item are ListPage nodes."""
+        return bool(self.child_items) and isinstance(self.child_items[0].data, ListPage)
+
+    def page_stop(self):
+        return min(self.data.start + PAGE_SIZE, len(self.parent_item.container()))
+
+    def key(self):
+        """Key of this tag within its parent: a compound name or a list index.
 
-    def _setup_children(self):
-        if isinstance(self.data, Compound):
-            for key, value in self.data.items():
-                self.child_items.append(NBTTreeItem(value, key, self))
-        elif isinstance(self.data, List):
-            for i, value in enumerate(self.data):
-                self.child_items.append(NBTTreeItem(value, str(i), self))
+        Pages are not part of the document and have no key.
+        """
+        parent = self.parent_item
+        if parent is None or isinstance(self.data, ListPage):
+            return None
+        if isinstance(parent.data, ListPage):
+            return parent.data.start + self.row()
+        if isinstance(parent.data, (List, Array, RegionFile)):
+            return self.row()
+        return self.name
+
+    def label(self):
+        """Text of the Name column; list entries are labelled by their current index."""
+        if isinstance(self.data, ListPage):
+            return f"[{self.data.start}..{self.page_stop() - 1}]"
+        if self.parent_item is not None and isinstance(self.parent_item.data, (List, Array, ListPage)):
+            return str(self.key())
+        return self.name
+
+    def path(self):
+        """Keys leading from the document root to this tag."""
+        keys = []
+        item = self
+        while item.parent_item is not None:
+            if not isinstance(item.data, ListPage):
+                keys.append(item.key())
+            item = item.parent_item
+        return tuple(reversed(keys))
+
+    def child_for_key(self, key):
+        if isinstance(key, int):
+            if self.paged():
+                page = self.child(key // PAGE_SIZE)
+                if page is None or not page.children_loaded:
+                    return None
+                return page.child(key % PAGE_SIZE)
+            return self.child(key)
+        for child in self.child_items:
+            if child.name == key:
+                return child
+        return None
+
+    def insert_child(self, row, item):
+        """Insert an item at row; the rows of its successors are fixed up lazily."""
+        item.parent_item = self
+        item.row_index = row
+        self.child_items.insert(row, item)
+        self._rows_shifted(row)
+
+    def remove_child(self, row):
+        """Remove and return the item at row; the rows of its successors are fixed up lazily."""
+        item = self.child_items.pop(row)
+        self._rows_shifted(row)
+        item.parent_item = None
+        return item
+
+    def insert_children(self, row, items):
+        """Insert consecutive items at row, like insert_child()."""
+        for offset, item in enumerate(items):
+            item.parent_item = self
+            item.row_index = row + offset
+        self.child_items[row:row] = items
+        self._rows_shifted(row)
+
+    def remove_children(self, first, last):
+        """Remove the items in rows first to last (inclusive), like remove_child()."""
+        removed = self.child_items[first:last + 1]
+        del self.child_items[first:last + 1]
+        self._rows_shifted(first)
+        for item in removed:
+            item.parent_item = None
+
+    def _rows_shifted(self, start):
+        if self.renumber_from is None or start < self.renumber_from:
+            self.renumber_from = start
+
+    def _renumber_until(self, item):
+        """Refresh stored rows from the first stale one up to item, so an edit
+        in a huge list only pays for the rows that are actually looked at."""
+        child_items = self.child_items
+        i = self.renumber_from or 0
+        while i < len(child_items):
+            child = child_items[i]
+            child.row_index = i
+            i += 1
+            if child is item:
+                break
+        self.renumber_from = i if i < len(child_items) else None
 
     def child(self, row):
         return self.child_items[row] if 0 <= row < len(self.child_items) else None
@@ -24,25 +192,278 @@ class NBTTreeItem:
         return len(self.child_items)
 
     def row(self):
-        if self.parent_item:
-            return self.parent_item.child_items.index(self)
-        return 0
+        parent = self.parent_item
+        if parent is not None and parent.renumber_from is not None:
+            siblings = parent.child_items
+            row = self.row_index
+            if row >= len(siblings) or siblings[row] is not self:
+                parent._renumber_until(self)
+        return self.row_index
 
     @property
     def value(self):
-        if isinstance(self.data, (Compound, List)):
-            return f"{type(self.data).__name__} ({len(self.data)} items)"
+        if isinstance(self.data, RegionChunk):
+            if self.data.error:
+                return f"Unreadable chunk: {self.data.error}"
+            saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.data.timestamp))
+            return f"Chunk ({self.data.size // 1024} KiB, saved {saved})"
+        if isinstance(self.data, ListPage):
+            return f"{self.page_stop() - self.data.start} items"
+        if isinstance(self.data, (Compound, List, Array, RegionFile)):
+            return f"{type_name(self.data)} ({len(self.data)} items)"
         return str(self.data)
 
+def _runs(positions):
+    """(first, last) ranges of consecutive numbers in sorted positions."""
+    runs = []
+    for position in positions:
+        if runs and runs[-1][1] == position - 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return runs
+
 class NBTTreeModel(QAbstractItemModel):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.root_item = None
 
     def set_root(self, nbt_data):
-        self.beginResetModel()
-        self.root_item = NBTTreeItem(nbt_data)
-        self.endResetModel()
+        with perf.span("set_root"):
+            self.beginResetModel()
+            self.root_item = NBTTreeItem(nbt_data)
+            self.root_item.load_children()
+            self.endResetModel()
+
+    def index_for_item(self, item, column=0):
+        if item is None or item is self.root_item:
+            return QModelIndex()
+        return self.createIndex(item.row(), column, item)
+
+    def item_for_path(self, path):
+        """Return the materialized item at path, or None if it was never loaded."""
+        item = self.root_item
+        for key in path:
+            if item is None or not item.children_loaded:
+                return None
+            item = item.child_for_key(key)
+        return item
+
+    def index_for_path(self, path):
+        """Return the index at path, materializing the items along it."""
+        item = self.root_item
+        for key in path:
+            if item is None:
+                return QModelIndex()
+            if item.can_fetch_more():
+                self.fetchMore(self.index_for_item(item))
+            if isinstance(key, int) and item.paged():
+                item = item.child(key // PAGE_SIZE)
+                if item is None:
+                    return QModelIndex()
+                if item.can_fetch_more():
+                    self.fetchMore(self.index_for_item(item))
+                key %= PAGE_SIZE
+            item = item.child_for_key(key)
+        return self.index_for_item(item) if item is not None else QModelIndex()
+
+    def _summary_changed(self, item):
+        if item is not None and item is not self.root_item:
+            index = self.index_for_item(item, 1)
+            self.dataChanged.emit(index, index)
+
+    def _rows_relabelled(self, parent_item, first):
+        """Repaint the index labels of list rows that shifted after first."""
+        last = len(parent_item.child_items) - 1
+        if isinstance(parent_item.data, (List, ListPage)) and first <= last:
+            # Labels are derived from the row, so one signal for the range suffices
+            parent = self.index_for_item(parent_item)
+            self.dataChanged.emit(self.index(first, 0, parent), self.index(last, 0, parent))
+
+    # Document listener interface, called by NBTHandler after each mutation
+
+    def tag_changed(self, parent_path, key):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None or not parent_item.children_loaded:
+            return
+        item = parent_item.child_for_key(key)
+        if item is None:
+            # An entry of a page that was never expanded
+            return
+        index = self.index_for_item(item)
+        if item.child_items:
+            self.beginRemoveRows(index, 0, len(item.child_items) - 1)
+            item.child_items = []
+            self.endRemoveRows()
+        item.children_loaded = False
+        item.data = parent_item.container()[key]
+        self.dataChanged.emit(index, self.index_for_item(item, 1))
+
+    def _insert_item(self, parent_item, row, value, name=None):
+        self.beginInsertRows(self.index_for_item(parent_item), row, row)
+        parent_item.insert_child(row, NBTTreeItem(value, name, parent_item, row))
+        self.endInsertRows()
+
+    def _remove_item(self, parent_item, row):
+        self.beginRemoveRows(self.index_for_item(parent_item), row, row)
+        parent_item.remove_child(row)
+        self.endRemoveRows()
+
+    def _reload_children(self, item):
+        """Rebuild the children of an item, e.g. when a list starts or stops being paged."""
+        index = self.index_for_item(item)
+        if item.child_items:
+            self.beginRemoveRows(index, 0, len(item.child_items) - 1)
+            item.child_items = []
+            self.endRemoveRows()
+        item.children_loaded = False
+        self.fetchMore(index)
+
+    def _pages_shifted(self, list_item, position, delta):
+        """Update a paged list after one entry was inserted (delta 1) or removed (-1).
+
+        Pages keep fixed index ranges, so every loaded page from the edited one
+        onwards passes one entry on to (or takes one from) its neighbour.
+        """
+        container = list_item.container()
+        pages = list_item.child_items
+        for page in pages[position // PAGE_SIZE:]:
+            start = page.data.start
+            if page.children_loaded:
+                row = max(position - start, 0)
+                if delta > 0:
+                    self._insert_item(page, row, container[start + row])
+                    if len(page.child_items) > PAGE_SIZE:
+                        self._remove_item(page, PAGE_SIZE)
+                else:
+                    self._remove_item(page, row)
+                    filled = start + len(page.child_items)
+                    if filled < page.page_stop():
+                        self._insert_item(page, len(page.child_items), container[filled])
+                self._rows_relabelled(page, row)
+        page_count = -(-len(container) // PAGE_SIZE)
+        parent = self.index_for_item(list_item)
+        if len(pages) < page_count:
+            self.beginInsertRows(parent, len(pages), len(pages))
+            list_item.insert_child(len(pages), NBTTreeItem(ListPage(len(pages) * PAGE_SIZE), None, list_item, len(pages)))
+            self.endInsertRows()
+        elif len(pages) > page_count:
+            self._remove_item(list_item, len(pages) - 1)
+        # The range label and size of the last page may have changed
+        self.dataChanged.emit(self.index_for_item(pages[-1]), self.index_for_item(pages[-1], 1))
+
+    def tag_inserted(self, parent_path, key, position):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None:
+            return
+        if parent_item.children_loaded:
+            container = parent_item.container()
+            if isinstance(container, List) and parent_item.paged() != (len(container) > PAGE_SIZE):
+                self._reload_children(parent_item)
+            elif parent_item.paged():
+                self._pages_shifted(parent_item, position, 1)
+            else:
+                self._insert_item(parent_item, position, container[key], key if isinstance(key, str) else None)
+                self._rows_relabelled(parent_item, position + 1)
+        self._summary_changed(parent_item)
+
+    def tag_removed(self, parent_path, key, position):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None:
+            return
+        if parent_item.children_loaded:
+            container = parent_item.container()
+            if isinstance(container, List) and parent_item.paged() != (len(container) > PAGE_SIZE):
+                self._reload_children(parent_item)
+            elif parent_item.paged():
+                self._pages_shifted(parent_item, position, -1)
+            else:
+                self._remove_item(parent_item, position)
+                self._rows_relabelled(parent_item, position)
+        self._summary_changed(parent_item)
+
+    def tag_renamed(self, parent_path, old_name, new_name):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None or not parent_item.children_loaded:
+            return
+        item = parent_item.child_for_key(old_name)
+        item.name = new_name
+        index = self.index_for_item(item)
+        self.dataChanged.emit(index, index)
+
+    def _needs_reload(self, parent_item):
+        # Paged lists are rebuilt rather than shifting every later page
+        container = parent_item.container()
+        return parent_item.paged() or (isinstance(container, List) and len(container) > PAGE_SIZE)
+
+    def tags_changed(self, parent_path, keys):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None or not parent_item.children_loaded:
+            return
+        container = parent_item.container()
+        if keys and isinstance(keys[0], str):
+            by_name = {child.name: child for child in parent_item.child_items}
+            items = [(key, by_name.get(key)) for key in keys]
+        else:
+            items = [(key, parent_item.child_for_key(key)) for key in keys]
+        rows = {}
+        for key, item in items:
+            if item is None:
+                continue
+            if item.child_items:
+                self.beginRemoveRows(self.index_for_item(item), 0, len(item.child_items) - 1)
+                item.child_items = []
+                self.endRemoveRows()
+            item.children_loaded = False
+            item.data = container[key]
+            rows.setdefault(item.parent_item, []).append(item.row())
+        # One signal per parent (or page) spanning every changed row
+        for owner, changed in rows.items():
+            parent = self.index_for_item(owner)
+            self.dataChanged.emit(self.index(min(changed), 0, parent), self.index(max(changed), 1, parent))
+
+    def tags_inserted(self, parent_path, keys, positions):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None:
+            return
+        if parent_item.children_loaded:
+            if self._needs_reload(parent_item):
+                self._reload_children(parent_item)
+            else:
+                container = parent_item.container()
+                parent = self.index_for_item(parent_item)
+                names = dict(zip(positions, keys))
+                for first, last in _runs(positions):
+                    self.beginInsertRows(parent, first, last)
+                    parent_item.insert_children(first, [
+                        NBTTreeItem(container[names[row]], names[row] if isinstance(names[row], str) else None)
+                        for row in range(first, last + 1)])
+                    self.endInsertRows()
+                if positions:
+                    self._rows_relabelled(parent_item, positions[0])
+        self._summary_changed(parent_item)
+
+    def tags_removed(self, parent_path, keys, positions):
+        parent_item = self.item_for_path(parent_path)
+        if parent_item is None:
+            return
+        if parent_item.children_loaded:
+            if parent_item.paged():
+                self._reload_children(parent_item)
+            else:
+                parent = self.index_for_item(parent_item)
+                for first, last in reversed(_runs(positions)):
+                    self.beginRemoveRows(parent, first, last)
+                    parent_item.remove_children(first, last)
+                    self.endRemoveRows()
+                if positions:
+                    self._rows_relabelled(parent_item, positions[0])
+        self._summary_changed(parent_item)
+
+    def item_from_index(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.root_item
 
     def index(self, row, column, parent=QModelIndex()):
         if not self.hasIndex(row, column, parent):
@@ -74,13 +495,35 @@ class NBTTreeModel(QAbstractItemModel):
         if parent.column() > 0:
             return 0
 
-        if not parent.isValid():
-            parent_item = self.root_item
-        else:
-            parent_item = parent.internalPointer()
+        parent_item = self.item_from_index(parent)
+        if parent_item is None:
+            return 0
 
         return parent_item.childCount()
 
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        parent_item = self.item_from_index(parent)
+        return parent_item is not None and parent_item.has_children()
+
+    def canFetchMore(self, parent):
+        parent_item = self.item_from_index(parent)
+        return parent_item is not None and parent_item.can_fetch_more()
+
+    def fetchMore(self, parent):
+        parent_item = self.item_from_index(parent)
+        if parent_item is None or not parent_item.can_fetch_more():
+            return
+        children = parent_item.create_children()
+        if not children:
+            parent_item.children_loaded = True
+            return
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        parent_item.child_items = children
+        parent_item.children_loaded = True
+        self.endInsertRows()
+
     def columnCount(self, parent=QModelIndex()):
         return 2  # Name and Value columns
 
@@ -92,7 +535,7 @@ class NBTTreeModel(QAbstractItemModel):
         
         if role == Qt.ItemDataRole.DisplayRole:
             if index.column() == 0:
-                return item.name
+                return item.label()
             elif index.column() == 1:
                 return item.value
         return None
@@ -100,4 +543,4 @@ class NBTTreeModel(QAbstractItemModel):
     def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
         if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
             return ["Name", "Value"][section]
-        return None 
\ No newline at end of file
+        return None
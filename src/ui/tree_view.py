@@ -1,17 +1,47 @@
 from PyQt6.QtWidgets import (QTreeView, QMenu, QInputDialog, 
                             QMessageBox, QApplication)
-from PyQt6.QtCore import Qt, QModelIndex
+from PyQt6.QtCore import Qt, QModelIndex, QSortFilterProxyModel, QMimeData, QItemSelection, QItemSelectionModel
+from PyQt6.QtGui import QKeySequence
 from nbtlib.tag import (Compound, List, String, Int, Byte, 
-                       Short, Long, Float, Double, ByteArray, 
+                       Short, Long, Float, Double, Array, ByteArray, 
                        IntArray, LongArray)
-from ui.tree_model import NBTTreeItem  # Changed from relative to absolute import
+from core.region import RegionFile, RegionChunk
+from core.history import (SetValue, InsertTag, RemoveTag, RenameTag, MoveTag, SetValues,
+                          InsertTags, RemoveTags, MoveTags, Batch)
+from core.convert import CONVERSIONS, convert_tag
+from core.clipboard import MIME_TYPE, encode_tags, decode_tags, entries_to_snbt, parse_snbt
+from ui.tree_model import ListPage
+
+_TEXT_TYPE = "text/plain"
+
+class TagMimeData(QMimeData):
+    """Copied tags as binary NBT; the SNBT text flavor is only built if something asks for it."""
+
+    def __init__(self, data):
+        super().__init__()
+        self.binary = data
+        self.text_value = None
+        self.setData(MIME_TYPE, data)
+
+    def formats(self):
+        return super().formats() + [_TEXT_TYPE]
+
+    def hasFormat(self, mime_type):
+        return mime_type == _TEXT_TYPE or super().hasFormat(mime_type)
+
+    def retrieveData(self, mime_type, preferred_type):
+        if mime_type == _TEXT_TYPE:
+            if self.text_value is None:
+                self.text_value = entries_to_snbt(decode_tags(self.binary))
+            return self.text_value
+        return super().retrieveData(mime_type, preferred_type)
 
 class NBTTreeView(QTreeView):
-    def __init__(self):
+    def __init__(self, nbt_handler=None):
         super().__init__()
+        self.nbt_handler = nbt_handler
         self.setAlternatingRowColors(True)
         self.setAnimated(True)
-        self.setSortingEnabled(True)
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
         
@@ -28,47 +58,6 @@ class NBTTreeView(QTreeView):
         self.setColumnWidth(0, 200)  # Name column
         self.setColumnWidth(1, 300)  # Value column
         
-        # Set dark theme specific styles
-        self.setStyleSheet("""
-            QTreeView {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-            }
-            QTreeView::item {
-                padding: 4px;
-                border-bottom: 1px solid #3d3d3d;
-            }
-            QTreeView::item:selected {
-                background-color: #3d3d3d;
-            }
-            QTreeView::item:hover {
-                background-color: #353535;
-            }
-            QTreeView::branch {
-                background-color: #2d2d2d;
-            }
-            QTreeView::branch:has-siblings:!adjoins-item {
-                border-image: url(vline.png) 0;
-            }
-            QTreeView::branch:has-siblings:adjoins-item {
-                border-image: url(branch-more.png) 0;
-            }
-            QTreeView::branch:!has-children:!has-siblings:adjoins-item {
-                border-image: url(branch-end.png) 0;
-            }
-            QTreeView::branch:has-children:!has-siblings:closed,
-            QTreeView::branch:closed:has-children:has-siblings {
-                border-image: none;
-                image: url(branch-closed.png);
-            }
-            QTreeView::branch:open:has-children:!has-siblings,
-            QTreeView::branch:open:has-children:has-siblings {
-                border-image: none;
-                image: url(branch-open.png);
-            }
-        """)
-        
     def show_context_menu(self, position):
         index = self.indexAt(position)
         if not index.isValid():
@@ -95,7 +84,14 @@ class NBTTreeView(QTreeView):
         
         # Edit actions
         edit_action = menu.addAction("Edit")
+        rename_action = menu.addAction("Rename")
         delete_action = menu.addAction("Delete")
+        convert_menu = menu.addMenu("Convert To")
+        for type_name in CONVERSIONS:
+            convert_menu.addAction(type_name).setData(type_name)
+        move_up_action = menu.addAction("Move Up")
+        move_down_action = menu.addAction("Move Down")
+        go_to_index_action = menu.addAction("Go to Index...")
         
         # Copy/Paste actions
         copy_action = menu.addAction("Copy")
@@ -108,10 +104,20 @@ class NBTTreeView(QTreeView):
             self.handle_context_menu_action(action, index)
             
     def handle_context_menu_action(self, action, index):
-        if action.text() == "Edit":
+        if action.data() in CONVERSIONS:
+            self.convert_tags(index, action.data())
+        elif action.text() == "Edit":
             self.edit_tag(index)
+        elif action.text() == "Rename":
+            self.rename_tag(index)
         elif action.text() == "Delete":
             self.delete_tag(index)
+        elif action.text() == "Move Up":
+            self.move_tag(index, -1)
+        elif action.text() == "Move Down":
+            self.move_tag(index, 1)
+        elif action.text() == "Go to Index...":
+            self.go_to_index(index)
         elif action.text() in ["Compound", "List", "String", "Int", "Byte", 
                              "Short", "Long", "Float", "Double", "Byte Array",
                              "Int Array", "Long Array"]:
@@ -122,59 +128,170 @@ class NBTTreeView(QTreeView):
             self.paste_tag(index)
             
     def edit_tag(self, index):
-        item = index.internalPointer()
-        if not item:
-            return
-            
-        if isinstance(item.data, (Compound, List)):
+        """Set a new value on the selected scalar tags (or the one at index), each keeping its type."""
+        groups = self.selected_keys(index)
+        targets = [(path, key) for path, keys in groups for key in keys
+                   if not isinstance(self._value_at(path, key), (Compound, List, Array, RegionChunk))]
+        if not targets:
             return
-            
+        prompt = "Enter new value:" if len(targets) == 1 else f"Enter new value for {len(targets)} tags:"
         value, ok = QInputDialog.getText(
-            self, "Edit Tag", "Enter new value:", 
-            text=str(item.data)
+            self, "Edit Tag", prompt,
+            text=str(self._value_at(*targets[0]))
         )
         
         if ok and value:
             try:
-                # Convert value to appropriate type
-                if isinstance(item.data, String):
-                    item.data = String(value)
-                elif isinstance(item.data, Int):
-                    item.data = Int(int(value))
-                elif isinstance(item.data, Byte):
-                    item.data = Byte(int(value))
-                elif isinstance(item.data, Short):
-                    item.data = Short(int(value))
-                elif isinstance(item.data, Long):
-                    item.data = Long(int(value))
-                elif isinstance(item.data, Float):
-                    item.data = Float(float(value))
-                elif isinstance(item.data, Double):
-                    item.data = Double(float(value))
-                    
-                self.model().dataChanged.emit(index, index)
-            except ValueError as e:
+                operations = []
+                for path, keys in groups:
+                    container = self.nbt_handler.resolve(path)
+                    values = {}
+                    for key in keys:
+                        new_tag = _parse_value(container, key, value)
+                        if new_tag is not None:
+                            values[key] = new_tag
+                    if len(values) == 1:
+                        operations.extend(SetValue(path, key, new_tag) for key, new_tag in values.items())
+                    elif values:
+                        operations.append(SetValues(path, values))
+                self.execute_all(operations)
+            except (ValueError, TypeError, OverflowError) as e:
                 QMessageBox.warning(self, "Error", f"Invalid value: {str(e)}")
                 
     def delete_tag(self, index):
-        item = index.internalPointer()
-        if not item:
+        """Delete the selected tags (or the one at index) as one undo step; a range node deletes its entries."""
+        groups = [(path, keys) for path, keys in self.selected_keys(index)
+                  if not isinstance(self.nbt_handler.resolve(path), (Array, RegionFile))]
+        count = sum(len(keys) for _, keys in groups)
+        if not count:
             return
             
         reply = QMessageBox.question(
             self, "Confirm Delete",
-            "Are you sure you want to delete this tag?",
+            "Are you sure you want to delete this tag?" if count == 1 else
+            f"Are you sure you want to delete these {count} tags?",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            parent = item.parent_item
-            if parent:
-                parent.child_items.remove(item)
-                self.model().layoutChanged.emit()
+            try:
+                self.execute_all([RemoveTag(path, keys[0]) if len(keys) == 1 else RemoveTags(path, keys)
+                                  for path, keys in groups])
+            except (KeyError, IndexError, TypeError, AttributeError) as e:
+                QMessageBox.warning(self, "Error", f"Failed to delete tag: {str(e)}")
+
+    def convert_tags(self, index, type_name):
+        """Convert the selected tags to another numeric type or String; lists convert their entries."""
+        tag_type = CONVERSIONS[type_name]
+        try:
+            operations = []
+            for path, keys in self.selected_keys(index):
+                container = self.nbt_handler.resolve(path)
+                if isinstance(container, (Array, RegionFile)):
+                    continue
+                if isinstance(container, List):
+                    # A list holds a single type, so its entries are converted together
+                    if len(keys) != len(container) or not path:
+                        raise ValueError("All entries of a list share one type; select the list itself to convert them")
+                    operations.append(SetValue(path[:-1], path[-1], convert_tag(container, tag_type)))
+                elif len(keys) == 1:
+                    operations.append(SetValue(path, keys[0], convert_tag(container[keys[0]], tag_type)))
+                else:
+                    operations.append(SetValues(path, {key: convert_tag(container[key], tag_type) for key in keys}))
+            self.execute_all(operations)
+        except (ValueError, TypeError, OverflowError) as e:
+            QMessageBox.warning(self, "Error", f"Failed to convert tags: {str(e)}")
+
+    def execute_all(self, operations):
+        """Execute operations as a single undo step."""
+        if len(operations) == 1:
+            self.nbt_handler.execute(operations[0])
+        elif operations:
+            self.nbt_handler.execute(Batch(operations))
+
+    def _value_at(self, path, key):
+        return self.nbt_handler.resolve(path)[key]
                 
+    def rename_tag(self, index):
+        item = self.item_for_index(index)
+        if not item or not isinstance(item.key(), str):
+            return
+            
+        name, ok = QInputDialog.getText(
+            self, "Rename Tag", "Enter new name:", text=item.name
+        )
+        
+        if ok and name and name != item.name:
+            try:
+                self.nbt_handler.execute(RenameTag(item.parent_item.path(), item.name, name))
+            except KeyError as e:
+                QMessageBox.warning(self, "Error", f"Failed to rename tag: {str(e)}")
+                
+    def move_tag(self, index, offset):
+        """Move the selected list entries (or the one at index) by offset, keeping them selected."""
+        operations = []
+        moved = []
+        for path, keys in self.selected_keys(index):
+            container = self.nbt_handler.resolve(path)
+            if not isinstance(container, List):
+                continue
+            moves = _shifted_positions(keys, offset, len(container))
+            if all(key == target for key, target in moves.items()):
+                continue
+            if len(moves) == 1:
+                (key, target), = moves.items()
+                operations.append(MoveTag(path, key, path, target))
+            else:
+                operations.append(MoveTags(path, moves))
+            moved.extend(path + (target,) for target in moves.values())
+        if operations:
+            self.execute_all(operations)
+            if len(operations) == 1:
+                self.select_paths(sorted(moved))
+
+    def select_paths(self, paths):
+        """Select the tags at paths, sorted in tree order, and scroll to the first one."""
+        source_model = self.nbt_handler.get_tree_model()
+        ranges = []
+        for path in paths:
+            index = self.view_index(source_model.index_for_path(path))
+            if not index.isValid():
+                continue
+            if ranges and ranges[-1][1].parent() == index.parent() and ranges[-1][1].row() + 1 == index.row():
+                ranges[-1][1] = index
+            else:
+                ranges.append([index, index])
+        if not ranges:
+            return
+        selection = QItemSelection()
+        for top, bottom in ranges:
+            selection.select(top, bottom)
+            parent = top.parent()
+            while parent.isValid():
+                self.expand(parent)
+                parent = parent.parent()
+        flags = QItemSelectionModel.SelectionFlag
+        self.selectionModel().setCurrentIndex(ranges[0][0], flags.NoUpdate)
+        self.selectionModel().select(selection, flags.ClearAndSelect | flags.Rows)
+        self.scrollTo(ranges[0][0])
+            
+    def go_to_index(self, index):
+        """Ask for an index of a list or array (or page of one) and reveal that entry."""
+        item = self.item_for_index(index)
+        container = item.container() if item else None
+        if not isinstance(container, (List, Array)) or not len(container):
+            return
+        position, ok = QInputDialog.getInt(
+            self, "Go to Index", f"Index (0-{len(container) - 1}):", 0, 0, len(container) - 1
+        )
+        if ok:
+            source_model = self.nbt_handler.get_tree_model()
+            target = source_model.index_for_path(item.path() + (position,)).internalPointer()
+            if target is not None:
+                self.reveal_item(target)
+            
     def add_tag(self, parent_index, tag_type):
-        parent_item = parent_index.internalPointer()
+        parent_item = self.item_for_index(parent_index)
         if not parent_item:
             return
             
@@ -211,57 +328,214 @@ class NBTTreeView(QTreeView):
             elif tag_type == "Long Array":
                 new_tag = LongArray([])
                 
-            if isinstance(parent_item.data, Compound):
-                parent_item.data[name] = new_tag
-                parent_item.child_items.append(NBTTreeItem(new_tag, name, parent_item))
-            elif isinstance(parent_item.data, List):
-                parent_item.data.append(new_tag)
-                parent_item.child_items.append(NBTTreeItem(new_tag, str(len(parent_item.data)-1), parent_item))
-                
-            self.model().layoutChanged.emit()
+            self.insert_into(parent_item, name, new_tag)
             
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to add tag: {str(e)}")
             
+    def insert_into(self, parent_item, name, new_tag):
+        """Add new_tag under a compound (as name) or at the end of a list."""
+        container = parent_item.container()
+        if isinstance(container, Compound):
+            if name in container:
+                self.nbt_handler.execute(SetValue(parent_item.path(), name, new_tag))
+            else:
+                self.nbt_handler.execute(InsertTag(parent_item.path(), name, new_tag))
+        elif isinstance(container, List):
+            self.nbt_handler.execute(InsertTag(parent_item.path(), len(container), new_tag))
+            
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.Copy):
+            self.copy_tag(self.currentIndex())
+        elif event.matches(QKeySequence.StandardKey.Paste):
+            self.paste_tag(self.currentIndex())
+        elif event.matches(QKeySequence.StandardKey.Delete):
+            self.delete_tag(self.currentIndex())
+        else:
+            super().keyPressEvent(event)
+
+    def selected_items(self, index):
+        """Items to act on for index: the selected rows if index is one of them, else its own.
+
+        Items are in tree order, and items inside another selected item are
+        left out since they come along with it.
+        """
+        item = self.item_for_index(index)
+        if item is None:
+            return []
+        rows = self.selectionModel().selectedRows() if self.selectionModel() else []
+        items = [self.item_for_index(row) for row in rows]
+        if item not in items:
+            return [item]
+        chosen = set(map(id, items))
+        kept = []
+        for candidate in items:
+            parent = candidate.parent_item
+            while parent is not None and id(parent) not in chosen:
+                parent = parent.parent_item
+            if parent is None:
+                kept.append(candidate)
+        return sorted(kept, key=_tree_order)
+
+    def selected_keys(self, index):
+        """Keys of the selected tags grouped by the path of their container, as (path, keys) pairs.
+
+        A range node stands for the entries it groups. Deeper containers come
+        first, so editing them in this order keeps the other paths valid.
+        """
+        groups = {}
+        for item in self.selected_items(index):
+            if isinstance(item.data, ListPage):
+                groups.setdefault(item.path(), []).extend(range(item.data.start, item.page_stop()))
+            elif item.key() is not None:
+                groups.setdefault(item.parent_item.path(), []).append(item.key())
+        return sorted(groups.items(), key=lambda group: -len(group[0]))
+
     def copy_tag(self, index):
-        item = index.internalPointer()
-        if not item:
+        """Copy the selected tags (or the one at index) as binary NBT with an SNBT text fallback."""
+        entries = []
+        for item in self.selected_items(index):
+            if isinstance(item.data, ListPage):
+                # A page copies the list entries it groups
+                container = item.container()
+                if isinstance(container, List):
+                    entries.extend((None, container[i]) for i in range(item.data.start, item.page_stop()))
+                continue
+            if item.key() is not None and isinstance(item.parent_item.container(), Array):
+                continue
+            data = item.data.load() if isinstance(item.data, RegionChunk) else item.data
+            entries.append((item.key() if isinstance(item.key(), str) else None, data))
+        if not entries:
             return
-            
-        # Store the tag data in the clipboard
-        clipboard = QApplication.clipboard()
-        clipboard.setText(str(item.data))
-        
+        try:
+            QApplication.clipboard().setMimeData(TagMimeData(encode_tags(entries)))
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to copy tags: {str(e)}")
+
+    def clipboard_entries(self):
+        """(name, tag) pairs on the clipboard, from the binary flavor when there is one."""
+        mime_data = QApplication.clipboard().mimeData()
+        if mime_data is None:
+            return []
+        if mime_data.hasFormat(MIME_TYPE):
+            return decode_tags(mime_data.data(MIME_TYPE).data())
+        text = mime_data.text()
+        return parse_snbt(text) if text.strip() else []
+
     def paste_tag(self, index):
-        item = index.internalPointer()
+        """Paste the clipboard's tags into the compound or list at index, as one undo step."""
+        item = self.item_for_index(index)
         if not item:
             return
             
-        clipboard = QApplication.clipboard()
-        text = clipboard.text()
-        
         try:
-            # Parse the NBT data from the clipboard
-            from nbtlib import parse_nbt
-            new_tag = parse_nbt(text)
-            
-            if isinstance(item.data, Compound):
+            entries = self.clipboard_entries()
+            container = item.container()
+            if not entries or not isinstance(container, (Compound, List)):
+                return
+            if isinstance(container, Compound) and len(entries) == 1:
                 name, ok = QInputDialog.getText(
-                    self, "Paste Tag", "Enter tag name:"
+                    self, "Paste Tag", "Enter tag name:", text=entries[0][0] or ""
                 )
-                if ok and name:
-                    item.data[name] = new_tag
-                    item.child_items.append(NBTTreeItem(new_tag, name, item))
-            elif isinstance(item.data, List):
-                item.data.append(new_tag)
-                item.child_items.append(NBTTreeItem(new_tag, str(len(item.data)-1), item))
-                
-            self.model().layoutChanged.emit()
+                if not ok or not name:
+                    return
+                entries = [(name, entries[0][1])]
+            if len(entries) == 1:
+                self.insert_into(item, *entries[0])
+            elif isinstance(container, List):
+                end = len(container)
+                self.nbt_handler.execute(InsertTags(item.path(), [
+                    (end + offset, tag, end + offset) for offset, (_, tag) in enumerate(entries)]))
+            else:
+                # List entries pasted into a compound are named by their position
+                named = [(name if name is not None else str(position), tag)
+                         for position, (name, tag) in enumerate(entries)]
+                replaced = {name: tag for name, tag in named if name in container}
+                added = [(name, tag) for name, tag in named if name not in container]
+                operations = [SetValues(item.path(), replaced)] if replaced else []
+                if added:
+                    end = len(container)
+                    operations.append(InsertTags(item.path(), [
+                        (name, tag, end + offset) for offset, (name, tag) in enumerate(added)]))
+                self.execute_all(operations)
             
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to paste tag: {str(e)}")
 
+    def item_for_index(self, index):
+        """Return the tree item behind a view index, which may come from a filter proxy."""
+        if not index.isValid():
+            return None
+        model = self.model()
+        if isinstance(model, QSortFilterProxyModel):
+            index = model.mapToSource(index)
+        return index.internalPointer()
+
+    def view_index(self, source_index):
+        """Map an index of the tree model to the model shown, invalid if filtered out."""
+        model = self.model()
+        if isinstance(model, QSortFilterProxyModel):
+            return model.mapFromSource(source_index)
+        return source_index
+
+    def current_item(self):
+        return self.item_for_index(self.currentIndex())
+
+    def reveal_item(self, item):
+        """Expand down to item, select it and scroll to it; False if it is filtered out."""
+        source_model = self.nbt_handler.get_tree_model()
+        index = self.view_index(source_model.index_for_item(item))
+        if not index.isValid():
+            return False
+        parent = index.parent()
+        while parent.isValid():
+            self.expand(parent)
+            parent = parent.parent()
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
+        return True
+
     def set_model(self, model):
         """Set the tree model and expand the root item."""
         super().setModel(model)
-        self.expandToDepth(0) 
\ No newline at end of file
+        self.expandToDepth(0) 
+
+
+def _parse_value(container, key, text):
+    """Tag of the same type as container[key] holding text, or None if that type is not edited as text."""
+    if isinstance(container, Array):
+        # Array entries are plain integers in the array's dtype
+        return int(text)
+    current = container[key]
+    if isinstance(current, String):
+        return String(text)
+    if isinstance(current, (Int, Byte, Short, Long)):
+        return type(current)(int(text))
+    if isinstance(current, (Float, Double)):
+        return type(current)(float(text))
+    return None
+
+
+def _shifted_positions(positions, offset, length):
+    """New positions of list entries moved by offset; they stop at either end and at each other."""
+    positions = sorted(positions)
+    moves = {}
+    if offset < 0:
+        limit = 0
+        for position in positions:
+            moves[position] = limit = max(position + offset, limit)
+            limit += 1
+    else:
+        limit = length - 1
+        for position in reversed(positions):
+            moves[position] = limit = min(position + offset, limit)
+            limit -= 1
+    return moves
+
+
+def _tree_order(item):
+    rows = []
+    while item is not None:
+        rows.append(item.row())
+        item = item.parent_item
+    return rows[::-1]
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from core import perf
+from core.diff import DiffCancelled
+from core.loader import load_nbt, LoadCancelled
+from core.region import RegionFile
+from core.search_index import SearchIndex, IndexCancelled, iter_matches
+
+FILTER_BATCH_INTERVAL = 0.05
+# Larger documents are indexed on their first search instead, so that
+# opening them costs little more than decompressing them
+INDEX_ON_LOAD_LIMIT = 16 * 1024 * 1024
+
+class LoadWorker(QObject):
+    """Parses a file on a worker thread and hands the result back via signals."""
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str, object, object)
+    failed = pyqtSignal(str, str)
+    cancelled = pyqtSignal(str)
+
+    def __init__(self, file_path, operation=None):
+        super().__init__()
+        self.file_path = file_path
+        # perf operation the load is timed as part of
+        self.operation = operation
+        self._cancel = threading.Event()
+        self._last_percent = -1
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _report(self, done, total):
+        percent = done * 100 // total if total else 100
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.progress.emit(done, total)
+
+    def run(self):
+        try:
+            with perf.attach(self.operation):
+                nbt_data = load_nbt(self.file_path, self._report, self._cancel.is_set)
+                search_index = None
+                if getattr(nbt_data, "uncompressed_size", 0) <= INDEX_ON_LOAD_LIMIT:
+                    # The document is not shared with the GUI yet, so index it here
+                    with perf.span("build index"):
+                        search_index = SearchIndex(nbt_data, self._cancel.is_set)
+        except (LoadCancelled, IndexCancelled):
+            self.cancelled.emit(self.file_path)
+        except Exception as e:
+            self.failed.emit(self.file_path, str(e))
+        else:
+            self.finished.emit(self.file_path, nbt_data, search_index)
+
+
+class SaveWorker(QObject):
+    """Runs a prepared save job (encode, compress, atomic write) on a worker thread."""
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object, str)
+
+    def __init__(self, job, operation=None):
+        super().__init__()
+        self.job = job
+        self.operation = operation
+
+    def run(self):
+        try:
+            with perf.attach(self.operation):
+                self.job.run()
+        except Exception as e:
+            self.failed.emit(self.job, str(e))
+        else:
+            self.finished.emit(self.job)
+
+
+class DiffWorker(QObject):
+    """Loads a second file and diffs the open document against it.
+
+    The document is read (and its hash cache filled) off the GUI thread, so
+    the caller keeps it from being edited, replaced or saved until the
+    worker is done.
+    """
+
+    finished = pyqtSignal(str, object, object)
+    failed = pyqtSignal(str, str)
+    cancelled = pyqtSignal(str)
+
+    def __init__(self, document, file_path, limit):
+        super().__init__()
+        self.document = document
+        self.file_path = file_path
+        self.limit = limit
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        other = None
+        try:
+            with perf.span("diff", os.path.basename(self.file_path)):
+                with perf.span("load"):
+                    other = load_nbt(self.file_path, cancelled=self._cancel.is_set)
+                entries = self.document.diff(other, self._cancel.is_set, self.limit)
+        except (LoadCancelled, DiffCancelled):
+            close_region(other)
+            self.cancelled.emit(self.file_path)
+        except Exception as e:
+            close_region(other)
+            self.failed.emit(self.file_path, str(e))
+        else:
+            self.finished.emit(self.file_path, other, entries)
+
+
+def close_region(nbt_data):
+    if isinstance(nbt_data, RegionFile):
+        nbt_data.close()
+
+
+class FilterWorker(QObject):
+    """Finds tags matching a filter text and streams their paths in batches."""
+
+    matches = pyqtSignal(object)
+    finished = pyqtSignal(bool)
+    cancelled = pyqtSignal()
+
+    def __init__(self, nbt_data, text, limit):
+        super().__init__()
+        self.nbt_data = nbt_data
+        self.text = text
+        self.limit = limit
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        batch = []
+        found = 0
+        deadline = time.monotonic() + FILTER_BATCH_INTERVAL
+        for path in iter_matches(self.nbt_data, self.text, self._cancel.is_set):
+            batch.append(path)
+            found += 1
+            if found >= self.limit or time.monotonic() >= deadline:
+                self.matches.emit(batch)
+                batch = []
+                deadline = time.monotonic() + FILTER_BATCH_INTERVAL
+                if found >= self.limit:
+                    break
+        if self._cancel.is_set():
+            self.cancelled.emit()
+            return
+        if batch:
+            self.matches.emit(batch)
+        self.finished.emit(found >= self.limit)
+
+
+_running = set()
+
+
+def start_worker(worker):
+    """Run worker.run on a new QThread, keeping both alive until it finishes."""
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for name in ("finished", "failed", "cancelled"):
+        signal = getattr(worker, name, None)
+        if signal is not None:
+            signal.connect(thread.quit)
+    job = (thread, worker)
+    _running.add(job)
+    thread.finished.connect(lambda: _running.discard(job))
+    thread.start()
+    return thread